@@ -0,0 +1,174 @@
+"""
+Benchmarks the article extractors over a saved corpus of HTML pages.
+
+The corpus is a directory holding the saved pages and a `manifest.json` listing them:
+    [{"url": "https://...", "file": "0001.html"}, ...]
+
+A corpus can be collected from a text file with one URL per line:
+    python -m benchmarks.extraction_benchmark --corpus data/html_corpus --collect urls.txt
+
+Run the benchmark:
+    python -m benchmarks.extraction_benchmark --corpus data/html_corpus
+
+Extraction quality is measured as the token-level F1 overlap with the text extracted by
+`newspaper`, which is the extractor the pipeline used before the fast path was introduced,
+over the pages where `newspaper` extracted any text.
+"""
+import os
+import re
+import json
+import time
+import argparse
+from collections import Counter
+from typing_extensions import Dict, List, Tuple
+from src.components.article_extractor import LxmlExtractor, NewspaperExtractor, FallbackExtractor, download_html
+
+
+def collect_corpus(corpus_dir: str, urls_path: str) -> None:
+    """
+    Downloads the pages listed in a text file and saves them as a corpus.
+
+    Args:
+        corpus_dir (str): Directory in which the corpus is saved.
+        urls_path (str): Path of a text file with one URL per line.
+    Returns:
+        None
+    """
+    os.makedirs(corpus_dir, exist_ok = True)
+
+    with open(urls_path) as f:
+        urls = [line.strip() for line in f if line.strip()]
+
+    manifest = []
+    for i, url in enumerate(urls):
+        try:
+            html = download_html(url)
+        except Exception as e:
+            print(f"Skipping {url}: {e}")
+            continue
+
+        file_name = f"{i:04d}.html"
+        with open(os.path.join(corpus_dir, file_name), "w", encoding = "utf-8") as f:
+            f.write(html)
+        manifest.append({"url" : url, "file" : file_name})
+
+    with open(os.path.join(corpus_dir, "manifest.json"), "w") as f:
+        json.dump(manifest, f, indent = 2)
+
+    print(f"Saved {len(manifest)} pages to {corpus_dir}")
+
+
+def load_corpus(corpus_dir: str) -> List[Tuple[str, str]]:
+    """
+    Loads a saved corpus of HTML pages.
+
+    Args:
+        corpus_dir (str): Directory holding the corpus.
+    Returns:
+        List[Tuple[str, str]]: A list of (url, html) pairs.
+    """
+    with open(os.path.join(corpus_dir, "manifest.json")) as f:
+        manifest = json.load(f)
+
+    pages = []
+    for entry in manifest:
+        with open(os.path.join(corpus_dir, entry["file"]), encoding = "utf-8") as f:
+            pages.append((entry["url"], f.read()))
+
+    return pages
+
+
+def token_f1(prediction: str, reference: str) -> float:
+    """
+    Computes the token-level F1 overlap between two texts.
+
+    Args:
+        prediction (str): The extracted text.
+        reference (str): The reference text.
+    Returns:
+        float: The F1 score, between 0 and 1.
+    """
+    prediction_tokens = Counter(re.findall(r"\w+", prediction.lower()))
+    reference_tokens = Counter(re.findall(r"\w+", reference.lower()))
+
+    if not prediction_tokens and not reference_tokens:
+        return 1.0
+
+    overlap = sum((prediction_tokens & reference_tokens).values())
+    if overlap == 0:
+        return 0.0
+
+    precision = overlap / sum(prediction_tokens.values())
+    recall = overlap / sum(reference_tokens.values())
+    return 2 * precision * recall / (precision + recall)
+
+
+def run_extractor(extractor, pages: List[Tuple[str, str]]) -> Tuple[List[str], float]:
+    """
+    Runs an extractor over every page of the corpus.
+
+    Args:
+        extractor: The extractor to benchmark.
+        pages (List[Tuple[str, str]]): A list of (url, html) pairs.
+    Returns:
+        Tuple[List[str], float]: The extracted texts and the elapsed time in seconds.
+    """
+    texts = []
+    start = time.perf_counter()
+
+    for url, html in pages:
+        try:
+            texts.append(extractor.extract(html, url))
+        except Exception:
+            texts.append("")
+
+    return texts, time.perf_counter() - start
+
+
+def benchmark(corpus_dir: str, min_text_length: int) -> Dict[str, Dict[str, float]]:
+    """
+    Compares the throughput and extracted-text quality of the article extractors.
+
+    Args:
+        corpus_dir (str): Directory holding the corpus.
+        min_text_length (int): Minimum number of characters accepted from the fast path before falling back.
+    Returns:
+        Dict[str, Dict[str, float]]: Benchmark results keyed by extractor name.
+    """
+    pages = load_corpus(corpus_dir)
+    extractors = {
+        "newspaper" : NewspaperExtractor(),
+        "lxml" : LxmlExtractor(),
+        "lxml+fallback" : FallbackExtractor(LxmlExtractor(), NewspaperExtractor(), min_text_length),
+    }
+
+    outputs = {name : run_extractor(extractor, pages) for name, extractor in extractors.items()}
+    reference_texts = outputs["newspaper"][0]
+    # Quality is only measured on the pages where newspaper extracted any text
+    scored = [i for i, reference in enumerate(reference_texts) if reference]
+    results = {}
+
+    for name, (texts, elapsed) in outputs.items():
+        results[name] = {
+            "pages_per_second" : len(pages) / elapsed if elapsed > 0 else float("inf"),
+            "mean_f1" : sum(token_f1(texts[i], reference_texts[i]) for i in scored) / max(len(scored), 1),
+            "empty_rate" : sum(len(t) == 0 for t in texts) / max(len(pages), 1),
+            "mean_characters" : sum(len(t) for t in texts) / max(len(pages), 1),
+        }
+
+    results["lxml"]["fallback_rate"] = sum(len(t) < min_text_length for t in outputs["lxml"][0]) / max(len(pages), 1)
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Benchmark the article extractors over a saved corpus of HTML pages.")
+    parser.add_argument("--corpus", required = True, help = "Directory holding the corpus.")
+    parser.add_argument("--collect", help = "Text file with one URL per line to download into the corpus.")
+    parser.add_argument("--min-text-length", type = int, default = 400, help = "Fast-path threshold before falling back.")
+    args = parser.parse_args()
+
+    if args.collect:
+        collect_corpus(args.corpus, args.collect)
+    else:
+        for name, metrics in benchmark(args.corpus, args.min_text_length).items():
+            print(name, " ".join(f"{key}={value:.3f}" for key, value in metrics.items()))
@@ -0,0 +1,172 @@
+"""
+Benchmarks the compact grading mode against the full critic schema over recorded reports.
+
+The reports are the last ones cached for each symbol, rendered from the articles kept in the news store,
+so the benchmark needs a report cache and a news store populated by previous runs:
+    python -m benchmarks.grading_benchmark
+
+The articles can instead be loaded from a weekly article archive:
+    python -m benchmarks.grading_benchmark --archive data/archive/2025-W32
+
+The critic configured in the settings grades every report with both schemas, for usefulness and for
+groundedness. The compact mode escalates failing and borderline reports to the full schema, and the cost
+of that escalation is counted with the full call made for the same report. Agreement is the share of
+reports on which the compact mode reaches the same verdict as the full schema.
+"""
+import time
+import argparse
+from datetime import datetime
+from zoneinfo import ZoneInfo
+from langchain_core.prompts.chat import ChatPromptTemplate
+from langchain_core.runnables import Runnable
+from pydantic import BaseModel
+from typing_extensions import Any, Dict, List, Optional, Tuple, Type
+from src.prompts.grade_generation import hallucination_prompt, usefulness_prompt
+from src.components.analyse_sentiment import format_report
+from src.components.article_store import ArticleStore
+from src.components.grade_generation import with_criticism_bounds
+from src.components.article_archive import ArticleArchive
+from src.components.hedged_model import build_model
+from src.components.news_store import NewsStore
+from src.components.report_cache import ReportCache
+from src.components.schemas import (
+    GroundednessOutput, UsefulnessOutput, CompactGroundednessOutput, CompactUsefulnessOutput,
+    ModelConfig, NewsStoreConfig, ReportCacheConfig
+)
+from config import settings
+
+
+def load_reports(
+        report_cache: ReportCache,
+        news_store: Optional[NewsStore] = None,
+        archive: Optional[ArticleArchive] = None
+) -> List[Tuple[str, str]]:
+    """
+    Renders the cached report of every configured symbol whose articles are still in the news store, or in the archive if given.
+
+    Args:
+        report_cache (ReportCache): Cache of the last report generated for each symbol.
+        news_store (Optional[NewsStore]): Store of the prefetched news articles.
+        archive (Optional[ArticleArchive]): Archive of the articles of the runs, used instead of the news store if given.
+    Returns:
+        List[Tuple[str, str]]: A list of (symbol alias, rendered report) pairs.
+    """
+    reports = []
+    epoch = datetime.fromtimestamp(0, ZoneInfo('Asia/Bangkok'))
+
+    for exchange_assets in settings.assets.values():
+        for alias, symbol in exchange_assets.items():
+            cached = report_cache.get(symbol)
+            if cached is None:
+                continue
+
+            article_store = ArticleStore()
+            if archive is not None:
+                stored_ids = set(archive.load(symbol, article_store))
+            else:
+                stored_ids = set(news_store.load_articles(symbol, epoch, article_store))
+            # Reports whose articles were pruned cannot be rendered
+            if not set(cached.article_ids) <= stored_ids:
+                continue
+
+            message = format_report(cached.report, cached.article_ids)
+            reports.append((alias, article_store.render_message(message, cached.article_ids).content))
+
+    return reports
+
+
+def grade(
+        model: Runnable,
+        prompt: ChatPromptTemplate,
+        inputs: Dict[str, str],
+        schema: Type[BaseModel]
+) -> Tuple[Any, float, int]:
+    """
+    Grades a report with a structured output schema.
+
+    Args:
+        model (Runnable): The critic model.
+        prompt (ChatPromptTemplate): The prompt of the criterion.
+        inputs (Dict[str, str]): The inputs of the prompt.
+        schema (Type[BaseModel]): The output schema.
+    Returns:
+        Tuple[Any, float, int]: The parsed output, the latency in seconds and the number of output tokens.
+    """
+    chain = prompt | model.with_structured_output(schema, include_raw = True)
+    start = time.perf_counter()
+    response = chain.invoke(inputs)
+    latency = time.perf_counter() - start
+
+    usage = getattr(response["raw"], "usage_metadata", None) or {}
+    return response["parsed"], latency, usage.get("output_tokens", 0)
+
+
+def benchmark(reports: List[Tuple[str, str]], model: Runnable) -> Dict[str, Dict[str, float]]:
+    """
+    Compares the latency, output tokens and verdicts of the full and compact critic schemas.
+
+    Args:
+        reports (List[Tuple[str, str]]): A list of (symbol alias, rendered report) pairs.
+        model (Runnable): The critic model.
+    Returns:
+        Dict[str, Dict[str, float]]: Benchmark results keyed by criterion and schema.
+    """
+    criteria = {
+        "usefulness" : (usefulness_prompt, UsefulnessOutput, CompactUsefulnessOutput, "is_useful"),
+        "groundedness" : (hallucination_prompt, GroundednessOutput, CompactGroundednessOutput, "is_grounded"),
+    }
+    results = {}
+
+    for criterion, (system_prompt, full_schema, compact_schema, verdict_field) in criteria.items():
+        prompt = ChatPromptTemplate([('system', system_prompt), ('human', """{report}""")])
+        full = {"latency" : 0.0, "output_tokens" : 0, "passed" : 0}
+        compact = {"latency" : 0.0, "output_tokens" : 0, "passed" : 0, "escalated" : 0, "agreement" : 0}
+
+        for alias, report in reports:
+            inputs = {"report" : report, "symbol_alias" : alias}
+            full_output, full_latency, full_tokens = grade(model, prompt, inputs, full_schema)
+            compact_output, compact_latency, compact_tokens = grade(model, with_criticism_bounds(prompt), inputs, compact_schema)
+            full_verdict = getattr(full_output, verdict_field)
+
+            full["latency"] += full_latency
+            full["output_tokens"] += full_tokens
+            full["passed"] += full_verdict
+
+            compact["latency"] += compact_latency
+            compact["output_tokens"] += compact_tokens
+            verdict = getattr(compact_output, verdict_field) and compact_output.confidence == "high"
+
+            # Failing and borderline reports are escalated to the full schema
+            if not verdict:
+                compact["escalated"] += 1
+                compact["latency"] += full_latency
+                compact["output_tokens"] += full_tokens
+                verdict = full_verdict
+
+            compact["passed"] += verdict
+            compact["agreement"] += verdict == full_verdict
+
+        count = max(len(reports), 1)
+        results[f"{criterion}/full"] = {key : value / count for key, value in full.items()}
+        results[f"{criterion}/compact"] = {key : value / count for key, value in compact.items()}
+
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Benchmark the compact grading mode against the full critic schema.")
+    parser.add_argument("--archive", help = "Weekly article archive to load the articles from, instead of the news store.")
+    parser.add_argument("--limit", type = int, default = 0, help = "Maximum number of reports to grade, 0 for all.")
+    args = parser.parse_args()
+
+    report_cache = ReportCache(ReportCacheConfig.model_validate(settings.get("report_cache", {})).path)
+    if args.archive:
+        reports = load_reports(report_cache, archive = ArticleArchive(args.archive))
+    else:
+        reports = load_reports(report_cache, NewsStore(NewsStoreConfig.model_validate(settings.get("news_store", {})).path))
+    if args.limit:
+        reports = reports[:args.limit]
+
+    print(f"Grading {len(reports)} recorded reports")
+    for name, metrics in benchmark(reports, build_model(ModelConfig.model_validate(settings.critic))).items():
+        print(name, " ".join(f"{key}={value:.3f}" for key, value in metrics.items()))
@@ -1,20 +1,34 @@
+import logging
 from src.prompts.analyse_sentiment import analyse_prompt
-from src.components.schemas import State, Report, AssetInformation
+from src.components.schemas import State, Report, AssetInformation, StreamingConfig
+from src.components.article_store import ArticleStore
+from src.components.grade_generation import format_criticisms
 from langchain_core.language_models.chat_models import BaseChatModel
 from langchain_core.prompts import MessagesPlaceholder, ChatPromptTemplate
-from langchain_core.messages import AIMessage
-from typing_extensions import List
-from langchain_core.documents import Document
+from langchain_core.messages import AIMessage, HumanMessage
+from pydantic import ValidationError
+from typing_extensions import Any, Dict, List, get_args
+from config import settings
 
-def format_report(report : Report, retrieved_news: List[Document]) -> AIMessage:
+# The sentiment labels a report may conclude with
+SENTIMENT_LABELS = get_args(Report.model_fields["current_sentiment"].annotation)
+# Fields a report cannot be graded without
+REQUIRED_FIELDS = ("chain_of_thought", "report", "current_sentiment")
+
+
+class ReportViolation(ValueError):
+    """A violation of the report schema or of its citations, found while the report is streamed."""
+
+def format_report(report : Report, article_ids: List[str]) -> AIMessage:
     """
     Format the report structured output report into an AIMessage
 
     Args:
         report (Report): Market sentiment report generated by the LLM
-        retrieved_news (List[Document]): List of retrieved news for the given trading asset
+        article_ids (List[str]): IDs of the retrieved news for the given trading asset
     Returns:
-        AIMessage: An AI message of the formatted report
+        AIMessage: An AI message of the formatted report. The cited news articles are referenced by ID
+        and are only inlined when the message is rendered into a prompt.
     """
     formatted_report = f"""
     # Report
@@ -23,21 +37,96 @@ def format_report(report : Report, retrieved_news: List[Document]) -> AIMessage:
     **Curent Market Sentiment**: {report.current_sentiment}
     **Future Market Sentiment**: {report.future_sentiment}
 
-    
-    # Cited News Articles
-    {
-        "\n\n".join([
-            f"""========== News Article {i} ==========
-            News Title: {doc.metadata['title']}
-            News URL: {doc.metadata['link'] if doc.metadata['link'] != '' else '[Link Unavailable]'}
-            News Content: {doc.page_content.strip()}""" 
-            for i,doc in enumerate(retrieved_news) if i in report.citations
-        ])
-    }
     """
-    return AIMessage(content = formatted_report)
+    cited_article_ids = [article_id for i, article_id in enumerate(article_ids) if i in report.citations]
+    return AIMessage(content = formatted_report, additional_kwargs = {"cited_article_ids" : cited_article_ids})
 
-def analyse_market_sentiment(state : State, model : BaseChatModel , asset_information : AssetInformation) -> State:
+def check_report(report: Dict[str, Any], article_count: int, complete: bool, check_citations: bool = True) -> None:
+    """
+    Checks a report, partially streamed or complete, for citations outside the retrieved news articles,
+    invalid sentiment labels and, once complete, missing fields.
+
+    Args:
+        report (Dict[str, Any]): The fields of the report streamed so far.
+        article_count (int): Number of retrieved news articles the citations refer to.
+        complete (bool): Whether the report is complete. Partial fields of a streamed report are only checked as prefixes.
+        check_citations (bool): Whether the citations are checked.
+    Raises:
+        ReportViolation: If the report violates its schema or cites an article that was not retrieved.
+    """
+    if check_citations:
+        citations = report.get("citations") or []
+        # The last citation of a partial report may still be missing digits
+        for citation in citations if complete else citations[:-1]:
+            if not isinstance(citation, int) or not 0 <= citation < article_count:
+                raise ReportViolation(f"citation {citation!r} does not refer to one of the news articles 0 to {article_count - 1}")
+
+    for field in ("current_sentiment", "future_sentiment"):
+        label = report.get(field)
+        if label is None:
+            continue
+        if not isinstance(label, str) or not any(
+            candidate == label if complete else candidate.startswith(label) for candidate in SENTIMENT_LABELS
+        ):
+            raise ReportViolation(f"{field} {label!r} is not one of {', '.join(SENTIMENT_LABELS)}")
+
+    if complete:
+        missing = [field for field in REQUIRED_FIELDS if not report.get(field)]
+        if missing:
+            raise ReportViolation(f"the report is missing {', '.join(missing)}")
+
+def stream_report(
+        prompt : ChatPromptTemplate,
+        inputs : Dict[str, Any],
+        model : BaseChatModel,
+        article_count : int,
+        max_attempts : int
+) -> Report:
+    """
+    Generates a report, checking its fields as they are streamed. A violation aborts the generation, which is
+    retried with the violation pointed out. On the last attempt, out-of-range citations are left to be ignored
+    when the report is formatted, as they are without streaming. Models that do not stream yield the whole report
+    at once and are checked when it is complete.
+
+    Args:
+        prompt (ChatPromptTemplate): The prompt of the report.
+        inputs (Dict[str, Any]): The inputs of the prompt.
+        model (BaseChatModel): The language model used for generating the report.
+        article_count (int): Number of retrieved news articles the citations refer to.
+        max_attempts (int): Maximum number of generations of the report.
+    Returns:
+        Report: The report.
+    Raises:
+        ReportViolation: If the report of the last attempt violates its schema.
+    """
+    # A JSON schema streams the report as partial dictionaries, rather than only once it validates
+    report_chain = prompt | model.with_structured_output(Report.model_json_schema())
+    messages = list(inputs["messages"])
+
+    for attempt in range(1, max_attempts + 1):
+        check_citations = attempt < max_attempts
+        report = {}
+
+        try:
+            # Leaving the stream closes the model's response
+            for report in report_chain.stream({**inputs, "messages" : messages}):
+                check_report(report or {}, article_count, complete = False, check_citations = check_citations)
+
+            check_report(report or {}, article_count, complete = True, check_citations = check_citations)
+            return Report.model_validate(report)
+        except (ReportViolation, ValidationError) as e:
+            if attempt == max_attempts:
+                raise ReportViolation(str(e)) from e
+
+            logging.warning(f"Aborted the report on attempt {attempt} of {max_attempts}: {e}")
+            messages = messages + [HumanMessage(content = f"Your report was rejected because {e}. Write the report again without this violation.")]
+
+def analyse_market_sentiment(
+        state : State,
+        model : BaseChatModel,
+        asset_information : AssetInformation,
+        article_store : ArticleStore
+) -> State:
     """
     Analyzes market sentiment based on provided news articles and generates a structured report.
 
@@ -45,11 +134,12 @@ def analyse_market_sentiment(state : State, model : BaseChatModel , asset_inform
         state (State): The current pipeline state.
         model (BaseChatModel): The language model used for generating the sentiment analysis report.
         asset_information (AssetInformation): Information about the trading asset.
+        article_store (ArticleStore): The run's store holding the retrieved news articles.
     Returns:
         State: An updated state of the graph."""
-    
-    # Retrieve the formatted news articles from the state
-    formatted_news = state.formatted_news
+
+    # Resolve the news articles referenced by the state into a single text block
+    formatted_news = article_store.format_news(state.article_ids)
     analyse_pt = ChatPromptTemplate(
         [
             ('system', analyse_prompt),
@@ -57,15 +147,31 @@ def analyse_market_sentiment(state : State, model : BaseChatModel , asset_inform
         ]
     )
 
-    # Create a prompt template for the sentiment analysis
-    report_chain = analyse_pt | model.with_structured_output(Report)
-    # Invoke the model to generate the sentiment report
-    report = report_chain.invoke(
-        {
-            "symbol_alias" : asset_information.symbol_alias, 
-            "formatted_news" : formatted_news,
-            "messages" : state.messages
-        }
-    )
+    inputs = {
+        "symbol_alias" : asset_information.symbol_alias,
+        "formatted_news" : formatted_news,
+        "messages" : article_store.render_messages(state.messages, state.article_ids)
+    }
+    streaming_config = StreamingConfig.model_validate(settings.get("streaming", {}))
+
+    if streaming_config.enabled:
+        # Stream the report, aborting it as soon as it cites an article that was not retrieved or uses an invalid label
+        try:
+            report = stream_report(analyse_pt, inputs, model, len(state.article_ids), streaming_config.max_attempts)
+        except ReportViolation as e:
+            # The violation is criticised like a failing grade, and the report is written again in the next reflection round
+            logging.warning(f"Rejected the report of {asset_information.trading_symbol}: {e}")
+            return {
+                "messages" : [
+                    AIMessage(content = "The report was rejected before it was complete."),
+                    format_criticisms([f"The report was rejected because {e}."])
+                ],
+                "reflection_rounds" : state.reflection_rounds + 1
+            }
+    else:
+        # Create a prompt template for the sentiment analysis
+        report_chain = analyse_pt | model.with_structured_output(Report)
+        # Invoke the model to generate the sentiment report
+        report = report_chain.invoke(inputs)
 
-    return {"messages" : [format_report(report, state.retrieved_news)], "report" : report}
\ No newline at end of file
+    return {"messages" : [format_report(report, state.article_ids)], "report" : report, "reflection_rounds" : state.reflection_rounds + 1}
@@ -0,0 +1,295 @@
+import os
+import mmap
+import struct
+import sqlite3
+import logging
+import threading
+from datetime import datetime
+from typing_extensions import Iterator, List, Optional, Tuple
+from src.components.article_store import ArticleRecord, ArticleStore
+
+# Each body is stored as a 4-byte big-endian length followed by its UTF-8 encoding
+LENGTH_PREFIX = struct.Struct(">I")
+
+
+def weekly_directory(root: str, date: datetime) -> str:
+    """
+    Returns the directory of the archive of the ISO week of a date, so that old weeks can be dropped as a whole.
+
+    Args:
+        root (str): Directory holding the weekly archives.
+        date (datetime): A date of the week.
+    Returns:
+        str: The directory of the week's archive, such as `root/2025-W32`.
+    """
+    return os.path.join(root, date.strftime("%G-W%V"))
+
+
+class ArchivedArticleRecord(ArticleRecord):
+    """
+    An article loaded from an archive. Its body is only sliced out of the memory-mapped archive when
+    it is read, so that loading thousands of articles keeps only their metadata in memory.
+    """
+    __slots__ = ("_archive", "_offset", "_length")
+
+    def __init__(
+        self,
+        article_id: str,
+        title: str,
+        link: str,
+        source: str,
+        published_date: Optional[datetime],
+        archive: "ArticleArchive",
+        offset: int,
+        length: int
+    ):
+        self.article_id = article_id
+        self.title = title
+        self.link = link
+        self.source = source
+        self.published_date = published_date
+        self._archive = archive
+        self._offset = offset
+        self._length = length
+
+    @property
+    def body(self) -> str:
+        return self._archive.read_body(self._offset, self._length)
+
+
+class ArticleArchive:
+    """
+    An append-only archive of the news articles of the runs. Article bodies are appended once, as
+    length-prefixed blobs, to a single binary file, and a SQLite index maps each article ID to the offset
+    of its body, and each run and symbol to its articles. Readers memory-map the binary file and slice
+    the bodies out of it without reading the whole file.
+    """
+
+    def __init__(self, directory: str):
+        """
+        Args:
+            directory (str): Directory holding the binary file and the index.
+        """
+        os.makedirs(directory, exist_ok = True)
+        self.directory = directory
+        self._blob_path = os.path.join(directory, "articles.bin")
+        self._connection = sqlite3.connect(os.path.join(directory, "index.sqlite"), check_same_thread = False)
+        self._lock = threading.Lock()
+        self._file = None
+        self._view: Optional[mmap.mmap] = None
+
+        with self._lock, self._connection:
+            self._connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS articles (
+                    article_id TEXT PRIMARY KEY,
+                    offset INTEGER NOT NULL,
+                    length INTEGER NOT NULL,
+                    title TEXT NOT NULL,
+                    link TEXT NOT NULL,
+                    source TEXT NOT NULL,
+                    published_date TEXT
+                )
+                """
+            )
+            self._connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS entries (
+                    run_id TEXT NOT NULL,
+                    trading_symbol TEXT NOT NULL,
+                    article_id TEXT NOT NULL,
+                    position INTEGER NOT NULL,
+                    PRIMARY KEY (run_id, trading_symbol, article_id)
+                )
+                """
+            )
+
+    def write(self, run_id: str, trading_symbol: str, article_ids: List[str], article_store: ArticleStore) -> int:
+        """
+        Archives the articles of a symbol for a run. Bodies already archived are not appended again.
+
+        Args:
+            run_id (str): Identifier of the run.
+            trading_symbol (str): The trading symbol the articles were retrieved for.
+            article_ids (List[str]): IDs of the articles, in prompt order.
+            article_store (ArticleStore): The run's store holding the articles.
+        Returns:
+            int: The number of newly appended bodies.
+        """
+        with self._lock:
+            known = {
+                row[0] for row in self._connection.execute(
+                    f"SELECT article_id FROM articles WHERE article_id IN ({','.join('?' * len(article_ids))})", article_ids
+                )
+            } if article_ids else set()
+
+            rows = []
+            with open(self._blob_path, "ab") as f:
+                for article_id in dict.fromkeys(article_ids):
+                    if article_id in known:
+                        continue
+
+                    record = article_store.get(article_id)
+                    body = record.body.encode("utf-8")
+                    offset = f.tell()
+                    f.write(LENGTH_PREFIX.pack(len(body)))
+                    f.write(body)
+                    rows.append((
+                        article_id, offset, len(body), record.title, record.link, record.source,
+                        record.published_date.isoformat() if record.published_date is not None else None
+                    ))
+                # The bodies are on disk before the index references them
+                f.flush()
+                os.fsync(f.fileno())
+
+            with self._connection:
+                self._connection.executemany("INSERT OR IGNORE INTO articles VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+                self._connection.executemany(
+                    "INSERT OR IGNORE INTO entries VALUES (?, ?, ?, ?)",
+                    [(run_id, trading_symbol, article_id, position) for position, article_id in enumerate(article_ids)]
+                )
+
+        return len(rows)
+
+    def _mapped(self, end: int) -> mmap.mmap:
+        # Map the file again once it has grown past the mapped range
+        if self._view is None or len(self._view) < end:
+            if self._view is not None:
+                self._view.close()
+                self._file.close()
+            self._file = open(self._blob_path, "rb")
+            self._view = mmap.mmap(self._file.fileno(), 0, access = mmap.ACCESS_READ)
+        return self._view
+
+    def read_body(self, offset: int, length: int) -> str:
+        """
+        Reads an article body out of the memory-mapped binary file.
+
+        Args:
+            offset (int): Offset of the body's length prefix.
+            length (int): Length of the encoded body.
+        Returns:
+            str: The article body.
+        """
+        start = offset + LENGTH_PREFIX.size
+        with self._lock:
+            view = self._mapped(start + length)
+            # The prefix is checked so that an index out of step with the binary file fails loudly
+            if LENGTH_PREFIX.unpack_from(view, offset)[0] != length:
+                raise ValueError(f"Corrupted archive entry at offset {offset} in {self._blob_path}")
+            return view[start:start + length].decode("utf-8")
+
+    def runs(self) -> List[str]:
+        """Lists the archived runs, oldest first."""
+        with self._lock:
+            return [row[0] for row in self._connection.execute("SELECT DISTINCT run_id FROM entries ORDER BY run_id")]
+
+    def symbols(self, run_id: Optional[str] = None) -> List[str]:
+        """
+        Lists the symbols with archived articles.
+
+        Args:
+            run_id (Optional[str]): Only the symbols of this run are listed, if given.
+        Returns:
+            List[str]: The trading symbols.
+        """
+        query = "SELECT DISTINCT trading_symbol FROM entries" + (" WHERE run_id = ?" if run_id else "") + " ORDER BY trading_symbol"
+        with self._lock:
+            return [row[0] for row in self._connection.execute(query, (run_id,) if run_id else ())]
+
+    def _entries(self, trading_symbol: str, run_id: Optional[str]) -> Iterator[Tuple]:
+        with self._lock:
+            if run_id is None:
+                row = self._connection.execute(
+                    "SELECT MAX(run_id) FROM entries WHERE trading_symbol = ?", (trading_symbol,)
+                ).fetchone()
+                run_id = row[0]
+
+            return iter(self._connection.execute(
+                """
+                SELECT a.article_id, a.title, a.link, a.source, a.published_date, a.offset, a.length
+                FROM entries e JOIN articles a ON a.article_id = e.article_id
+                WHERE e.run_id = ? AND e.trading_symbol = ?
+                ORDER BY e.position
+                """,
+                (run_id, trading_symbol)
+            ).fetchall())
+
+    def load(self, trading_symbol: str, article_store: ArticleStore, run_id: Optional[str] = None) -> List[str]:
+        """
+        Loads the archived articles of a symbol into an article store, in their original prompt order.
+        Bodies are read from the archive when they are first used.
+
+        Args:
+            trading_symbol (str): The trading symbol.
+            article_store (ArticleStore): The store in which the articles are kept.
+            run_id (Optional[str]): The run whose articles are loaded. Defaults to the symbol's latest run.
+        Returns:
+            List[str]: IDs of the loaded articles.
+        """
+        return [
+            article_store.add_record(ArchivedArticleRecord(
+                article_id, title, link, source,
+                datetime.fromisoformat(published_date) if published_date else None,
+                self, offset, length
+            ))
+            for article_id, title, link, source, published_date, offset, length in self._entries(trading_symbol, run_id)
+        ]
+
+    def close(self) -> None:
+        """Closes the memory map and the index connection."""
+        if self._view is not None:
+            self._view.close()
+            self._file.close()
+        self._connection.close()
+
+
+# The archive of the current run, if the run's articles are archived
+_archive: Optional[ArticleArchive] = None
+_run_id: Optional[str] = None
+
+
+def open_run_archive(directory: str, run_id: str) -> ArticleArchive:
+    """
+    Archives the articles retrieved for the rest of the run.
+
+    Args:
+        directory (str): Directory of the archive.
+        run_id (str): Identifier of the run.
+    Returns:
+        ArticleArchive: The run's archive.
+    """
+    global _archive, _run_id
+
+    _archive, _run_id = ArticleArchive(directory), run_id
+    return _archive
+
+
+def close_run_archive() -> None:
+    """Stops archiving the articles of the run."""
+    global _archive, _run_id
+
+    if _archive is not None:
+        _archive.close()
+    _archive, _run_id = None, None
+
+
+def archive_articles(trading_symbol: str, article_ids: List[str], article_store: ArticleStore) -> None:
+    """
+    Archives the articles retrieved for a symbol, if the run's articles are archived. Failures are logged
+    rather than raised, so that archiving never fails a run.
+
+    Args:
+        trading_symbol (str): The trading symbol the articles were retrieved for.
+        article_ids (List[str]): IDs of the articles, in prompt order.
+        article_store (ArticleStore): The run's store holding the articles.
+    Returns:
+        None
+    """
+    if _archive is None:
+        return
+
+    try:
+        _archive.write(_run_id, trading_symbol, article_ids, article_store)
+    except Exception as e:
+        logging.error(f"Error archiving the articles of {trading_symbol}: {e}")
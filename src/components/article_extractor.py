@@ -0,0 +1,172 @@
+from urllib.parse import urlparse
+from lxml import etree, html as lxml_html
+from newspaper import Article
+from typing_extensions import Dict, List, Optional, Protocol
+from src.components.http_client import get_http_client
+
+# Elements that never contain the main content of an article
+BOILERPLATE_TAGS = [
+    "script", "style", "noscript", "nav", "header", "footer", "aside",
+    "form", "iframe", "svg", "button", "figure", "figcaption"
+]
+
+# XPath expressions locating the main content of the publishers we see most often
+DOMAIN_RULES: Dict[str, List[str]] = {
+    "finance.yahoo.com": [
+        "//div[contains(@class, 'caas-body')]",
+        "//div[contains(@class, 'atoms-wrapper')]",
+    ],
+    "www.reuters.com": ["//div[contains(@class, 'article-body')]"],
+    "www.fool.com": ["//div[contains(@class, 'article-body')]"],
+    "www.benzinga.com": ["//div[@id='article-body']"],
+    "www.investing.com": ["//div[@id='article']"],
+    "www.cnbc.com": ["//div[contains(@class, 'ArticleBody-articleBody')]"],
+    "www.coindesk.com": ["//div[contains(@class, 'document-body')]"],
+    "cointelegraph.com": ["//div[contains(@class, 'post-content')]"],
+}
+
+
+class Extractor(Protocol):
+    """Interface of an article extractor"""
+
+    def extract(self, html: str, url: str) -> str: ...
+
+
+def download_html(link: str, timeout: Optional[float] = None) -> str:
+    """
+    Downloads the HTML page of a news article through the shared HTTP client.
+
+    Args:
+        link (str): URL of the news article.
+        timeout (Optional[float]): Request timeout in seconds. The client's default is used if not provided.
+    Returns:
+        str: The HTML content of the page.
+    """
+    return get_http_client().get_text(link, timeout = timeout)
+
+
+class LxmlExtractor:
+    """
+    A fast main-content extractor built on lxml. Publisher-specific rules are tried first;
+    otherwise the element holding the most paragraph text is taken as the article body.
+    """
+
+    def __init__(self, min_paragraph_length: int = 40, domain_rules: Optional[Dict[str, List[str]]] = None):
+        """
+        Args:
+            min_paragraph_length (int): Paragraphs shorter than this are not counted towards the content score.
+            domain_rules (Optional[Dict[str, List[str]]]): XPath expressions of the main content, keyed by host.
+        """
+        self.min_paragraph_length = min_paragraph_length
+        self.domain_rules = DOMAIN_RULES if domain_rules is None else domain_rules
+
+    def extract(self, html: str, url: str) -> str:
+        """
+        Extracts the main text content of a news article.
+
+        Args:
+            html (str): HTML content of the page.
+            url (str): URL of the page.
+        Returns:
+            str: The extracted text, or an empty string if none is found.
+        """
+        if not html.strip():
+            return ""
+
+        tree = lxml_html.fromstring(html)
+        etree.strip_elements(tree, *BOILERPLATE_TAGS, etree.Comment, with_tail = False)
+
+        for xpath in self.domain_rules.get(urlparse(url).netloc, []):
+            containers = tree.xpath(xpath)
+            if containers:
+                return self.join_paragraphs(containers[0], min_length = 0)
+
+        # Score every element by the length of the paragraphs it holds, with half the
+        # score propagated to the grandparent to reward paragraphs split across wrappers
+        scores = {}
+        for paragraph in tree.iter("p"):
+            length = len(paragraph.text_content().strip())
+            if length < self.min_paragraph_length: continue
+
+            parent = paragraph.getparent()
+            if parent is None: continue
+            scores[parent] = scores.get(parent, 0) + length
+
+            grandparent = parent.getparent()
+            if grandparent is not None:
+                scores[grandparent] = scores.get(grandparent, 0) + length / 2
+
+        if not scores:
+            return ""
+
+        container = max(scores, key = scores.get)
+        return self.join_paragraphs(container, min_length = self.min_paragraph_length)
+
+    @staticmethod
+    def join_paragraphs(container: lxml_html.HtmlElement, min_length: int) -> str:
+        """
+        Joins the text of the paragraphs within a container element.
+
+        Args:
+            container (lxml_html.HtmlElement): The element holding the article body.
+            min_length (int): Paragraphs shorter than this are dropped.
+        Returns:
+            str: The paragraphs separated by blank lines.
+        """
+        paragraphs = [" ".join(p.text_content().split()) for p in container.iter("p")]
+        return "\n\n".join([p for p in paragraphs if len(p) > 0 and len(p) >= min_length])
+
+
+class NewspaperExtractor:
+    """An extractor using `newspaper.Article`, which is slower but handles a wider range of layouts."""
+
+    def extract(self, html: str, url: str) -> str:
+        """
+        Extracts the main text content of a news article.
+
+        Args:
+            html (str): HTML content of the page.
+            url (str): URL of the page.
+        Returns:
+            str: The extracted text, or an empty string if none is found.
+        """
+        article = Article(url)
+        article.download(input_html = html)
+        article.parse()
+        return article.text
+
+
+class FallbackExtractor:
+    """Runs a fast extractor and falls back to a slower one when the fast path yields too little text."""
+
+    def __init__(self, primary: Extractor, fallback: Optional[Extractor], min_text_length: int = 400):
+        """
+        Args:
+            primary (Extractor): The extractor tried first.
+            fallback (Optional[Extractor]): The extractor used when the primary yields less than `min_text_length` characters.
+            min_text_length (int): Minimum number of characters accepted from the primary extractor.
+        """
+        self.primary = primary
+        self.fallback = fallback
+        self.min_text_length = min_text_length
+
+    def extract(self, html: str, url: str) -> str:
+        """
+        Extracts the main text content of a news article.
+
+        Args:
+            html (str): HTML content of the page.
+            url (str): URL of the page.
+        Returns:
+            str: The extracted text, or an empty string if none is found.
+        """
+        try:
+            text = self.primary.extract(html, url)
+        except Exception:
+            text = ""
+
+        if len(text) >= self.min_text_length or self.fallback is None:
+            return text
+
+        fallback_text = self.fallback.extract(html, url)
+        return fallback_text if len(fallback_text) > len(text) else text
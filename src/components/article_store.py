@@ -0,0 +1,208 @@
+import hashlib
+from datetime import datetime
+from langchain.docstore.document import Document
+from langchain_core.messages import AIMessage, BaseMessage
+from typing_extensions import Dict, List, Optional
+
+
+def make_article_id(link: str, title: str = "") -> str:
+    """
+    Derives a stable identifier for a news article.
+
+    Args:
+        link (str): URL of the news article.
+        title (str): Title of the news article, used when the link is unavailable.
+    Returns:
+        str: A short hexadecimal identifier for the article.
+    """
+    key = link if link else f"title:{title}"
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()[:16]
+
+
+class ArticleRecord:
+    """
+    A compact record of a single news article. Uses `__slots__` so that many records
+    can be held in memory without the overhead of a per-instance dictionary.
+    """
+    __slots__ = ("article_id", "title", "link", "source", "published_date", "body")
+
+    def __init__(
+        self,
+        article_id: str,
+        title: str,
+        link: str,
+        source: str,
+        published_date: Optional[datetime],
+        body: str
+    ):
+        self.article_id = article_id
+        self.title = title
+        self.link = link
+        self.source = source
+        self.published_date = published_date
+        self.body = body
+
+    def __repr__(self) -> str:
+        return f"ArticleRecord(article_id={self.article_id!r}, title={self.title!r})"
+
+
+class ArticleStore:
+    """
+    A per-run store of news articles. The graph state and messages only carry article IDs,
+    and the article text is resolved from this store when a prompt is rendered.
+    """
+
+    def __init__(self):
+        self._records: Dict[str, ArticleRecord] = {}
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def __contains__(self, article_id: str) -> bool:
+        return article_id in self._records
+
+    def add(self, title: str, link: str, source: str, published_date: Optional[datetime], body: str) -> str:
+        """
+        Adds a news article to the store.
+
+        Args:
+            title (str): Title of the news article.
+            link (str): URL of the news article.
+            source (str): Publisher of the news article.
+            published_date (Optional[datetime]): Publication date of the news article.
+            body (str): Content of the news article.
+        Returns:
+            str: The ID of the stored article.
+        """
+        article_id = make_article_id(link, title)
+
+        if article_id not in self._records:
+            self._records[article_id] = ArticleRecord(article_id, title, link, source, published_date, body.strip())
+
+        return article_id
+
+    def add_record(self, record: ArticleRecord) -> str:
+        """
+        Adds an existing article record, such as an article loaded from an archive, to the store.
+
+        Args:
+            record (ArticleRecord): The article record.
+        Returns:
+            str: The ID of the stored article.
+        """
+        self._records.setdefault(record.article_id, record)
+        return record.article_id
+
+    def add_document(self, doc: Document) -> str:
+        """
+        Adds a retrieved news article, represented as a Document, to the store.
+
+        Args:
+            doc (Document): A Document object containing the news article.
+        Returns:
+            str: The ID of the stored article.
+        """
+        metadata = doc.metadata
+        return self.add(
+            title = metadata.get("title", ""),
+            link = metadata.get("link", ""),
+            source = metadata.get("source", ""),
+            published_date = metadata.get("published_date"),
+            body = doc.page_content
+        )
+
+    def get(self, article_id: str) -> ArticleRecord:
+        """
+        Returns the stored article with the given ID.
+
+        Args:
+            article_id (str): ID of the article.
+        Returns:
+            ArticleRecord: The stored article.
+        """
+        return self._records[article_id]
+
+    def most_recent(self, article_ids: List[str], count: int) -> List[str]:
+        """
+        Selects the most recently published of the given articles, whatever order they were retrieved in.
+
+        Args:
+            article_ids (List[str]): IDs of the articles.
+            count (int): Maximum number of articles selected.
+        Returns:
+            List[str]: IDs of the selected articles, most recent first. Articles without a publication date come last.
+        """
+        def recency(article_id: str) -> tuple:
+            published_date = self._records[article_id].published_date
+            return (published_date is None, -published_date.timestamp() if published_date is not None else 0.0)
+
+        return sorted(article_ids, key = recency)[:count]
+
+    def format_news(self, article_ids: List[str]) -> str:
+        """
+        Formats the given articles into a single text block, numbered by their position in `article_ids`.
+
+        Args:
+            article_ids (List[str]): IDs of the articles to format.
+        Returns:
+            str: The formatted news articles.
+        """
+        return "\n\n".join([
+            f"""========== News Article {i} ==========
+        News Title: {self._records[article_id].title}
+        News Content: {self._records[article_id].body}"""
+            for i, article_id in enumerate(article_ids)
+        ])
+
+    def format_cited_news(self, article_ids: List[str], cited_ids: List[str]) -> str:
+        """
+        Formats the cited articles, including their links, numbered by their position in `article_ids`.
+
+        Args:
+            article_ids (List[str]): IDs of all articles retrieved for the trading asset.
+            cited_ids (List[str]): IDs of the cited articles.
+        Returns:
+            str: The formatted cited news articles.
+        """
+        cited = set(cited_ids)
+        return "\n\n".join([
+            f"""========== News Article {i} ==========
+            News Title: {record.title}
+            News URL: {record.link if record.link != '' else '[Link Unavailable]'}
+            News Content: {record.body}"""
+            for i, record in enumerate(self._records[article_id] for article_id in article_ids)
+            if record.article_id in cited
+        ])
+
+    def render_message(self, message: BaseMessage, article_ids: List[str]) -> BaseMessage:
+        """
+        Resolves the cited article IDs attached to a report message into the article text.
+
+        Args:
+            message (BaseMessage): A message from the graph state.
+            article_ids (List[str]): IDs of all articles retrieved for the trading asset.
+        Returns:
+            BaseMessage: The message with the cited articles inlined, or the original message if it cites none.
+        """
+        cited_ids = message.additional_kwargs.get("cited_article_ids")
+
+        if cited_ids is None:
+            return message
+
+        content = f"""{message.content}
+    # Cited News Articles
+    {self.format_cited_news(article_ids, cited_ids)}
+    """
+        return AIMessage(content = content, id = message.id)
+
+    def render_messages(self, messages: List[BaseMessage], article_ids: List[str]) -> List[BaseMessage]:
+        """
+        Resolves the cited article IDs of every report message into the article text.
+
+        Args:
+            messages (List[BaseMessage]): Messages from the graph state.
+            article_ids (List[str]): IDs of all articles retrieved for the trading asset.
+        Returns:
+            List[BaseMessage]: The rendered messages.
+        """
+        return [self.render_message(message, article_ids) for message in messages]
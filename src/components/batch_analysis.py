@@ -0,0 +1,342 @@
+from src.prompts.analyse_sentiment import batch_analyse_prompt
+from src.prompts.grade_generation import batch_hallucination_prompt, batch_usefulness_prompt
+from src.components.schemas import (
+    State, Report, AssetInformation, BatchReport, BatchUsefulnessOutput, BatchGroundednessOutput,
+    BatchCompactUsefulnessOutput, BatchCompactGroundednessOutput, GradingConfig
+)
+from src.components.article_store import ArticleStore
+from src.components.analyse_sentiment import format_report
+from src.components.grade_generation import format_criticisms, with_criticism_bounds
+from src.components.email_formatter import email_formatter
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.prompts.chat import ChatPromptTemplate
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage
+from pydantic import BaseModel
+from typing_extensions import Callable, Dict, List, Optional, Tuple, Type
+from config import settings
+
+
+def estimate_tokens(article_ids: List[str], article_store: ArticleStore) -> int:
+    """
+    Estimates the number of prompt tokens taken by the news articles of an asset.
+
+    Args:
+        article_ids (List[str]): IDs of the asset's news articles.
+        article_store (ArticleStore): The run's store holding the news articles.
+    Returns:
+        int: The estimated number of tokens, at roughly four characters per token.
+    """
+    return len(article_store.format_news(article_ids)) // 4
+
+
+def group_assets(
+        assets: List[AssetInformation],
+        token_counts: Dict[str, int],
+        max_group_tokens: int,
+        max_group_size: int
+) -> List[List[AssetInformation]]:
+    """
+    Groups assets into batches that fit within a token budget, placing the largest assets first.
+
+    Args:
+        assets (List[AssetInformation]): The assets to group.
+        token_counts (Dict[str, int]): Estimated number of tokens of each asset's news articles, keyed by trading symbol.
+        max_group_tokens (int): Maximum number of news article tokens in a group.
+        max_group_size (int): Maximum number of assets in a group.
+    Returns:
+        List[List[AssetInformation]]: The groups of assets.
+    """
+    groups: List[List[AssetInformation]] = []
+    group_tokens: List[int] = []
+
+    for asset in sorted(assets, key = lambda a: token_counts[a.trading_symbol], reverse = True):
+        tokens = token_counts[asset.trading_symbol]
+
+        for i, group in enumerate(groups):
+            if len(group) < max_group_size and group_tokens[i] + tokens <= max_group_tokens:
+                group.append(asset)
+                group_tokens[i] += tokens
+                break
+        else:
+            groups.append([asset])
+            group_tokens.append(tokens)
+
+    return groups
+
+
+def format_assets(
+        assets: List[AssetInformation],
+        article_ids: Dict[str, List[str]],
+        histories: Dict[str, List[BaseMessage]],
+        article_store: ArticleStore
+) -> str:
+    """
+    Formats the news articles of a batch of assets, along with each asset's previous report and its criticisms.
+
+    Args:
+        assets (List[AssetInformation]): The batch of assets.
+        article_ids (Dict[str, List[str]]): IDs of each asset's news articles, keyed by trading symbol.
+        histories (Dict[str, List[BaseMessage]]): The report and criticism messages of each asset, keyed by trading symbol.
+        article_store (ArticleStore): The run's store holding the news articles.
+    Returns:
+        str: The formatted assets.
+    """
+    blocks = []
+
+    for asset in assets:
+        symbol = asset.trading_symbol
+        history = histories.get(symbol, [])
+        previous = ""
+
+        if len(history) >= 2:
+            previous_report = article_store.render_message(history[-2], article_ids[symbol]).content
+            previous = f"""
+<previous_report>: {previous_report}
+<criticisms>: {history[-1].content}"""
+
+        blocks.append(f"""<asset trading_symbol="{symbol}" symbol_alias="{asset.symbol_alias}">
+<news_articles>: {article_store.format_news(article_ids[symbol])}{previous}
+</asset>""")
+
+    return "\n\n".join(blocks)
+
+
+def format_reports(
+        assets: List[AssetInformation],
+        messages: Dict[str, AIMessage],
+        article_ids: Dict[str, List[str]],
+        article_store: ArticleStore
+) -> str:
+    """
+    Formats the reports of a batch of assets, each along with its cited news articles.
+
+    Args:
+        assets (List[AssetInformation]): The batch of assets.
+        messages (Dict[str, AIMessage]): The report message of each asset, keyed by trading symbol.
+        article_ids (Dict[str, List[str]]): IDs of each asset's news articles, keyed by trading symbol.
+        article_store (ArticleStore): The run's store holding the news articles.
+    Returns:
+        str: The formatted reports.
+    """
+    return "\n\n".join([
+        f"""<asset trading_symbol="{asset.trading_symbol}" symbol_alias="{asset.symbol_alias}">
+{article_store.render_message(messages[asset.trading_symbol], article_ids[asset.trading_symbol]).content}
+</asset>"""
+        for asset in assets
+    ])
+
+
+def analyse_batch(
+        assets: List[AssetInformation],
+        article_ids: Dict[str, List[str]],
+        histories: Dict[str, List[BaseMessage]],
+        model: BaseChatModel,
+        article_store: ArticleStore
+) -> Dict[str, Report]:
+    """
+    Analyzes the market sentiment of a batch of assets in a single structured-output call.
+
+    Args:
+        assets (List[AssetInformation]): The batch of assets.
+        article_ids (Dict[str, List[str]]): IDs of each asset's news articles, keyed by trading symbol.
+        histories (Dict[str, List[BaseMessage]]): The report and criticism messages of each asset, keyed by trading symbol.
+        model (BaseChatModel): The language model used for generating the sentiment analysis reports.
+        article_store (ArticleStore): The run's store holding the news articles.
+    Returns:
+        Dict[str, Report]: The report of each asset, keyed by trading symbol. Assets omitted by the model are missing.
+    """
+    analyse_pt = ChatPromptTemplate([('system', batch_analyse_prompt)])
+    report_chain = analyse_pt | model.with_structured_output(BatchReport)
+    batch_report = report_chain.invoke({"assets" : format_assets(assets, article_ids, histories, article_store)})
+
+    symbols = {asset.trading_symbol for asset in assets}
+    return {
+        asset_report.trading_symbol : asset_report.report
+        for asset_report in batch_report.reports if asset_report.trading_symbol in symbols
+    }
+
+
+def evaluate_batch(
+        prompt: ChatPromptTemplate,
+        make_inputs: Callable[[List[AssetInformation]], Dict[str, str]],
+        assets: List[AssetInformation],
+        model: BaseChatModel,
+        full_schema: Type[BaseModel],
+        compact_schema: Type[BaseModel],
+        verdict_field: str,
+        compact: bool
+) -> Dict[str, Tuple[bool, Optional[List[str]]]]:
+    """
+    Evaluates the reports of a batch of assets against a single criterion. In compact mode, the critic first
+    gives a verdict per report without a chain of thought, and only the failing or borderline reports are
+    evaluated again, together, with the full schema.
+
+    Args:
+        prompt (ChatPromptTemplate): The prompt of the criterion.
+        make_inputs (Callable[[List[AssetInformation]], Dict[str, str]]): Builds the inputs of the prompt for a list of assets.
+        assets (List[AssetInformation]): The batch of assets.
+        model (BaseChatModel): The language model used for grading the reports.
+        full_schema (Type[BaseModel]): The batch output schema with a chain of thought.
+        compact_schema (Type[BaseModel]): The verdict-first batch output schema without a chain of thought.
+        verdict_field (str): Name of the boolean verdict field of the evaluations.
+        compact (bool): Whether compact grading is enabled.
+    Returns:
+        Dict[str, Tuple[bool, Optional[List[str]]]]: The verdict and the criticisms of each evaluated report, keyed by trading symbol.
+    """
+    results: Dict[str, Tuple[bool, Optional[List[str]]]] = {}
+    escalated = assets
+
+    if compact:
+        response = (with_criticism_bounds(prompt) | model.with_structured_output(compact_schema)).invoke(make_inputs(assets))
+        evaluations = {e.trading_symbol : e.evaluation for e in response.evaluations}
+
+        # Confidently passing reports skip the chain of thought
+        escalated = []
+        for asset in assets:
+            evaluation = evaluations.get(asset.trading_symbol)
+            if evaluation is not None and getattr(evaluation, verdict_field) and evaluation.confidence == "high":
+                results[asset.trading_symbol] = (True, evaluation.criticisms)
+            else:
+                escalated.append(asset)
+
+        if not escalated:
+            return results
+
+    response = (prompt | model.with_structured_output(full_schema)).invoke(make_inputs(escalated))
+    evaluations = {e.trading_symbol : e.evaluation for e in response.evaluations}
+
+    for asset in escalated:
+        evaluation = evaluations.get(asset.trading_symbol)
+        if evaluation is not None:
+            results[asset.trading_symbol] = (getattr(evaluation, verdict_field), evaluation.criticisms)
+
+    return results
+
+
+def grade_batch(
+        assets: List[AssetInformation],
+        messages: Dict[str, AIMessage],
+        article_ids: Dict[str, List[str]],
+        model: BaseChatModel,
+        article_store: ArticleStore
+) -> Dict[str, Optional[HumanMessage]]:
+    """
+    Evaluates the reports of a batch of assets for usefulness and groundedness, one structured-output call per criterion.
+
+    Args:
+        assets (List[AssetInformation]): The batch of assets.
+        messages (Dict[str, AIMessage]): The report message of each asset, keyed by trading symbol.
+        article_ids (Dict[str, List[str]]): IDs of each asset's news articles, keyed by trading symbol.
+        model (BaseChatModel): The language model used for grading the reports.
+        article_store (ArticleStore): The run's store holding the news articles.
+    Returns:
+        Dict[str, Optional[HumanMessage]]: None for each report that passed, otherwise a message of its criticisms, keyed by trading symbol.
+    """
+    human_msg = """{reports}"""
+    not_evaluated = ["The report could not be evaluated. Please regenerate it."]
+    verdicts: Dict[str, Optional[HumanMessage]] = {}
+    compact = GradingConfig.model_validate(settings.get("grading", {})).compact
+
+    useful_pt = ChatPromptTemplate([('system', batch_usefulness_prompt), ('human', human_msg)])
+    usefulness = evaluate_batch(
+        useful_pt,
+        lambda batch: {
+            "reports" : format_reports(batch, messages, article_ids, article_store),
+            "symbol_aliases" : ", ".join(asset.symbol_alias for asset in batch)
+        },
+        assets, model, BatchUsefulnessOutput, BatchCompactUsefulnessOutput, "is_useful", compact
+    )
+
+    useful_assets = []
+    for asset in assets:
+        is_useful, criticisms = usefulness.get(asset.trading_symbol, (False, None))
+
+        if is_useful:
+            useful_assets.append(asset)
+        else:
+            verdicts[asset.trading_symbol] = format_criticisms(criticisms or not_evaluated)
+
+    if not useful_assets:
+        return verdicts
+
+    hallucination_pt = ChatPromptTemplate([('system', batch_hallucination_prompt), ('human', human_msg)])
+    groundedness = evaluate_batch(
+        hallucination_pt,
+        lambda batch: {"reports" : format_reports(batch, messages, article_ids, article_store)},
+        useful_assets, model, BatchGroundednessOutput, BatchCompactGroundednessOutput, "is_grounded", compact
+    )
+
+    for asset in useful_assets:
+        is_grounded, criticisms = groundedness.get(asset.trading_symbol, (False, None))
+
+        if is_grounded:
+            verdicts[asset.trading_symbol] = None
+        else:
+            verdicts[asset.trading_symbol] = format_criticisms(criticisms or not_evaluated)
+
+    return verdicts
+
+
+def generate_batch_reports(
+        assets: List[AssetInformation],
+        article_ids: Dict[str, List[str]],
+        generator_model: BaseChatModel,
+        critic_model: BaseChatModel,
+        article_store: ArticleStore,
+        max_reflection_round: int
+) -> Tuple[Dict[str, Tuple[str, Report]], List[AssetInformation]]:
+    """
+    Generates the sentiment reports of a batch of assets. Analysis and grading are batched, and the assets
+    whose reports fail grading are analysed again together, up to the maximum number of reflection rounds.
+    Assets the model leaves out of the last round are returned, so that they can be analysed on their own.
+
+    Args:
+        assets (List[AssetInformation]): The batch of assets.
+        article_ids (Dict[str, List[str]]): IDs of each asset's news articles, keyed by trading symbol.
+        generator_model (BaseChatModel): The language model used for generating and formatting the reports.
+        critic_model (BaseChatModel): The language model used for grading the reports.
+        article_store (ArticleStore): The run's store holding the news articles.
+        max_reflection_round (int): Maximum number of times a report is generated.
+    Returns:
+        Tuple[Dict[str, Tuple[str, Report]], List[AssetInformation]]: The HTML newsletter and the structured report of each asset whose report passed
+            grading, keyed by trading symbol, and the assets left out of the last round by the model.
+    """
+    histories: Dict[str, List[BaseMessage]] = {asset.trading_symbol : [] for asset in assets}
+    emails: Dict[str, Tuple[str, Report]] = {}
+    pending = list(assets)
+    omitted: List[AssetInformation] = []
+
+    for _ in range(max_reflection_round):
+        if not pending: break
+
+        reports = analyse_batch(pending, article_ids, histories, generator_model, article_store)
+        messages = {
+            symbol : format_report(report, article_ids[symbol])
+            for symbol, report in reports.items()
+        }
+
+        reported_assets = [asset for asset in pending if asset.trading_symbol in messages]
+        omitted = [asset for asset in pending if asset.trading_symbol not in messages]
+        verdicts = grade_batch(reported_assets, messages, article_ids, critic_model, article_store) if reported_assets else {}
+        next_pending = []
+
+        for asset in pending:
+            symbol = asset.trading_symbol
+
+            # Assets omitted by the model are analysed again in the next round
+            if symbol not in messages:
+                next_pending.append(asset)
+                continue
+
+            histories[symbol].append(messages[symbol])
+
+            if verdicts[symbol] is None:
+                state = State(messages = histories[symbol], article_ids = article_ids[symbol])
+                emails[symbol] = (email_formatter(state, generator_model, asset, article_store)["email"], reports[symbol])
+            else:
+                histories[symbol].append(verdicts[symbol])
+                next_pending.append(asset)
+
+        pending = next_pending
+
+    return emails, omitted
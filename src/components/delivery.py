@@ -0,0 +1,247 @@
+import re
+import smtplib
+import logging
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+from lxml import html as lxml_html
+from typing_extensions import Dict, List, Optional, Tuple
+from src.components.schemas import DeliveryConfig
+from src.components.rollups import SentimentIndices, format_summary
+
+
+class Digest:
+    """An email to a recipient, assembled from the sections of the symbols it covers."""
+    __slots__ = ("recipient", "subject", "symbols")
+
+    def __init__(self, recipient: str, subject: str, symbols: List[str]):
+        self.recipient = recipient
+        self.subject = subject
+        self.symbols = symbols
+
+
+def format_sections(sections: List[str]) -> str:
+    """
+    Formats a list of section strings into an HTML document.
+
+    Args:
+        sections (List): A list of strings, each representing a section to be included in the HTML body.
+
+    Returns:
+        str: A string containing the formatted HTML document with the sections joined by double newlines.
+    """
+    return f"""
+    <!DOCTYPE html>
+    <html lang="en">
+    <body>
+        {'<br><br>'.join(sections)}
+    </body>
+    </html>
+    """
+
+
+def html_to_text(body: str) -> str:
+    """
+    Renders an HTML body as plain text, one block of text per line.
+
+    Args:
+        body (str): HTML body of the email
+    Returns:
+        str: The text content of the body.
+    """
+    tree = lxml_html.fromstring(body)
+    # Separate the text of consecutive blocks and table cells, which text_content() would run together
+    for element in tree.iter("p", "div", "h1", "h2", "h3", "h4", "li", "tr", "br", "hr"):
+        element.tail = "\n" + (element.tail or "")
+    for element in tree.iter("td", "th"):
+        element.tail = " " + (element.tail or "")
+
+    lines = (re.sub(r"[ \t]+", " ", line).strip() for line in tree.text_content().splitlines())
+    return "\n".join(line for line in lines if line)
+
+
+def compose_email(subject: str, body: str, sender: str, recipient: str) -> MIMEMultipart:
+    """
+    Composes an HTML email, along with a plain-text alternative for clients and filters that do not render HTML.
+
+    Args:
+        subject (str): Email subject
+        body (str): HTML body of the email
+        sender (str): Email address of sender
+        recipient (str): Email address of recipient
+    Returns:
+        MIMEMultipart: The email.
+    """
+    msg = MIMEMultipart('alternative')
+    # Clients display the last alternative they support, so the HTML part comes last
+    msg.attach(MIMEText(html_to_text(body), 'plain'))
+    msg.attach(MIMEText(body, 'html'))
+    msg['Subject'] = subject
+    msg['From'] = sender
+    msg['To'] = recipient
+    return msg
+
+
+def build_digests(
+        exchange_symbols: Dict[str, List[str]],
+        exchanges: Dict[str, str],
+        current_day: str,
+        default_recipient: Optional[str],
+        delivery_config: DeliveryConfig
+) -> List[Digest]:
+    """
+    Lists the digests of a run. Each subscriber receives a single digest of the symbols on their watchlist,
+    across exchanges. Without subscribers, the default recipient receives one digest per exchange.
+
+    Args:
+        exchange_symbols (Dict[str, List[str]]): The configured trading symbols of each exchange, keyed by exchange.
+        exchanges (Dict[str, str]): A dictionary of exchanges and asset types.
+        current_day (str): The date of the run.
+        default_recipient (Optional[str]): Email address receiving the digests when no subscriber is configured.
+        delivery_config (DeliveryConfig): Configuration of the delivery.
+    Returns:
+        List[Digest]: The digests.
+    """
+    if not delivery_config.subscribers:
+        return [
+            Digest(default_recipient, f"{current_day} {asset_type.capitalize()} Sentiment Report", exchange_symbols.get(exchange, []))
+            for exchange, asset_type in exchanges.items()
+        ]
+
+    configured = {symbol for symbols in exchange_symbols.values() for symbol in symbols}
+    digests = []
+
+    for subscriber in delivery_config.subscribers:
+        unknown = [symbol for symbol in subscriber.watchlist if symbol not in configured]
+        if unknown:
+            logging.warning(f"Ignoring symbols of {subscriber.email}'s watchlist that are not configured: {unknown}")
+
+        symbols = [symbol for symbol in subscriber.watchlist if symbol in configured]
+        digests.append(Digest(subscriber.email, f"{current_day} Sentiment Report", symbols))
+
+    return digests
+
+
+def assemble_digests(
+        digests: List[Digest],
+        sections: Dict[str, str],
+        sender: str,
+        indices: Optional[SentimentIndices] = None,
+        footer: str = ""
+) -> List[MIMEMultipart]:
+    """
+    Assembles the emails of the digests from the sections generated during the run, below a summary of the
+    sentiment indices of the groups they cover. Digests covering the same symbols share the same body, and
+    digests without any section are left out.
+
+    Args:
+        digests (List[Digest]): The digests.
+        sections (Dict[str, str]): The HTML section of each symbol, keyed by trading symbol. Failed symbols have an empty section.
+        sender (str): Email address of sender.
+        indices (Optional[SentimentIndices]): The sentiment indices of the run, if computed.
+        footer (str): HTML footer appended to every email, if any.
+    Returns:
+        List[MIMEMultipart]: The emails.
+    """
+    bodies: Dict[Tuple[str, ...], str] = {}
+    emails = []
+
+    for digest in digests:
+        symbols = tuple(symbol for symbol in digest.symbols if sections.get(symbol))
+        if not symbols:
+            logging.warning(f"No report to send to {digest.recipient} for {digest.subject}")
+            continue
+
+        if symbols not in bodies:
+            summary = format_summary(indices, list(symbols))
+            bodies[symbols] = format_sections(
+                ([summary] if summary else []) + [sections[symbol] for symbol in symbols] + ([footer] if footer else [])
+            )
+        emails.append(compose_email(digest.subject, bodies[symbols], sender, digest.recipient))
+
+    return emails
+
+
+def connect(delivery_config: DeliveryConfig) -> smtplib.SMTP:
+    """
+    Opens a connection to the configured SMTP server.
+
+    Args:
+        delivery_config (DeliveryConfig): Configuration of the delivery.
+    Returns:
+        smtplib.SMTP: The connection.
+    """
+    if delivery_config.security == "ssl":
+        return smtplib.SMTP_SSL(delivery_config.smtp_host, delivery_config.smtp_port)
+
+    smtp_server = smtplib.SMTP(delivery_config.smtp_host, delivery_config.smtp_port)
+    if delivery_config.security == "starttls":
+        smtp_server.starttls()
+    return smtp_server
+
+
+def send_batch(batch: List[MIMEMultipart], sender: str, password: Optional[str], delivery_config: DeliveryConfig) -> int:
+    """
+    Sends a batch of emails over a single connection. A message the server rejects is logged and skipped. If the
+    server drops the connection, the batch reconnects and resumes, retrying the interrupted message once.
+
+    Args:
+        batch (List[MIMEMultipart]): The emails.
+        sender (str): Email address of sender.
+        password (Optional[str]): Sender's email password. The server is not logged in to without a password.
+        delivery_config (DeliveryConfig): Configuration of the delivery.
+    Returns:
+        int: The number of sent emails.
+    """
+    pending = list(batch)
+    sent, retried = 0, False
+
+    while pending:
+        try:
+            with connect(delivery_config) as smtp_server:
+                if password:
+                    smtp_server.login(sender, password)
+
+                while pending:
+                    msg = pending[0]
+                    try:
+                        smtp_server.sendmail(sender, msg['To'], msg.as_string())
+                        sent += 1
+                    except smtplib.SMTPServerDisconnected:
+                        raise
+                    except smtplib.SMTPException as e:
+                        logging.error(f"Failed to send email to {msg['To']}: {e}")
+                    pending.pop(0)
+                    retried = False
+        except smtplib.SMTPServerDisconnected as e:
+            if retried:
+                logging.error(f"Failed to send email to {pending[0]['To']}, the server disconnected twice: {e}")
+                pending.pop(0)
+            retried = not retried
+            if pending:
+                logging.warning(f"SMTP server disconnected, reconnecting to send the remaining {len(pending)} emails of the batch")
+        except Exception as e:
+            logging.error(f"Failed to send a batch of {len(pending)} emails: {e}")
+            break
+
+    return sent
+
+
+def send_emails(emails: List[MIMEMultipart], sender: str, password: Optional[str], delivery_config: DeliveryConfig) -> int:
+    """
+    Sends emails in batches, logging in once per batch. A failed batch does not stop the following ones.
+
+    Args:
+        emails (List[MIMEMultipart]): The emails.
+        sender (str): Email address of sender.
+        password (Optional[str]): Sender's email password. The server is not logged in to without a password.
+        delivery_config (DeliveryConfig): Configuration of the delivery.
+    Returns:
+        int: The number of sent emails.
+    """
+    sent = sum(
+        send_batch(emails[start:start + delivery_config.batch_size], sender, password, delivery_config)
+        for start in range(0, len(emails), delivery_config.batch_size)
+    )
+
+    logging.info(f"Sent {sent} of {len(emails)} emails")
+    return sent
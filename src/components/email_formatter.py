@@ -1,20 +1,37 @@
+import threading
 from src.prompts.email_formatter import email_format_prompt
 from src.components.schemas import State, AssetInformation
+from src.components.article_store import ArticleStore
 from langchain_core.language_models.chat_models import BaseChatModel
 from langchain_core.prompts.chat import ChatPromptTemplate
+from typing_extensions import Optional
 
 
-def email_formatter(state : State, model:  BaseChatModel, asset_information : AssetInformation) -> State:
+def email_formatter(
+        state : State,
+        model:  BaseChatModel,
+        asset_information : AssetInformation,
+        article_store : ArticleStore,
+        cancelled : Optional[threading.Event] = None
+) -> State:
     """
     Formats the sentiment report into a structured HTML email newsletter.
     Args:
         state (State): The current pipeline state.
         model (BaseChatModel): The language model used for formatting the content of the email.
         asset_information (AssetInformation): Information about the trading asset.
+        article_store (ArticleStore): The run's store holding the retrieved news articles.
+        cancelled (Optional[threading.Event]): Set to stop the formatting, which is then streamed so that it stops
+            at the next chunk of the email. The email of a cancelled formatting is left empty.
     Returns:
         State: An updated state of the graph."""
 
-    report = state.messages[-1].content
+    # The email was already formatted while the report was graded
+    if state.email is not None:
+        return {}
+
+    # Inline the cited news articles into the report
+    report = article_store.render_message(state.messages[-1], state.article_ids).content
     human_msg = """{report}"""
     format_pt = ChatPromptTemplate(
         [
@@ -24,12 +41,20 @@ def email_formatter(state : State, model:  BaseChatModel, asset_information : As
     )
 
     format_chain = format_pt | model
-    # Invoke the model to format the sentiment report to a HTML newsletter
-    email_content = format_chain.invoke(
-        {
-            "report" : report,
-            "symbol_alias" : asset_information.symbol_alias
-        }
-    ).content
-
-    return {"email" : email_content}
\ No newline at end of file
+    inputs = {
+        "report" : report,
+        "symbol_alias" : asset_information.symbol_alias
+    }
+
+    if cancelled is None:
+        # Invoke the model to format the sentiment report to a HTML newsletter
+        return {"email" : format_chain.invoke(inputs).content}
+
+    chunks = []
+    # Leaving the stream closes the model's response, so that a cancelled email is not generated to its end
+    for chunk in format_chain.stream(inputs):
+        if cancelled.is_set():
+            return {}
+        chunks.append(chunk.content)
+
+    return {"email" : "".join(chunks)}
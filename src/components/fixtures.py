@@ -0,0 +1,182 @@
+import os
+import json
+import pickle
+import hashlib
+import logging
+import threading
+from datetime import datetime
+from zoneinfo import ZoneInfo
+from langchain_core.runnables import Runnable, RunnableConfig
+from typing_extensions import Any, Callable, Literal, Optional
+from src.components.retrieval_scheduler import RetrievalScheduler, RetrievalError
+
+
+class FixtureMissingError(KeyError):
+    """Raised when a replayed run makes a call that was not recorded."""
+
+
+class FixtureStore:
+    """
+    Records the responses of the network and LLM calls of a run to disk, and replays them so that a run can
+    be repeated fully offline. Responses are pickled into one file per call, named after a hash of the call.
+    The time of the recorded run is kept along with the responses, so that a replayed run filters the news
+    articles with the same freshness windows as the recorded run, however long after it is replayed.
+    """
+
+    def __init__(self, directory: str, mode: Literal["record", "replay"], executed_time: Optional[datetime] = None):
+        """
+        Args:
+            directory (str): Directory holding the recorded responses.
+            mode (Literal["record", "replay"]): Whether calls are made and recorded, or replayed from the recordings.
+            executed_time (Optional[datetime]): Time of the recorded run. Defaults to the current time when recording,
+                and to the recorded time when replaying.
+        """
+        self.directory = directory
+        self.mode = mode
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok = True)
+
+        run_path = os.path.join(directory, "run.json")
+        if mode == "record":
+            self.executed_time = executed_time or datetime.now(ZoneInfo('Asia/Bangkok'))
+            with open(run_path, "w", encoding = "utf-8") as f:
+                json.dump({"executed_time" : self.executed_time.isoformat()}, f)
+        elif executed_time is None and os.path.exists(run_path):
+            with open(run_path, encoding = "utf-8") as f:
+                self.executed_time = datetime.fromisoformat(json.load(f)["executed_time"])
+        else:
+            if executed_time is None:
+                logging.warning(f"No run time recorded in {directory}, replaying at the current time")
+            self.executed_time = executed_time or datetime.now(ZoneInfo('Asia/Bangkok'))
+
+    def _path(self, kind: str, key: str) -> str:
+        return os.path.join(self.directory, f"{kind}-{hashlib.sha1(key.encode('utf-8')).hexdigest()}.pkl")
+
+    def lookup(self, kind: str, key: str, call: Callable[[], Any]) -> Any:
+        """
+        Replays the recorded response of a call, or makes the call and records its response.
+
+        Args:
+            kind (str): Kind of call, such as `fetch`, `source` or `llm`.
+            key (str): A key identifying the call.
+            call (Callable[[], Any]): Makes the call. Only used when recording.
+        Raises:
+            FixtureMissingError: The call was not recorded.
+        Returns:
+            Any: The response of the call.
+        """
+        path = self._path(kind, key)
+
+        if self.mode == "replay":
+            if not os.path.exists(path):
+                raise FixtureMissingError(f"No recorded {kind} response for {key[:200]}")
+            with open(path, "rb") as f:
+                return pickle.load(f)
+
+        response = call()
+        with self._lock, open(path, "wb") as f:
+            pickle.dump(response, f)
+        return response
+
+
+def call_key(function: Callable, *args: Any, **kwargs: Any) -> str:
+    """
+    Identifies a source call by the function, the ticker of the object it is bound to, if any, and its arguments.
+
+    Args:
+        function (Callable): The called function.
+        *args (Any): Positional arguments of the call.
+        **kwargs (Any): Keyword arguments of the call.
+    Returns:
+        str: The key of the call.
+    """
+    owner = getattr(function, "__self__", None)
+    name = getattr(function, "__qualname__", repr(function))
+    return f"{name}|{getattr(owner, 'ticker', '')}|{args!r}|{sorted(kwargs.items())!r}"
+
+
+class FixtureScheduler(RetrievalScheduler):
+    """
+    A retrieval scheduler whose requests and source calls are recorded to, or replayed from, a fixture store.
+    Failed calls are not recorded, and fail again when replayed.
+    """
+
+    def __init__(self, fixture_store: FixtureStore, **kwargs: Any):
+        """
+        Args:
+            fixture_store (FixtureStore): Store of the recorded responses.
+            **kwargs (Any): Arguments of the retrieval scheduler.
+        """
+        super().__init__(**kwargs)
+        self.fixture_store = fixture_store
+
+    def fetch(self, url: str, deadline: float) -> str:
+        try:
+            return self.fixture_store.lookup("fetch", url, lambda: super(FixtureScheduler, self).fetch(url, deadline))
+        except FixtureMissingError as e:
+            raise RetrievalError("not_recorded", str(e)) from e
+
+    def run(self, function: Callable, *args: Any, deadline: float, **kwargs: Any) -> Any:
+        try:
+            return self.fixture_store.lookup(
+                "source",
+                call_key(function, *args, **kwargs),
+                lambda: super(FixtureScheduler, self).run(function, *args, deadline = deadline, **kwargs)
+            )
+        except FixtureMissingError as e:
+            raise RetrievalError("not_recorded", str(e)) from e
+
+
+class FixtureChatModel(Runnable):
+    """
+    Wraps a model so that its responses are recorded to, or replayed from, a fixture store. Calls are
+    identified by the model's name, the structured output schema, if any, and the rendered prompt.
+    """
+
+    def __init__(self, model: Optional[Runnable], name: str, fixture_store: FixtureStore, schema_name: str = ""):
+        """
+        Args:
+            model (Optional[Runnable]): The wrapped model. Not needed when replaying.
+            name (str): Name of the model.
+            fixture_store (FixtureStore): Store of the recorded responses.
+            schema_name (str): Name of the structured output schema, if any.
+        """
+        self.model = model
+        self.name = name
+        self.fixture_store = fixture_store
+        self.schema_name = schema_name
+
+    def with_structured_output(self, schema: Any, **kwargs: Any) -> "FixtureChatModel":
+        return FixtureChatModel(
+            model = self.model.with_structured_output(schema, **kwargs) if self.model is not None else None,
+            name = self.name,
+            fixture_store = self.fixture_store,
+            schema_name = getattr(schema, "__name__", str(schema))
+        )
+
+    def invoke(self, input: Any, config: Optional[RunnableConfig] = None, **kwargs: Any) -> Any:
+        prompt = input.to_string() if hasattr(input, "to_string") else repr(input)
+        key = f"{self.name}|{self.schema_name}|{prompt}"
+        return self.fixture_store.lookup("llm", key, lambda: self.model.invoke(input, config, **kwargs))
+
+
+# The fixture store of the run, if calls are recorded or replayed
+_fixture_store: Optional[FixtureStore] = None
+
+
+def set_fixture_store(fixture_store: Optional[FixtureStore]) -> None:
+    """Sets the fixture store through which the models of the run are recorded or replayed."""
+    global _fixture_store
+    _fixture_store = fixture_store
+
+
+def get_fixture_store() -> Optional[FixtureStore]:
+    """Returns the fixture store of the run, or None if calls are neither recorded nor replayed."""
+    return _fixture_store
+
+
+def run_time() -> datetime:
+    """Returns the time of the run: the recorded run's time if calls are recorded or replayed, the current time otherwise."""
+    if _fixture_store is not None:
+        return _fixture_store.executed_time
+    return datetime.now(ZoneInfo('Asia/Bangkok'))
@@ -1,11 +1,50 @@
-from src.prompts.grade_generation import hallucination_prompt, usefulness_prompt
-from src.components.schemas import State, GroundednessOutput, UsefulnessOutput, AssetInformation
+import logging
+import threading
+import contextvars
+from concurrent.futures import Future, ThreadPoolExecutor
+from src.prompts.grade_generation import hallucination_prompt, usefulness_prompt, compact_criticisms_prompt
+from src.components.schemas import (
+    State, GroundednessOutput, UsefulnessOutput, CompactGroundednessOutput, CompactUsefulnessOutput, AssetInformation, GradingConfig,
+    StreamingConfig, MAX_CRITICISMS, MAX_CRITICISM_LENGTH
+)
+from src.components.article_store import ArticleStore
+from src.components.email_formatter import email_formatter
 from langchain_core.language_models.chat_models import BaseChatModel
-from typing_extensions import Literal, List
+from pydantic import BaseModel
+from typing_extensions import Dict, Literal, List, Optional, Tuple, Type
 from langchain_core.prompts.chat import ChatPromptTemplate
-from langchain_core.messages import HumanMessage
+from langchain_core.messages import AIMessage, HumanMessage
 from config import settings
 
+# Formats the emails of the reports being graded, shared by all graphs of the process
+_formatting_executor = ThreadPoolExecutor(max_workers = 4, thread_name_prefix = "speculative-formatting")
+
+
+class SpeculativeEmail:
+    """The email of a report being formatted while the report is graded."""
+
+    def __init__(self, future : Future, cancelled : threading.Event):
+        self.future = future
+        self.cancelled = cancelled
+
+    def result(self) -> State:
+        """
+        Waits for the formatting of the email.
+
+        Returns:
+            State: The update of the state with the email.
+        """
+        return self.future.result()
+
+    def cancel(self) -> None:
+        """
+        Cancels the formatting of the email. A formatting that has not started yet never starts, and a running one
+        stops at the next streamed chunk of the email.
+        """
+        self.cancelled.set()
+        self.future.cancel()
+
+
 def format_criticisms(criticisms: List[str]) -> HumanMessage:
     """
     Format the criticisms into bullet point string
@@ -22,32 +61,143 @@ def format_criticisms(criticisms: List[str]) -> HumanMessage:
 
     return HumanMessage(content = critcisms_str)
 
-def grade_generation(state: State, model : BaseChatModel, asset_information : AssetInformation) -> State:
+def with_criticism_bounds(prompt : ChatPromptTemplate) -> ChatPromptTemplate:
+    """
+    Extends the prompt of a criterion with the bounds of the criticisms of the compact grading schemas.
+
+    Args:
+        prompt (ChatPromptTemplate): The prompt of the criterion.
+    Returns:
+        ChatPromptTemplate: The prompt asking for at most `MAX_CRITICISMS` single-sentence criticisms.
+    """
+    return (prompt + [('human', compact_criticisms_prompt)]).partial(
+        max_criticisms = str(MAX_CRITICISMS), max_criticism_length = str(MAX_CRITICISM_LENGTH)
+    )
+
+def evaluate(
+        prompt : ChatPromptTemplate,
+        inputs : Dict[str, str],
+        model : BaseChatModel,
+        full_schema : Type[BaseModel],
+        compact_schema : Type[BaseModel],
+        verdict_field : str,
+        compact : bool
+) -> Tuple[bool, Optional[List[str]]]:
+    """
+    Evaluates a report against a single criterion. In compact mode, the critic first gives a verdict without
+    a chain of thought, and only failing or borderline reports are evaluated again with the full schema.
+
+    Args:
+        prompt (ChatPromptTemplate): The prompt of the criterion.
+        inputs (Dict[str, str]): The inputs of the prompt.
+        model (BaseChatModel): The language model used for grading the report.
+        full_schema (Type[BaseModel]): The output schema with a chain of thought.
+        compact_schema (Type[BaseModel]): The verdict-first output schema without a chain of thought.
+        verdict_field (str): Name of the boolean verdict field of both schemas.
+        compact (bool): Whether compact grading is enabled.
+    Returns:
+        Tuple[bool, Optional[List[str]]]: The verdict and the criticisms of the report.
+    """
+    if compact:
+        response = (with_criticism_bounds(prompt) | model.with_structured_output(compact_schema)).invoke(inputs)
+
+        # Confidently passing reports skip the chain of thought
+        if getattr(response, verdict_field) and response.confidence == "high":
+            return True, response.criticisms
+
+    response = (prompt | model.with_structured_output(full_schema)).invoke(inputs)
+    return getattr(response, verdict_field), response.criticisms
+
+def format_speculatively(
+        state : State,
+        model : Optional[BaseChatModel],
+        asset_information : AssetInformation,
+        article_store : ArticleStore
+) -> Optional[SpeculativeEmail]:
+    """
+    Starts formatting the email of the report being graded, if speculative formatting is enabled. Most reports
+    pass, so that the email is ready when the critic's verdict is, and the formatting of a failing report is cancelled.
+
+    Args:
+        state (State): The current pipeline state containing the sentiment report.
+        model (Optional[BaseChatModel]): The language model used for formatting the email.
+        asset_information (AssetInformation): Information about the trading asset.
+        article_store (ArticleStore): The run's store holding the retrieved news articles.
+    Returns:
+        Optional[SpeculativeEmail]: The email being formatted, or None if the email is not formatted speculatively.
+    """
+    streaming_config = StreamingConfig.model_validate(settings.get("streaming", {}))
+    if model is None or not (streaming_config.enabled and streaming_config.speculative_formatting):
+        return None
+
+    # The context carries the run's callbacks, such as the token usage, to the formatting thread
+    context = contextvars.copy_context()
+    cancelled = threading.Event()
+    future = _formatting_executor.submit(context.run, email_formatter, state, model, asset_information, article_store, cancelled)
+    return SpeculativeEmail(future, cancelled)
+
+def passed(speculative_email : Optional[SpeculativeEmail]) -> State:
+    """
+    Returns the update of the state of a passing report, with its speculatively formatted email if any.
+    A failed formatting is left to the email formatter.
+
+    Args:
+        speculative_email (Optional[SpeculativeEmail]): The email being formatted, if formatted speculatively.
+    Returns:
+        State: An updated state of the graph.
+    """
+    if speculative_email is not None:
+        try:
+            return {"self_reflection_passed" : True, **speculative_email.result()}
+        except Exception as e:
+            logging.warning(f"Speculative formatting failed, formatting the email again: {e}")
+
+    return {"self_reflection_passed" : True}
+
+def grade_generation(
+        state: State,
+        model : BaseChatModel,
+        asset_information : AssetInformation,
+        article_store : ArticleStore,
+        formatter_model : Optional[BaseChatModel] = None
+) -> State:
     """
     Evaluates the generated market sentiment report for groundedness and usefulness.
     Args:
         state (State): The current pipeline state containing the sentiment report and news articles.
         model (BaseChatModel): The language model used for grading the report.
         asset_information (AssetInformation): Information about the trading asset.
+        article_store (ArticleStore): The run's store holding the retrieved news articles.
+        formatter_model (Optional[BaseChatModel]): The language model formatting the email while the report is graded, if any.
     Returns:
         State: An updated state of the graph.
     """
+    # The report of this round was rejected before it was complete, and its violation is the round's criticism
+    if not isinstance(state.messages[-1], AIMessage):
+        return {"self_reflection_passed" : False}
+
+    speculative_email = format_speculatively(state, formatter_model, asset_information, article_store)
+
     messages = state.messages
-    report = messages[-1].content
+    # Inline the cited news articles into the report
+    report = article_store.render_message(messages[-1], state.article_ids).content
     human_msg = """{report}"""
 
+    compact = GradingConfig.model_validate(settings.get("grading", {})).compact
+
     useful_pt = ChatPromptTemplate(
         [
         ('system', usefulness_prompt),
         ('human', human_msg) 
         ]
     )
-    # Create a prompt template for the usefulness evaluation
-    useful_chain = useful_pt | model.with_structured_output(UsefulnessOutput)
-    # Invoke the model to evaluate the usefulness of the report
-    usefulness_response = useful_chain.invoke({"report" : report, 'symbol_alias' : asset_information.symbol_alias})
+    # Evaluate the usefulness of the report
+    is_useful, criticisms = evaluate(
+        useful_pt, {"report" : report, 'symbol_alias' : asset_information.symbol_alias}, model,
+        UsefulnessOutput, CompactUsefulnessOutput, "is_useful", compact
+    )
 
-    if usefulness_response.is_useful:
+    if is_useful:
 
         hallucination_pt = ChatPromptTemplate(
             [
@@ -55,22 +205,27 @@ def grade_generation(state: State, model : BaseChatModel, asset_information : As
                 ('human', human_msg)
             ]
         )
-        # Create a prompt template for the groundedness evaluation
-        hallucination_chain = hallucination_pt | model.with_structured_output(GroundednessOutput)
-        # Invoke the model to evaluate the groundedness of the report
-        groundness_response = hallucination_chain.invoke({"report" : report})
-
-        if groundness_response.is_grounded:
-            return {"self_reflection_passed" : True}
-        
+        # Evaluate the groundedness of the report
+        is_grounded, criticisms = evaluate(
+            hallucination_pt, {"report" : report}, model,
+            GroundednessOutput, CompactGroundednessOutput, "is_grounded", compact
+        )
+
+        if is_grounded:
+            return passed(speculative_email)
+
+        if speculative_email is not None:
+            speculative_email.cancel()
         return {
-            "messages" : [format_criticisms(groundness_response.criticisms)], 
+            "messages" : [format_criticisms(criticisms or [])], 
             "self_reflection_passed" : False
         }
 
-    
+
+    if speculative_email is not None:
+        speculative_email.cancel()
     return {
-        "messages" : [format_criticisms(usefulness_response.criticisms)],
+        "messages" : [format_criticisms(criticisms or [])],
         "self_reflection_passed" : False
     }
 
@@ -87,7 +242,9 @@ def route_flow(state : State) -> Literal["email_formatter", "analyse_sentiment",
     if state.self_reflection_passed:
         return "email_formatter"
     
-    if len(state.messages) >= settings.max_reflection_round * 2:
+    max_reflection_round = state.max_reflection_round or settings.max_reflection_round
+    # Counted explicitly, as an update pass starts from the messages of the cached report
+    if state.reflection_rounds >= max_reflection_round:
         return "__end__"
     
     return "analyse_sentiment"
@@ -0,0 +1,279 @@
+import time
+import asyncio
+import logging
+import threading
+from langchain_core.runnables import Runnable, RunnableConfig
+from typing_extensions import Any, Dict, List, Optional
+from src.components.schemas import ModelConfig
+from src.components.fixtures import FixtureChatModel, get_fixture_store
+from src.mapper import get_class
+
+
+class LatencyHistogram:
+    """
+    A histogram of call latencies with logarithmically spaced buckets, from 0.25 seconds
+    up to roughly 25 minutes.
+    """
+
+    BUCKET_BOUNDS: List[float] = [0.25 * 1.25 ** i for i in range(40)]
+
+    def __init__(self):
+        self.counts = [0] * (len(self.BUCKET_BOUNDS) + 1)
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def record(self, latency: float) -> None:
+        """Records the latency of a call in seconds."""
+        index = next((i for i, bound in enumerate(self.BUCKET_BOUNDS) if latency <= bound), len(self.BUCKET_BOUNDS))
+
+        with self._lock:
+            self.counts[index] += 1
+            self.count += 1
+
+    def percentile(self, percentile: float) -> float:
+        """
+        Estimates a latency percentile as the upper bound of the bucket holding it.
+
+        Args:
+            percentile (float): The percentile to estimate, between 0 and 100.
+        Returns:
+            float: The estimated latency in seconds, or infinity if no latency is recorded.
+        """
+        with self._lock:
+            counts, total = list(self.counts), self.count
+
+        if total == 0:
+            return float("inf")
+
+        cumulative = 0
+        for i, count in enumerate(counts):
+            cumulative += count
+            if cumulative >= total * percentile / 100:
+                return self.BUCKET_BOUNDS[i] if i < len(self.BUCKET_BOUNDS) else float("inf")
+
+        return float("inf")
+
+
+# Latency histograms of every provider, kept for the lifetime of the process
+_latency_histograms: Dict[str, LatencyHistogram] = {}
+_latency_histograms_lock = threading.Lock()
+
+
+def get_latency_histogram(provider: str) -> LatencyHistogram:
+    """
+    Returns the latency histogram of a provider, creating it on first use.
+
+    Args:
+        provider (str): Name of the provider.
+    Returns:
+        LatencyHistogram: The provider's latency histogram.
+    """
+    with _latency_histograms_lock:
+        return _latency_histograms.setdefault(provider, LatencyHistogram())
+
+
+def latency_summary() -> Dict[str, Dict[str, float]]:
+    """
+    Summarizes the latency histograms of every provider.
+
+    Returns:
+        Dict[str, Dict[str, float]]: Number of calls and median and 95th percentile latencies, keyed by provider.
+    """
+    with _latency_histograms_lock:
+        histograms = dict(_latency_histograms)
+
+    return {
+        provider : {"count" : histogram.count, "p50" : histogram.percentile(50), "p95" : histogram.percentile(95)}
+        for provider, histogram in histograms.items()
+    }
+
+
+def _is_timeout(error: BaseException) -> bool:
+    """Returns whether an error is a timeout, including the timeout errors of provider SDKs."""
+    return isinstance(error, TimeoutError) or "Timeout" in type(error).__name__
+
+
+# The event loop running every hedged call, on a thread kept for the lifetime of the process. The async clients
+# of the models, such as ChatOpenAI's, are cached per process and their connections are bound to a single loop.
+_hedge_loop: Optional[asyncio.AbstractEventLoop] = None
+_hedge_loop_lock = threading.Lock()
+
+
+def get_hedge_loop() -> asyncio.AbstractEventLoop:
+    """
+    Returns the event loop running the hedged calls, starting its thread on first use.
+
+    Returns:
+        asyncio.AbstractEventLoop: The running event loop.
+    """
+    global _hedge_loop
+
+    with _hedge_loop_lock:
+        if _hedge_loop is None:
+            _hedge_loop = asyncio.new_event_loop()
+            threading.Thread(target = _hedge_loop.run_forever, name = "hedged-calls", daemon = True).start()
+        return _hedge_loop
+
+
+class HedgedChatModel(Runnable):
+    """
+    Wraps a primary and a secondary model. If the primary's call is slower than its latency
+    percentile threshold, or fails, the same request is sent to the secondary. The first valid
+    result is returned and the other call is cancelled. All hedged calls run on a single long-lived
+    event loop, whether they are made synchronously or from another loop.
+    """
+
+    def __init__(
+        self,
+        primary: Runnable,
+        secondary: Runnable,
+        primary_name: str,
+        secondary_name: str,
+        percentile: float = 95,
+        min_samples: int = 10,
+        initial_delay: float = 30
+    ):
+        """
+        Args:
+            primary (Runnable): The model called first.
+            secondary (Runnable): The model called when the primary is slow or fails.
+            primary_name (str): Name of the primary's provider, keying its latency histogram.
+            secondary_name (str): Name of the secondary's provider, keying its latency histogram.
+            percentile (float): Latency percentile of the primary after which the request is hedged.
+            min_samples (int): Number of primary latencies recorded before the percentile is used.
+            initial_delay (float): Seconds after which the request is hedged until enough latencies are recorded.
+        """
+        self.primary = primary
+        self.secondary = secondary
+        self.primary_name = primary_name
+        self.secondary_name = secondary_name
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self.initial_delay = initial_delay
+
+    def with_structured_output(self, schema: Any, **kwargs: Any) -> "HedgedChatModel":
+        """
+        Hedges structured-output calls to both models with the same schema.
+
+        Args:
+            schema (Any): The output schema.
+            **kwargs (Any): Additional arguments passed to both models.
+        Returns:
+            HedgedChatModel: A hedged runnable returning the structured output.
+        """
+        return HedgedChatModel(
+            primary = self.primary.with_structured_output(schema, **kwargs),
+            secondary = self.secondary.with_structured_output(schema, **kwargs),
+            primary_name = self.primary_name,
+            secondary_name = self.secondary_name,
+            percentile = self.percentile,
+            min_samples = self.min_samples,
+            initial_delay = self.initial_delay
+        )
+
+    def hedge_delay(self) -> float:
+        """Returns the number of seconds to wait for the primary before hedging the request."""
+        histogram = get_latency_histogram(self.primary_name)
+
+        if histogram.count < self.min_samples:
+            return self.initial_delay
+        return histogram.percentile(self.percentile)
+
+    async def _timed_call(self, model: Runnable, provider: str, input: Any, config: Optional[RunnableConfig], **kwargs: Any) -> Any:
+        """
+        Calls a model and records its latency. Calls that time out, or are cancelled because the other
+        call returned first, are recorded at their elapsed time, a lower bound of their latency, so that
+        slow calls are not missing from the histogram.
+        """
+        start = time.monotonic()
+        try:
+            result = await model.ainvoke(input, config, **kwargs)
+        except asyncio.CancelledError:
+            get_latency_histogram(provider).record(time.monotonic() - start)
+            raise
+        except Exception as e:
+            if _is_timeout(e):
+                get_latency_histogram(provider).record(time.monotonic() - start)
+            raise
+
+        if result is None:
+            raise ValueError(f"{provider} returned no result")
+
+        get_latency_histogram(provider).record(time.monotonic() - start)
+        return result
+
+    async def _hedged_call(self, input: Any, config: Optional[RunnableConfig], **kwargs: Any) -> Any:
+        primary_task = asyncio.create_task(self._timed_call(self.primary, self.primary_name, input, config, **kwargs))
+        done, _ = await asyncio.wait({primary_task}, timeout = self.hedge_delay())
+
+        if done and primary_task.exception() is None:
+            return primary_task.result()
+
+        if done:
+            logging.warning(f"{self.primary_name} failed, failing over to {self.secondary_name}: {primary_task.exception()}")
+        else:
+            logging.info(f"{self.primary_name} is slow, hedging the request to {self.secondary_name}")
+
+        secondary_task = asyncio.create_task(self._timed_call(self.secondary, self.secondary_name, input, config, **kwargs))
+        pending = {secondary_task} if done else {primary_task, secondary_task}
+        error = primary_task.exception() if done else None
+
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when = asyncio.FIRST_COMPLETED)
+
+            for task in done:
+                if task.exception() is None:
+                    # Cancel the slower call, waiting for it to record its latency before returning
+                    for other in pending:
+                        other.cancel()
+                    if pending:
+                        await asyncio.wait(pending)
+                    return task.result()
+                error = task.exception()
+
+        raise error
+
+    async def ainvoke(self, input: Any, config: Optional[RunnableConfig] = None, **kwargs: Any) -> Any:
+        loop = get_hedge_loop()
+        if asyncio.get_running_loop() is loop:
+            return await self._hedged_call(input, config, **kwargs)
+
+        # The call is scheduled with the caller's context, so that its callbacks, such as the token usage, are kept
+        return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(self._hedged_call(input, config, **kwargs), loop))
+
+    def invoke(self, input: Any, config: Optional[RunnableConfig] = None, **kwargs: Any) -> Any:
+        return asyncio.run_coroutine_threadsafe(self._hedged_call(input, config, **kwargs), get_hedge_loop()).result()
+
+
+def build_model(model_config: ModelConfig) -> Runnable:
+    """
+    Instantiates the model described by a configuration, hedged with a secondary model if one is configured.
+    When the run's calls are recorded or replayed, the model is wrapped by the fixture store.
+
+    Args:
+        model_config (ModelConfig): Configuration of the model.
+    Returns:
+        Runnable: The model.
+    """
+    name = f"{model_config.model_class}:{model_config.model_params.get('model', '')}"
+    fixture_store = get_fixture_store()
+
+    # Replayed runs never instantiate the model, so that they run without API keys
+    if fixture_store is not None and fixture_store.mode == "replay":
+        return FixtureChatModel(None, name, fixture_store)
+
+    model = get_class("llm", model_config.model_class)(**model_config.model_params)
+
+    if model_config.hedge is not None:
+        hedge = model_config.hedge
+        model = HedgedChatModel(
+            primary = model,
+            secondary = get_class("llm", hedge.model_class)(**hedge.model_params),
+            primary_name = name,
+            secondary_name = f"{hedge.model_class}:{hedge.model_params.get('model', '')}",
+            percentile = hedge.percentile,
+            min_samples = hedge.min_samples,
+            initial_delay = hedge.initial_delay
+        )
+
+    return FixtureChatModel(model, name, fixture_store) if fixture_store is not None else model
@@ -0,0 +1,275 @@
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+import requests
+from collections import OrderedDict
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from typing_extensions import Dict, Optional
+from config import settings
+
+# User agent sent with every request made through the shared session
+USER_AGENT = (
+    "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 "
+    "(KHTML, like Gecko) Chrome/131.0.0.0 Safari/537.36"
+)
+
+
+class HttpCache:
+    """
+    A cache of HTTP responses carrying an `ETag` or `Last-Modified` validator, so that they can be
+    revalidated cheaply with conditional requests. The most recently used entries are kept in memory,
+    up to `max_memory_mb`, and, if a cache directory is given, every entry is persisted to disk so that
+    it survives across runs and is read back once evicted from memory. Persisted entries that were not
+    stored or revalidated within `max_age_days` are pruned on startup, and the least recently used
+    entries are pruned beyond `max_size_mb`.
+    """
+
+    def __init__(
+        self,
+        cache_dir: Optional[str] = None,
+        max_age_days: float = 14,
+        max_size_mb: float = 256,
+        max_memory_mb: float = 32
+    ):
+        """
+        Args:
+            cache_dir (Optional[str]): Directory in which the responses are persisted. Responses are only kept in memory if not provided.
+            max_age_days (float): Days after which a persisted response that was not used is pruned.
+            max_size_mb (float): Maximum size of the persisted responses in megabytes.
+            max_memory_mb (float): Maximum size of the responses kept in memory in megabytes.
+        """
+        self.cache_dir = cache_dir
+        self.max_age_days = max_age_days
+        self.max_size_mb = max_size_mb
+        self.max_memory_mb = max_memory_mb
+        self._entries: "OrderedDict[str, Dict]" = OrderedDict()
+        self._memory_size = 0
+        self._lock = threading.Lock()
+
+        if cache_dir is not None:
+            os.makedirs(cache_dir, exist_ok = True)
+            pruned = self.prune()
+            if pruned:
+                logging.info(f"Pruned {pruned} cached HTTP responses from {cache_dir}")
+
+    def _path(self, url: str) -> str:
+        return os.path.join(self.cache_dir, hashlib.sha1(url.encode("utf-8")).hexdigest() + ".json")
+
+    def prune(self) -> int:
+        """
+        Removes the persisted responses older than the maximum age, then the least recently used ones until
+        the cache fits in its maximum size. A response's age is reset whenever it is stored or revalidated.
+
+        Returns:
+            int: The number of removed responses.
+        """
+        files = []
+        for name in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, path))
+
+        # Least recently used first
+        files.sort()
+        expiry = time.time() - self.max_age_days * 86400
+        size = sum(file_size for _, file_size, _ in files)
+        removed = 0
+
+        for modified, file_size, path in files:
+            if modified >= expiry and size <= self.max_size_mb * 1024 * 1024:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            size -= file_size
+            removed += 1
+
+        return removed
+
+    def touch(self, url: str) -> None:
+        """Marks the persisted response of a URL as used, so that it is not pruned while it keeps being revalidated."""
+        if self.cache_dir is not None:
+            try:
+                os.utime(self._path(url))
+            except OSError:
+                pass
+
+    @staticmethod
+    def _entry_size(entry: Dict) -> int:
+        return len(entry["text"].encode("utf-8"))
+
+    def _remember(self, url: str, entry: Dict) -> None:
+        """Keeps an entry in memory, evicting the least recently used entries beyond the memory limit."""
+        with self._lock:
+            previous = self._entries.pop(url, None)
+            if previous is not None:
+                self._memory_size -= self._entry_size(previous)
+
+            self._entries[url] = entry
+            self._memory_size += self._entry_size(entry)
+
+            while self._memory_size > self.max_memory_mb * 1024 * 1024 and self._entries:
+                _, evicted = self._entries.popitem(last = False)
+                self._memory_size -= self._entry_size(evicted)
+
+    def get(self, url: str) -> Optional[Dict]:
+        """
+        Returns the cached response of a URL.
+
+        Args:
+            url (str): The requested URL.
+        Returns:
+            Optional[Dict]: The cached response with its validators, or None if the URL is not cached.
+        """
+        with self._lock:
+            entry = self._entries.get(url)
+            if entry is not None:
+                self._entries.move_to_end(url)
+
+        if entry is None and self.cache_dir is not None and os.path.exists(self._path(url)):
+            try:
+                with open(self._path(url), encoding = "utf-8") as f:
+                    entry = json.load(f)
+            except (OSError, ValueError):
+                return None
+
+            self._remember(url, entry)
+
+        return entry
+
+    def put(self, url: str, response: requests.Response) -> None:
+        """
+        Caches a response if it carries a validator.
+
+        Args:
+            url (str): The requested URL.
+            response (requests.Response): A successful response.
+        Returns:
+            None
+        """
+        etag = response.headers.get("ETag")
+        last_modified = response.headers.get("Last-Modified")
+
+        if etag is None and last_modified is None:
+            return
+
+        entry = {"etag" : etag, "last_modified" : last_modified, "text" : response.text}
+
+        self._remember(url, entry)
+
+        if self.cache_dir is not None:
+            with open(self._path(url), "w", encoding = "utf-8") as f:
+                json.dump(entry, f)
+
+
+class HttpClient:
+    """
+    A pooled HTTP session shared by all retrieval sources. Connections are kept alive and reused,
+    the number of connections per host is capped, transient failures are retried with exponential
+    backoff, and cached responses are revalidated with conditional requests instead of being
+    downloaded again.
+    """
+
+    def __init__(
+        self,
+        pool_connections: int = 32,
+        max_connections_per_host: int = 4,
+        timeout: float = 10,
+        cache_dir: Optional[str] = None,
+        cache_max_age_days: float = 14,
+        cache_max_size_mb: float = 256,
+        cache_max_memory_mb: float = 32,
+        retries: int = 2,
+        backoff_factor: float = 0.5
+    ):
+        """
+        Args:
+            pool_connections (int): Number of hosts whose connection pools are kept alive.
+            max_connections_per_host (int): Maximum number of concurrent connections to a single host. Further requests wait for a free connection.
+            timeout (float): Default request timeout in seconds.
+            cache_dir (Optional[str]): Directory in which cached responses are persisted.
+            cache_max_age_days (float): Days after which a persisted response that was not used is pruned.
+            cache_max_size_mb (float): Maximum size of the persisted responses in megabytes.
+            cache_max_memory_mb (float): Maximum size of the responses kept in memory in megabytes.
+            retries (int): Number of retries of a request failing to connect, or answered with 429 or a 5xx status.
+            backoff_factor (float): Base of the exponential backoff between retries, in seconds. A `Retry-After` header takes precedence.
+        """
+        self.timeout = timeout
+        self.cache = HttpCache(cache_dir, cache_max_age_days, cache_max_size_mb, cache_max_memory_mb)
+        self.session = requests.Session()
+        self.session.headers.update({"User-Agent" : USER_AGENT})
+
+        retry = Retry(
+            total = retries,
+            read = 0,
+            backoff_factor = backoff_factor,
+            status_forcelist = (429, 500, 502, 503, 504),
+            allowed_methods = frozenset({"GET", "HEAD"}),
+            # The last response is returned, and raised by `raise_for_status`, once the retries are exhausted
+            raise_on_status = False
+        )
+        adapter = HTTPAdapter(pool_connections = pool_connections, pool_maxsize = max_connections_per_host, pool_block = True, max_retries = retry)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def get_text(self, url: str, timeout: Optional[float] = None) -> str:
+        """
+        Downloads the content of a URL, revalidating any cached response with a conditional request.
+
+        Args:
+            url (str): The URL to download.
+            timeout (Optional[float]): Request timeout in seconds. The client's default is used if not provided.
+        Returns:
+            str: The content of the response.
+        """
+        cached = self.cache.get(url)
+        headers = {}
+
+        if cached is not None:
+            if cached["etag"] is not None:
+                headers["If-None-Match"] = cached["etag"]
+            if cached["last_modified"] is not None:
+                headers["If-Modified-Since"] = cached["last_modified"]
+
+        response = self.session.get(url, headers = headers, timeout = timeout if timeout is not None else self.timeout)
+
+        # The cached response is still valid
+        if response.status_code == 304 and cached is not None:
+            self.cache.touch(url)
+            return cached["text"]
+
+        response.raise_for_status()
+        self.cache.put(url, response)
+        return response.text
+
+    def close(self) -> None:
+        """Closes the pooled connections."""
+        self.session.close()
+
+
+_http_client: Optional[HttpClient] = None
+_http_client_lock = threading.Lock()
+
+
+def get_http_client() -> HttpClient:
+    """
+    Returns the HTTP client shared by all retrieval sources, creating it from the settings on first use.
+
+    Returns:
+        HttpClient: The shared HTTP client.
+    """
+    global _http_client
+
+    with _http_client_lock:
+        if _http_client is None:
+            _http_client = HttpClient(**settings.get("http", {}))
+
+    return _http_client
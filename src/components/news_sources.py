@@ -0,0 +1,208 @@
+import abc
+import time
+import asyncio
+import logging
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from langchain.docstore.document import Document
+from typing_extensions import AbstractSet, Dict, Iterator, List
+from src.components.schemas import AssetInformation, NewsSourceConfig
+from src.components.article_extractor import Extractor
+from src.components.retrieval_scheduler import RetrievalScheduler, RetrievalError, categorize_failure
+from src.components.profiler import profiling_enabled
+
+
+class SourceLimiter:
+    """
+    Bounds the retrievals of a source in flight and spaces them out to the source's rate limit, across all
+    symbols and threads of the process. A retrieval is the whole retrieval of a symbol's news from the source:
+    its headline listing and the downloads of its articles, which the limiter does not count one by one.
+    """
+
+    def __init__(self, max_concurrency: int, rate_limit: float):
+        """
+        Args:
+            max_concurrency (int): Maximum number of retrievals of the source in flight.
+            rate_limit (float): Maximum number of retrievals of the source started per minute, unlimited if 0.
+        """
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._interval = 60 / rate_limit if rate_limit > 0 else 0
+        self._next_start = 0.0
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def acquire(self, deadline: float) -> Iterator[None]:
+        """
+        Waits for a free slot and for the rate limit before a retrieval.
+
+        Args:
+            deadline (float): The monotonic time by which the retrieval of the symbol must finish.
+        Raises:
+            RetrievalError: The symbol's budget is exhausted before the retrieval can start.
+        """
+        if not self._slots.acquire(timeout = max(deadline - time.monotonic(), 0)):
+            raise RetrievalError("budget_exceeded", "no free slot of the source")
+
+        try:
+            with self._lock:
+                now = time.monotonic()
+                start = max(now, self._next_start)
+                if start >= deadline:
+                    raise RetrievalError("budget_exceeded", "rate limit of the source")
+                self._next_start = start + self._interval
+
+            time.sleep(start - now)
+            yield
+        finally:
+            self._slots.release()
+
+
+# Limiters of every source, kept for the lifetime of the process
+_source_limiters: Dict[str, SourceLimiter] = {}
+_source_limiters_lock = threading.Lock()
+
+
+def get_source_limiter(name: str, max_concurrency: int, rate_limit: float) -> SourceLimiter:
+    """
+    Returns the limiter of a source, creating it on first use.
+
+    Args:
+        name (str): Name of the source.
+        max_concurrency (int): Maximum number of retrievals of the source in flight.
+        rate_limit (float): Maximum number of retrievals of the source started per minute, unlimited if 0.
+    Returns:
+        SourceLimiter: The source's limiter.
+    """
+    with _source_limiters_lock:
+        if name not in _source_limiters:
+            _source_limiters[name] = SourceLimiter(max_concurrency, rate_limit)
+        return _source_limiters[name]
+
+
+class NewsSource(abc.ABC):
+    """
+    A source of news articles, retrieving the articles of the asset types and exchanges it supports. Sources
+    implement `retrieve`, a blocking retrieval that `fetch` runs in a worker thread within the source's
+    concurrency cap and rate limit. Sources with a native async client may override `fetch` instead.
+    """
+
+    def __init__(self, name: str, source_config: NewsSourceConfig):
+        """
+        Args:
+            name (str): Name of the source, keying its limiter.
+            source_config (NewsSourceConfig): Configuration of the source.
+        """
+        self.name = name
+        self.asset_types = set(source_config.asset_types)
+        self.exchanges = {exchange.upper() for exchange in source_config.exchanges}
+        self.freshness_days = source_config.freshness_days
+        self.limiter = get_source_limiter(name, source_config.max_concurrency, source_config.rate_limit)
+
+    def supports(self, asset_information: AssetInformation) -> bool:
+        """Returns whether the source has news of the asset. Sources without listed asset types or exchanges support all of them."""
+        return (
+            (not self.asset_types or asset_information.asset_type in self.asset_types)
+            and (not self.exchanges or asset_information.trading_exchange.upper() in self.exchanges)
+        )
+
+    @abc.abstractmethod
+    def retrieve(
+            self,
+            asset_information: AssetInformation,
+            executed_time: datetime,
+            extractor: Extractor,
+            scheduler: RetrievalScheduler,
+            deadline: float,
+            known_links: AbstractSet[str]
+    ) -> List[Document]:
+        """
+        Retrieves the news articles of an asset published within the source's freshness window.
+
+        Args:
+            asset_information (AssetInformation): Information about the trading asset.
+            executed_time (datetime): The time when the news retrieval is executed.
+            extractor (Extractor): Extractor used to retrieve the main text content of the news articles.
+            scheduler (RetrievalScheduler): The run's scheduler bounding the time spent on retrieval.
+            deadline (float): The monotonic time by which the retrieval of the symbol must finish.
+            known_links (AbstractSet[str]): Links of the articles already retrieved, which are skipped.
+        Returns:
+            List[Document]: The retrieved news articles.
+        """
+
+    def _limited_retrieve(
+            self,
+            asset_information: AssetInformation,
+            executed_time: datetime,
+            extractor: Extractor,
+            scheduler: RetrievalScheduler,
+            deadline: float,
+            known_links: AbstractSet[str]
+    ) -> List[Document]:
+        with self.limiter.acquire(deadline):
+            return self.retrieve(asset_information, executed_time, extractor, scheduler, deadline, known_links)
+
+    async def fetch(
+            self,
+            asset_information: AssetInformation,
+            executed_time: datetime,
+            extractor: Extractor,
+            scheduler: RetrievalScheduler,
+            deadline: float,
+            known_links: AbstractSet[str]
+    ) -> List[Document]:
+        """Retrieves the news articles of an asset within the source's limits. See `retrieve` for the arguments."""
+        return await asyncio.to_thread(
+            self._limited_retrieve, asset_information, executed_time, extractor, scheduler, deadline, known_links
+        )
+
+
+async def gather_news(
+        sources: List[NewsSource],
+        asset_information: AssetInformation,
+        executed_time: datetime,
+        extractor: Extractor,
+        scheduler: RetrievalScheduler,
+        deadline: float,
+        known_links: AbstractSet[str] = frozenset()
+) -> List[Document]:
+    """
+    Retrieves the news articles of an asset from every source supporting it concurrently, so that the
+    retrieval of a symbol takes as long as its slowest source rather than the sum of its sources.
+
+    Args:
+        sources (List[NewsSource]): The enabled news sources.
+        asset_information (AssetInformation): Information about the trading asset.
+        executed_time (datetime): The time when the news retrieval is executed.
+        extractor (Extractor): Extractor used to retrieve the main text content of the news articles.
+        scheduler (RetrievalScheduler): The run's scheduler bounding the time spent on retrieval.
+        deadline (float): The monotonic time by which the retrieval of the symbol must finish.
+        known_links (AbstractSet[str]): Links of the articles already retrieved, which are skipped.
+    Returns:
+        List[Document]: The retrieved news articles, in the order of the sources.
+    """
+    supported = [source for source in sources if source.supports(asset_information)]
+    arguments = (asset_information, executed_time, extractor, scheduler, deadline, known_links)
+
+    if profiling_enabled():
+        # cProfile only profiles the calling thread, so profiled runs retrieve the sources one at a time in it
+        logging.info(f"Profiling: retrieving the {len(supported)} sources of {asset_information.trading_symbol} sequentially")
+        results = []
+        for source in supported:
+            try:
+                results.append(source._limited_retrieve(*arguments))
+            except Exception as e:
+                results.append(e)
+    else:
+        results = await asyncio.gather(*(source.fetch(*arguments) for source in supported), return_exceptions = True)
+
+    news = []
+    for source, result in zip(supported, results):
+        # A failing source does not fail the others
+        if isinstance(result, Exception):
+            scheduler.record_failure(categorize_failure(result))
+            logging.warning(f"{source.name} failed for {asset_information.trading_symbol}: {result}")
+            continue
+        news += result
+
+    return news
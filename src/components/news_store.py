@@ -0,0 +1,148 @@
+import os
+import sqlite3
+import threading
+from datetime import datetime
+from zoneinfo import ZoneInfo
+from langchain.docstore.document import Document
+from typing_extensions import List, Set
+from src.components.article_store import ArticleStore, make_article_id
+
+
+def to_timestamp(date: datetime) -> str:
+    """
+    Formats a date as an ISO 8601 string in the Asia/Bangkok timezone, so that stored dates compare chronologically as strings.
+
+    Args:
+        date (datetime): A timezone-aware date.
+    Returns:
+        str: The formatted date.
+    """
+    return date.astimezone(ZoneInfo('Asia/Bangkok')).isoformat()
+
+
+class NewsStore:
+    """
+    A local SQLite store of news articles prefetched throughout the week. Articles are keyed by
+    trading symbol and article ID, so an article is stored only once per symbol.
+    """
+
+    def __init__(self, path: str):
+        """
+        Args:
+            path (str): Path of the SQLite database file.
+        """
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok = True)
+
+        self._connection = sqlite3.connect(path, check_same_thread = False)
+        self._lock = threading.Lock()
+
+        with self._lock, self._connection:
+            self._connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS articles (
+                    trading_symbol TEXT NOT NULL,
+                    article_id TEXT NOT NULL,
+                    title TEXT NOT NULL,
+                    link TEXT NOT NULL,
+                    source TEXT NOT NULL,
+                    published_date TEXT NOT NULL,
+                    body TEXT NOT NULL,
+                    fetched_at TEXT NOT NULL,
+                    PRIMARY KEY (trading_symbol, article_id)
+                )
+                """
+            )
+            self._connection.execute(
+                "CREATE INDEX IF NOT EXISTS articles_published ON articles (trading_symbol, published_date)"
+            )
+
+    def add_documents(self, trading_symbol: str, docs: List[Document]) -> int:
+        """
+        Stores retrieved news articles, ignoring those already stored for the symbol.
+
+        Args:
+            trading_symbol (str): The trading symbol the articles were retrieved for.
+            docs (List[Document]): A list of Document objects containing the news articles.
+        Returns:
+            int: The number of newly stored articles.
+        """
+        fetched_at = to_timestamp(datetime.now(ZoneInfo('Asia/Bangkok')))
+        rows = [
+            (
+                trading_symbol,
+                make_article_id(doc.metadata["link"], doc.metadata["title"]),
+                doc.metadata["title"],
+                doc.metadata["link"],
+                doc.metadata["source"],
+                to_timestamp(doc.metadata["published_date"]),
+                doc.page_content.strip(),
+                fetched_at
+            )
+            for doc in docs
+        ]
+
+        with self._lock, self._connection:
+            before = self._connection.total_changes
+            self._connection.executemany("INSERT OR IGNORE INTO articles VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+            return self._connection.total_changes - before
+
+    def known_links(self, trading_symbol: str, since: datetime) -> Set[str]:
+        """
+        Returns the links of the articles already stored for a symbol.
+
+        Args:
+            trading_symbol (str): The trading symbol.
+            since (datetime): Only articles published from this time are considered.
+        Returns:
+            Set[str]: The links of the stored articles.
+        """
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT link FROM articles WHERE trading_symbol = ? AND published_date >= ?",
+                (trading_symbol, to_timestamp(since))
+            ).fetchall()
+
+        return {row[0] for row in rows}
+
+    def load_articles(self, trading_symbol: str, since: datetime, article_store: ArticleStore) -> List[str]:
+        """
+        Loads the stored articles of a symbol into the run's article store, most recent first.
+
+        Args:
+            trading_symbol (str): The trading symbol.
+            since (datetime): Only articles published from this time are loaded.
+            article_store (ArticleStore): The run's store in which the articles are kept.
+        Returns:
+            List[str]: IDs of the loaded articles.
+        """
+        with self._lock:
+            rows = self._connection.execute(
+                """
+                SELECT title, link, source, published_date, body FROM articles
+                WHERE trading_symbol = ? AND published_date >= ?
+                ORDER BY published_date DESC
+                """,
+                (trading_symbol, to_timestamp(since))
+            ).fetchall()
+
+        return [
+            article_store.add(title, link, source, datetime.fromisoformat(published_date), body)
+            for title, link, source, published_date, body in rows
+        ]
+
+    def prune(self, before: datetime) -> int:
+        """
+        Deletes the articles published before the given time.
+
+        Args:
+            before (datetime): Articles published before this time are deleted.
+        Returns:
+            int: The number of deleted articles.
+        """
+        with self._lock, self._connection:
+            return self._connection.execute("DELETE FROM articles WHERE published_date < ?", (to_timestamp(before),)).rowcount
+
+    def close(self) -> None:
+        """Closes the database connection."""
+        self._connection.close()
@@ -0,0 +1,281 @@
+import os
+import io
+import time
+import pstats
+import cProfile
+import tracemalloc
+import threading
+import functools
+from collections import defaultdict
+from contextlib import contextmanager
+from typing_extensions import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+
+class StageProfile:
+    """The accumulated CPU profile, timings and allocations of a stage (a graph node or a retrieval source) for one symbol."""
+    __slots__ = ("calls", "wall_time", "cpu_time", "stats", "allocations")
+
+    def __init__(self):
+        self.calls = 0
+        self.wall_time = 0.0
+        self.cpu_time = 0.0
+        self.stats: Optional[pstats.Stats] = None
+        self.allocations: Dict[str, int] = defaultdict(int)
+
+
+class ActiveStage:
+    """A stage being profiled, along with the time spent in the stages nested in it."""
+    __slots__ = ("profile", "child_wall_time", "child_cpu_time")
+
+    def __init__(self):
+        self.profile = cProfile.Profile()
+        self.child_wall_time = 0.0
+        self.child_cpu_time = 0.0
+
+
+# Files whose allocations are made by the profilers rather than by the profiled code
+PROFILER_FILES = {tracemalloc.__file__, cProfile.__file__, pstats.__file__, __file__}
+
+
+class Profiler:
+    """
+    Profiles the graph nodes and retrieval sources of a run with `cProfile` and `tracemalloc`. Profiles are
+    kept per symbol and per stage. Nested stages are profiled separately, so that the time of a retrieval
+    source is not counted again in the node that calls it. Only the calling thread is profiled by `cProfile`;
+    the time spent waiting on requests running in worker threads is reported as wait time. Snapshots are
+    costly on large heaps, so profiled runs are noticeably slower than regular runs.
+    """
+
+    def __init__(self, output_dir: str, top: int = 25):
+        """
+        Args:
+            output_dir (str): Directory in which the profile files and the summary are written.
+            top (int): Number of functions and allocation sites listed in the reports.
+        """
+        self.output_dir = output_dir
+        self.top = top
+        self.symbol = "run"
+        self.profiles: Dict[Tuple[str, str], StageProfile] = defaultdict(StageProfile)
+        self._active: List[ActiveStage] = []
+        self._thread = threading.get_ident()
+
+    def profile(self, stage: str, function: Callable, *args: Any, **kwargs: Any) -> Any:
+        """
+        Runs a function under the profilers and accumulates its profile into the stage of the current symbol.
+
+        Args:
+            stage (str): Name of the stage.
+            function (Callable): The function to run.
+            *args (Any): Positional arguments of the function.
+            **kwargs (Any): Keyword arguments of the function.
+        Returns:
+            Any: The result of the function.
+        """
+        # cProfile only supports a single active profiler per thread
+        if threading.get_ident() != self._thread:
+            return function(*args, **kwargs)
+
+        # Pause the enclosing stage, so that the nested stage is not counted twice
+        if self._active:
+            self._active[-1].profile.disable()
+
+        frame = ActiveStage()
+        outer_wall_start, outer_cpu_start = time.perf_counter(), time.thread_time()
+        before = tracemalloc.take_snapshot()
+        wall_start, cpu_start = time.perf_counter(), time.thread_time()
+        self._active.append(frame)
+        frame.profile.enable()
+
+        try:
+            return function(*args, **kwargs)
+        finally:
+            frame.profile.disable()
+            self._active.pop()
+            # Nested stages, including their profiling overhead, are only counted in their own stage
+            wall_time = time.perf_counter() - wall_start - frame.child_wall_time
+            cpu_time = time.thread_time() - cpu_start - frame.child_cpu_time
+            self._record(stage, frame.profile, wall_time, cpu_time, tracemalloc.take_snapshot().compare_to(before, "lineno"))
+
+            if self._active:
+                self._active[-1].child_wall_time += time.perf_counter() - outer_wall_start
+                self._active[-1].child_cpu_time += time.thread_time() - outer_cpu_start
+                self._active[-1].profile.enable()
+
+    def _record(self, stage: str, profile: cProfile.Profile, wall_time: float, cpu_time: float, differences: List) -> None:
+        stage_profile = self.profiles[(self.symbol, stage)]
+        stage_profile.calls += 1
+        stage_profile.wall_time += wall_time
+        stage_profile.cpu_time += cpu_time
+
+        if stage_profile.stats is None:
+            stage_profile.stats = pstats.Stats(profile)
+        else:
+            stage_profile.stats.add(profile)
+
+        for difference in differences:
+            frame = difference.traceback[0]
+            # Leave out the allocations of the profilers themselves
+            if difference.size_diff > 0 and frame.filename not in PROFILER_FILES:
+                stage_profile.allocations[f"{frame.filename}:{frame.lineno}"] += difference.size_diff
+
+    def _stats_text(self, stats: pstats.Stats, sort_key: str) -> str:
+        stream = io.StringIO()
+        stats.stream = stream
+        stats.sort_stats(sort_key).print_stats(self.top)
+        return stream.getvalue()
+
+    def _stage_table(self, profiles: Dict[str, StageProfile]) -> str:
+        lines = [f"{'stage':<32} {'calls':>6} {'wall (s)':>10} {'cpu (s)':>10} {'wait (s)':>10} {'alloc (MiB)':>12}"]
+
+        for stage, stage_profile in sorted(profiles.items(), key = lambda item: item[1].wall_time, reverse = True):
+            allocated = sum(stage_profile.allocations.values()) / 2 ** 20
+            lines.append(
+                f"{stage:<32} {stage_profile.calls:>6} {stage_profile.wall_time:>10.2f} {stage_profile.cpu_time:>10.2f} "
+                f"{max(stage_profile.wall_time - stage_profile.cpu_time, 0):>10.2f} {allocated:>12.2f}"
+            )
+
+        return "\n".join(lines)
+
+    def _allocation_table(self, allocations: Dict[str, int]) -> str:
+        ranked = sorted(allocations.items(), key = lambda item: item[1], reverse = True)[:self.top]
+        return "\n".join(f"{size / 2 ** 20:>10.2f} MiB  {site}" for site, size in ranked)
+
+    def write_reports(self) -> str:
+        """
+        Writes a `.prof` file and a text report per symbol, along with a summary ranking the hottest
+        functions and the largest allocation sites of the run.
+
+        Returns:
+            str: Path of the summary.
+        """
+        os.makedirs(self.output_dir, exist_ok = True)
+        symbols = sorted({symbol for symbol, _ in self.profiles})
+        run_stats: Optional[pstats.Stats] = None
+        run_allocations: Dict[str, int] = defaultdict(int)
+        run_stages: Dict[str, StageProfile] = defaultdict(StageProfile)
+
+        for symbol in symbols:
+            profiles = {stage : profile for (s, stage), profile in self.profiles.items() if s == symbol}
+            symbol_stats = pstats.Stats()
+            symbol_allocations: Dict[str, int] = defaultdict(int)
+
+            for stage, stage_profile in profiles.items():
+                symbol_stats.add(stage_profile.stats)
+                for site, size in stage_profile.allocations.items():
+                    symbol_allocations[site] += size
+                    run_allocations[site] += size
+
+                # Accumulate the stages over all symbols
+                run_stage = run_stages[stage]
+                run_stage.calls += stage_profile.calls
+                run_stage.wall_time += stage_profile.wall_time
+                run_stage.cpu_time += stage_profile.cpu_time
+                for site, size in stage_profile.allocations.items():
+                    run_stage.allocations[site] += size
+
+            if run_stats is None:
+                run_stats = pstats.Stats()
+            run_stats.add(symbol_stats)
+
+            file_name = symbol.replace("/", "_")
+            symbol_stats.dump_stats(os.path.join(self.output_dir, f"{file_name}.prof"))
+
+            with open(os.path.join(self.output_dir, f"{file_name}.txt"), "w") as f:
+                f.write(f"# Stages of {symbol}\n{self._stage_table(profiles)}\n\n")
+                f.write(f"# Largest allocation sites of {symbol}\n{self._allocation_table(symbol_allocations)}\n\n")
+                for stage, stage_profile in sorted(profiles.items(), key = lambda item: item[1].wall_time, reverse = True):
+                    f.write(f"# Hottest functions of {stage}\n{self._stats_text(stage_profile.stats, 'tottime')}\n")
+                    f.write(f"# Largest allocations of {stage}\n{self._allocation_table(stage_profile.allocations)}\n\n")
+
+        summary_path = os.path.join(self.output_dir, "summary.txt")
+        with open(summary_path, "w") as f:
+            f.write(f"# Stages over {len(symbols)} symbols\n{self._stage_table(run_stages)}\n\n")
+            if run_stats is not None:
+                f.write(f"# Hottest functions by own time\n{self._stats_text(run_stats, 'tottime')}\n")
+                f.write(f"# Hottest functions by cumulative time\n{self._stats_text(run_stats, 'cumulative')}\n")
+            f.write(f"# Largest allocation sites\n{self._allocation_table(run_allocations)}\n")
+
+        return summary_path
+
+
+# The profiler of the run, if profiling is enabled
+_profiler: Optional[Profiler] = None
+
+
+def start_profiler(output_dir: str) -> Profiler:
+    """
+    Enables profiling for the rest of the process.
+
+    Args:
+        output_dir (str): Directory in which the profile files and the summary are written.
+    Returns:
+        Profiler: The run's profiler.
+    """
+    global _profiler
+
+    tracemalloc.start()
+    _profiler = Profiler(output_dir)
+    return _profiler
+
+
+def stop_profiler() -> Optional[str]:
+    """
+    Disables profiling and writes the reports.
+
+    Returns:
+        Optional[str]: Path of the summary, or None if profiling was not enabled.
+    """
+    global _profiler
+
+    if _profiler is None:
+        return None
+
+    summary_path = _profiler.write_reports()
+    tracemalloc.stop()
+    _profiler = None
+    return summary_path
+
+
+def profiling_enabled() -> bool:
+    """Returns whether the run is profiled."""
+    return _profiler is not None
+
+
+def profile_call(stage: str, function: Callable, *args: Any, **kwargs: Any) -> Any:
+    """
+    Runs a function, profiling it as the given stage if profiling is enabled.
+
+    Args:
+        stage (str): Name of the stage.
+        function (Callable): The function to run.
+        *args (Any): Positional arguments of the function.
+        **kwargs (Any): Keyword arguments of the function.
+    Returns:
+        Any: The result of the function.
+    """
+    if _profiler is None:
+        return function(*args, **kwargs)
+    return _profiler.profile(stage, function, *args, **kwargs)
+
+
+def profiled(function: Callable) -> Callable:
+    """Decorates a function so that it is profiled as a stage named after it when profiling is enabled."""
+    @functools.wraps(function)
+    def wrapper(*args: Any, **kwargs: Any) -> Any:
+        return profile_call(function.__name__, function, *args, **kwargs)
+
+    return wrapper
+
+
+@contextmanager
+def profiling_symbol(symbol: str) -> Iterator[None]:
+    """Attributes the stages profiled within the context to the given symbol."""
+    if _profiler is None:
+        yield
+        return
+
+    previous, _profiler.symbol = _profiler.symbol, symbol
+    try:
+        yield
+    finally:
+        _profiler.symbol = previous
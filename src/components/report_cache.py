@@ -0,0 +1,178 @@
+import os
+import json
+import hashlib
+import sqlite3
+import threading
+from datetime import datetime
+from zoneinfo import ZoneInfo
+from langchain_core.messages import BaseMessage, HumanMessage
+from typing_extensions import Dict, List, Optional, Tuple
+from src.prompts.analyse_sentiment import update_request
+from src.components.article_store import ArticleStore
+from src.components.analyse_sentiment import format_report
+from src.components.schemas import Report
+
+
+def content_hashes(article_ids: List[str], article_store: ArticleStore) -> Dict[str, str]:
+    """
+    Hashes the content of each news article, so that an article whose text changed is not mistaken for the same article.
+
+    Args:
+        article_ids (List[str]): IDs of the news articles.
+        article_store (ArticleStore): The run's store holding the news articles.
+    Returns:
+        Dict[str, str]: The content hash of each article, keyed by article ID.
+    """
+    return {
+        article_id : hashlib.sha1(article_store.get(article_id).body.encode("utf-8")).hexdigest()
+        for article_id in article_ids
+    }
+
+
+def article_fingerprint(hashes: Dict[str, str]) -> str:
+    """
+    Computes a fingerprint of a set of news articles, independent of their order.
+
+    Args:
+        hashes (Dict[str, str]): The content hash of each article, keyed by article ID.
+    Returns:
+        str: The fingerprint of the article set.
+    """
+    lines = sorted(f"{article_id}:{content_hash}" for article_id, content_hash in hashes.items())
+    return hashlib.sha256("\n".join(lines).encode("utf-8")).hexdigest()
+
+
+class CachedReport:
+    """The report and HTML section last generated for a symbol, along with the article set they were generated from."""
+    __slots__ = ("fingerprint", "article_ids", "hashes", "report", "section")
+
+    def __init__(self, fingerprint: str, article_ids: List[str], hashes: Dict[str, str], report: Report, section: str):
+        self.fingerprint = fingerprint
+        self.article_ids = article_ids
+        self.hashes = hashes
+        self.report = report
+        self.section = section
+
+    def overlap(self, hashes: Dict[str, str]) -> float:
+        """
+        Computes the share of the given articles that the cached report was generated from, with unchanged content.
+
+        Args:
+            hashes (Dict[str, str]): The content hash of each current article, keyed by article ID.
+        Returns:
+            float: The share of unchanged articles, between 0 and 1.
+        """
+        if not hashes:
+            return 0.0
+        unchanged = sum(1 for article_id, content_hash in hashes.items() if self.hashes.get(article_id) == content_hash)
+        return unchanged / len(hashes)
+
+
+def prepare_update(cached: CachedReport, hashes: Dict[str, str]) -> Tuple[List[str], List[BaseMessage]]:
+    """
+    Prepares a cheaper update pass of a cached report. Only the still-listed articles the report cited and
+    the new articles are passed to the model, along with the cached report and a request to update it.
+
+    Args:
+        cached (CachedReport): The report previously generated for the symbol.
+        hashes (Dict[str, str]): The content hash of each current article, keyed by article ID.
+    Returns:
+        Tuple[List[str], List[BaseMessage]]: IDs of the articles to analyse, and the messages to start the analysis from.
+    """
+    previous_message = format_report(cached.report, cached.article_ids)
+    kept_ids = [
+        article_id for article_id in previous_message.additional_kwargs["cited_article_ids"]
+        if article_id in hashes and cached.hashes.get(article_id) == hashes[article_id]
+    ]
+    new_ids = [article_id for article_id, content_hash in hashes.items() if cached.hashes.get(article_id) != content_hash]
+    article_ids = kept_ids + new_ids
+
+    # Re-reference the cited articles that are still listed, numbered by their position in the new article list
+    previous_message.additional_kwargs["cited_article_ids"] = kept_ids
+    new_articles = ", ".join(str(i) for i in range(len(kept_ids), len(article_ids))) or "none"
+    return article_ids, [previous_message, HumanMessage(content = update_request.format(new_articles = new_articles))]
+
+
+class ReportCache:
+    """
+    A local SQLite cache of the last report generated for each symbol, keyed by a fingerprint of the
+    article set it was generated from. An unchanged article set reuses the cached report.
+    """
+
+    def __init__(self, path: str):
+        """
+        Args:
+            path (str): Path of the SQLite database file.
+        """
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok = True)
+
+        self._connection = sqlite3.connect(path, check_same_thread = False)
+        self._lock = threading.Lock()
+
+        with self._lock, self._connection:
+            self._connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS reports (
+                    trading_symbol TEXT PRIMARY KEY,
+                    fingerprint TEXT NOT NULL,
+                    article_ids TEXT NOT NULL,
+                    hashes TEXT NOT NULL,
+                    report TEXT NOT NULL,
+                    section TEXT NOT NULL,
+                    generated_at TEXT NOT NULL
+                )
+                """
+            )
+
+    def get(self, trading_symbol: str) -> Optional[CachedReport]:
+        """
+        Returns the last report generated for a symbol.
+
+        Args:
+            trading_symbol (str): The trading symbol.
+        Returns:
+            Optional[CachedReport]: The cached report, or None if no report is cached for the symbol.
+        """
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT fingerprint, article_ids, hashes, report, section FROM reports WHERE trading_symbol = ?",
+                (trading_symbol,)
+            ).fetchone()
+
+        if row is None:
+            return None
+
+        fingerprint, article_ids, hashes, report, section = row
+        return CachedReport(fingerprint, json.loads(article_ids), json.loads(hashes), Report.model_validate_json(report), section)
+
+    def put(self, trading_symbol: str, article_ids: List[str], hashes: Dict[str, str], report: Report, section: str) -> None:
+        """
+        Caches the report generated for a symbol, replacing the previous one.
+
+        Args:
+            trading_symbol (str): The trading symbol.
+            article_ids (List[str]): IDs of the news articles the report was generated from, in prompt order.
+            hashes (Dict[str, str]): The content hash of each article, keyed by article ID.
+            report (Report): The structured report.
+            section (str): The HTML section of the report.
+        Returns:
+            None
+        """
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO reports VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    trading_symbol,
+                    article_fingerprint(hashes),
+                    json.dumps(article_ids),
+                    json.dumps(hashes),
+                    report.model_dump_json(),
+                    section,
+                    datetime.now(ZoneInfo('Asia/Bangkok')).isoformat()
+                )
+            )
+
+    def close(self) -> None:
+        """Closes the database connection."""
+        self._connection.close()
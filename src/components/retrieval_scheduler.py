@@ -0,0 +1,338 @@
+import time
+import logging
+import threading
+import requests
+from collections import Counter, deque
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError, wait, FIRST_COMPLETED
+from urllib.parse import urlparse
+from typing_extensions import Any, Callable, Deque, Dict, List, Optional
+from src.components.article_extractor import download_html
+
+
+class RetrievalError(Exception):
+    """Raised when a retrieval request fails. The category is used to report failure counts."""
+
+    def __init__(self, category: str, message: str = ""):
+        super().__init__(message or category)
+        self.category = category
+
+
+def categorize_failure(error: Exception) -> str:
+    """
+    Maps an exception raised during retrieval to a failure category.
+
+    Args:
+        error (Exception): The raised exception.
+    Returns:
+        str: The failure category.
+    """
+    if isinstance(error, RetrievalError):
+        return error.category
+    if isinstance(error, (requests.Timeout, FutureTimeoutError, TimeoutError)):
+        return "timeout"
+    if isinstance(error, requests.HTTPError):
+        return "http_error"
+    if isinstance(error, requests.ConnectionError):
+        return "connection_error"
+    if isinstance(error, (KeyError, IndexError, ValueError, TypeError)):
+        return "parse_error"
+    return "other"
+
+
+def is_host_failure(error: Optional[Exception]) -> bool:
+    """
+    Returns whether a failed request indicts its host: timeouts, connection errors, and server errors or
+    rate limiting. Client errors such as a missing page do not, since the host answered.
+
+    Args:
+        error (Optional[Exception]): The raised exception, or None if the request did not finish in time.
+    Returns:
+        bool: Whether the failure counts towards the host's circuit breaker.
+    """
+    if error is None:
+        return True
+    if isinstance(error, requests.HTTPError):
+        status = error.response.status_code if error.response is not None else None
+        return status is None or status == 429 or status >= 500
+    return categorize_failure(error) in ("timeout", "connection_error")
+
+
+class _BoundedCall:
+    """A call running on its own thread, holding one of the slots of its pool until released."""
+
+    def __init__(self, slots: threading.BoundedSemaphore):
+        self.future = Future()
+        self._slots = slots
+        self._released = False
+        self._lock = threading.Lock()
+
+    def release(self) -> None:
+        """Frees the call's slot. Releasing it again, once the call returns, has no effect."""
+        with self._lock:
+            if self._released:
+                return
+            self._released = True
+        self._slots.release()
+
+
+class _BoundedThreads:
+    """
+    Runs blocking calls on their own daemon threads, at most `max_calls` at once. A call's slot is freed when it
+    returns or when its caller stops waiting for it. Threads cannot be cancelled, so a hung call keeps its thread
+    but no longer holds the capacity of later calls.
+    """
+
+    def __init__(self, max_calls: int, thread_name_prefix: str):
+        """
+        Args:
+            max_calls (int): Maximum number of calls holding a slot.
+            thread_name_prefix (str): Prefix of the names of the threads.
+        """
+        self._slots = threading.BoundedSemaphore(max_calls)
+        self._thread_name_prefix = thread_name_prefix
+        self._count = 0
+        self._closed = False
+
+    def submit(self, function: Callable, *args: Any, timeout: Optional[float], **kwargs: Any) -> Optional[_BoundedCall]:
+        """
+        Starts a call once a slot is free.
+
+        Args:
+            function (Callable): The function to call.
+            *args (Any): Positional arguments of the function.
+            timeout (Optional[float]): Seconds to wait for a free slot. Waits indefinitely if None.
+            **kwargs (Any): Keyword arguments of the function.
+        Returns:
+            Optional[_BoundedCall]: The started call, or None if no slot was freed in time.
+        """
+        if self._closed:
+            raise RuntimeError("cannot schedule new calls after shutdown")
+        if not self._slots.acquire(timeout = timeout):
+            return None
+
+        call = _BoundedCall(self._slots)
+        call.future.set_running_or_notify_cancel()
+
+        def target():
+            try:
+                result = function(*args, **kwargs)
+            except BaseException as e:
+                call.future.set_exception(e)
+            else:
+                call.future.set_result(result)
+            finally:
+                call.release()
+
+        self._count += 1
+        threading.Thread(target = target, name = f"{self._thread_name_prefix}_{self._count}", daemon = True).start()
+        return call
+
+    def shutdown(self) -> None:
+        """Stops accepting calls. Calls in flight run to completion on their daemon threads."""
+        self._closed = True
+
+
+class CircuitBreaker:
+    """
+    Trips on hosts that fail repeatedly. Once tripped, a host is skipped for the rest of the run.
+    """
+
+    def __init__(self, failure_threshold: int = 3):
+        """
+        Args:
+            failure_threshold (int): Number of consecutive failures after which a host is skipped.
+        """
+        self.failure_threshold = failure_threshold
+        self._consecutive_failures: Counter = Counter()
+        self._open_hosts = set()
+        self._lock = threading.Lock()
+
+    def allow(self, host: str) -> bool:
+        """Returns whether requests to the host are still allowed."""
+        with self._lock:
+            return host not in self._open_hosts
+
+    def record_success(self, host: str) -> None:
+        """Resets the consecutive failure count of the host."""
+        with self._lock:
+            self._consecutive_failures[host] = 0
+
+    def record_failure(self, host: str) -> None:
+        """Counts a failure of the host, tripping the breaker once the threshold is reached."""
+        with self._lock:
+            self._consecutive_failures[host] += 1
+
+            if self._consecutive_failures[host] >= self.failure_threshold and host not in self._open_hosts:
+                self._open_hosts.add(host)
+                logging.warning(f"Circuit breaker tripped for {host}, skipping it for the rest of the run")
+
+    @property
+    def open_hosts(self) -> set:
+        with self._lock:
+            return set(self._open_hosts)
+
+
+class RetrievalScheduler:
+    """
+    Schedules the retrieval requests of a run. Each symbol gets a total time budget, each request
+    a timeout, requests to slow hosts are hedged with a duplicate request, and hosts that keep
+    failing are skipped for the rest of the run. One scheduler is shared by all symbols of a run.
+    A call abandoned at its budget frees its slot, so that hung calls do not starve later symbols.
+    """
+
+    def __init__(
+        self,
+        symbol_budget: float = 180,
+        request_timeout: float = 10,
+        hedge_after: float = 4,
+        max_workers: int = 8,
+        failure_threshold: int = 3
+    ):
+        """
+        Args:
+            symbol_budget (float): Total time budget in seconds for retrieving the news of a single symbol.
+            request_timeout (float): Timeout in seconds of a single request.
+            hedge_after (float): Seconds after which a duplicate request is sent, until enough latencies of the host are observed.
+            max_workers (int): Maximum number of requests, and of source calls, in flight.
+            failure_threshold (int): Number of consecutive failures after which a host is skipped.
+        """
+        self.symbol_budget = symbol_budget
+        self.request_timeout = request_timeout
+        self.hedge_after = hedge_after
+        self.circuit_breaker = CircuitBreaker(failure_threshold)
+        self.failures: Counter = Counter()
+        self._latencies: Dict[str, Deque[float]] = {}
+        self._lock = threading.Lock()
+        self._request_threads = _BoundedThreads(max_workers, "retrieval-request")
+        self._source_threads = _BoundedThreads(max_workers, "retrieval-source")
+
+    def deadline(self) -> float:
+        """
+        Starts the time budget of a symbol.
+
+        Returns:
+            float: The monotonic time by which the retrieval of the symbol must finish.
+        """
+        return time.monotonic() + self.symbol_budget
+
+    def record_failure(self, category: str) -> None:
+        """Counts a failure of the given category."""
+        with self._lock:
+            self.failures[category] += 1
+
+    def _remaining(self, deadline: float) -> float:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise RetrievalError("budget_exceeded")
+        return remaining
+
+    def _hedge_delay(self, host: str) -> float:
+        """Returns the delay before hedging a request to the host: its 95th percentile latency once known."""
+        with self._lock:
+            latencies = sorted(self._latencies.get(host, []))
+
+        if len(latencies) < 5:
+            return self.hedge_after
+        return latencies[int(0.95 * (len(latencies) - 1))]
+
+    def _record_latency(self, host: str, latency: float) -> None:
+        with self._lock:
+            self._latencies.setdefault(host, deque(maxlen = 50)).append(latency)
+
+    def _timed_download(self, url: str, timeout: float) -> str:
+        start = time.monotonic()
+        html = download_html(url, timeout = timeout)
+        self._record_latency(urlparse(url).netloc, time.monotonic() - start)
+        return html
+
+    def fetch(self, url: str, deadline: float) -> str:
+        """
+        Downloads a page within the symbol's budget, hedging the request if the host is slow.
+
+        Args:
+            url (str): The URL to download.
+            deadline (float): The monotonic time by which the retrieval of the symbol must finish.
+        Raises:
+            RetrievalError: The host is skipped, the budget is exhausted or the request failed.
+        Returns:
+            str: The content of the page.
+        """
+        host = urlparse(url).netloc
+
+        if not self.circuit_breaker.allow(host):
+            raise RetrievalError("circuit_open", host)
+
+        timeout = min(self.request_timeout, self._remaining(deadline))
+        call = self._request_threads.submit(self._timed_download, url, timeout, timeout = self._remaining(deadline))
+        if call is None:
+            raise RetrievalError("budget_exceeded", url)
+
+        calls: List[_BoundedCall] = [call]
+        try:
+            done, _ = wait({call.future}, timeout = min(self._hedge_delay(host), timeout))
+
+            # Hedge the request with a duplicate if the host is slower than usual, unless every slot is taken
+            if not done and time.monotonic() + 1 < deadline:
+                hedge = self._request_threads.submit(self._timed_download, url, timeout, timeout = 0)
+                if hedge is not None:
+                    calls.append(hedge)
+
+            error = None
+            futures = {call.future for call in calls}
+            end = min(time.monotonic() + timeout, deadline)
+            while futures:
+                done, futures = wait(futures, timeout = max(end - time.monotonic(), 0), return_when = FIRST_COMPLETED)
+                if not done:
+                    break
+
+                for future in done:
+                    if future.exception() is None:
+                        self.circuit_breaker.record_success(host)
+                        return future.result()
+                    error = future.exception()
+        finally:
+            for call in calls:
+                call.release()
+
+        # Client errors, such as a missing page, do not count against the host
+        if futures or is_host_failure(error):
+            self.circuit_breaker.record_failure(host)
+        raise RetrievalError(categorize_failure(error) if error is not None else "timeout", f"{url}: {error}")
+
+    def run(self, function: Callable, *args: Any, deadline: float, **kwargs: Any) -> Any:
+        """
+        Runs a blocking call, such as a source's headline listing, within the symbol's budget.
+
+        Args:
+            function (Callable): The function to run.
+            *args (Any): Positional arguments of the function.
+            deadline (float): The monotonic time by which the retrieval of the symbol must finish.
+            **kwargs (Any): Keyword arguments of the function.
+        Raises:
+            RetrievalError: The budget is exhausted or the call failed.
+        Returns:
+            Any: The result of the function.
+        """
+        call = self._source_threads.submit(function, *args, timeout = self._remaining(deadline), **kwargs)
+        if call is None:
+            raise RetrievalError("budget_exceeded")
+
+        try:
+            return call.future.result(timeout = self._remaining(deadline))
+        except RetrievalError:
+            raise
+        except Exception as e:
+            raise RetrievalError(categorize_failure(e), str(e)) from e
+        finally:
+            call.release()
+
+    def failure_counts(self) -> Dict[str, int]:
+        """Returns the number of failures of the run by category."""
+        with self._lock:
+            return dict(self.failures)
+
+    def shutdown(self) -> None:
+        """Stops accepting calls without waiting for requests still in flight."""
+        self._request_threads.shutdown()
+        self._source_threads.shutdown()
+
@@ -1,48 +1,103 @@
-from newspaper import Article
 from finvizfinance.quote import finvizfinance
+from finvizfinance import util as finviz_util
 import yfinance as yf
 from tradingview_scraper.symbols.news import NewsScraper
 from datetime import datetime, timedelta
 from langchain.docstore.document import Document
 from zoneinfo import ZoneInfo
 from src.components.schemas import State, AssetInformation
-from typing_extensions import List
+from src.components.article_store import ArticleStore
+from src.components.article_archive import archive_articles
+from src.components.article_extractor import Extractor
+from src.components.http_client import get_http_client
+from src.components.retrieval_scheduler import RetrievalScheduler, RetrievalError, categorize_failure
+from src.components.news_sources import NewsSource, gather_news
+from src.components.fixtures import run_time
+from src.components.profiler import profiled
+from src.components.run_summary import record_articles
+from lxml import html as lxml_html
+import pandas as pd
+from collections import Counter
+from typing_extensions import AbstractSet, List, Dict
 from langsmith import traceable
-
-def retrieve_news(state : State, asset_information : AssetInformation) -> State:
+import asyncio
+import logging
+import time
+
+def retrieve_news(
+        state : State,
+        asset_information : AssetInformation,
+        article_store : ArticleStore,
+        extractor : Extractor,
+        scheduler : RetrievalScheduler,
+        sources : List[NewsSource]
+) -> State:
     """
     Retrieves and filters news articles relevant to the specified trading symbol and asset type.
     Args:
         state (State): The current pipeline state.
         asset_information (AssetInformation): Information about the trading asset.
+        article_store (ArticleStore): The run's store in which the retrieved articles are kept.
+        extractor (Extractor): Extractor used to retrieve the main text content of the news articles.
+        scheduler (RetrievalScheduler): The run's scheduler bounding the time spent on retrieval.
+        sources (List[NewsSource]): The enabled news sources.
     Returns:
         State: An updated state of the graph.
     """
-    # Get current time in Asia/Bangkok timezone
-    current_time = datetime.now(ZoneInfo('Asia/Bangkok'))
-    # Retrieve news articles from various sources
-    yfinance_news = retrieve_yfinance_news(current_time, asset_information.trading_symbol, asset_information.asset_type)
-    tv_news = retrieve_tv_news(executed_time=current_time, trading_symbol=asset_information.trading_symbol, trading_exchange=asset_information.trading_exchange)
+    # The news articles were already retrieved before the graph was invoked
+    if state.article_ids:
+        return {}
+
+    # Time the retrieval and count its failures
+    start = time.monotonic()
+    failures_before = Counter(scheduler.failure_counts())
+
+    news = collect_news(asset_information, extractor, scheduler, sources)
+    # Keep the article content in the store and only pass the article IDs through the state
+    article_ids = [article_store.add_document(doc) for doc in news]
+    archive_articles(asset_information.trading_symbol, article_ids, article_store)
+
+    failures = Counter(scheduler.failure_counts()) - failures_before
+    logging.info(
+        f"Retrieved {len(article_ids)} articles for {asset_information.trading_symbol} "
+        f"in {time.monotonic() - start:.1f}s, failures: {dict(failures)}"
+    )
+
+    return {'article_ids' : article_ids}
+
+def collect_news(
+        asset_information : AssetInformation,
+        extractor : Extractor,
+        scheduler : RetrievalScheduler,
+        sources : List[NewsSource],
+        known_links : AbstractSet[str] = frozenset()
+) -> List[Document]:
+    """
+    Retrieves the recent news articles from every source supporting the asset, within the symbol's time budget.
+
+    Args:
+        asset_information (AssetInformation): Information about the trading asset.
+        extractor (Extractor): Extractor used to retrieve the main text content of the news articles.
+        scheduler (RetrievalScheduler): The scheduler bounding the time spent on retrieval.
+        sources (List[NewsSource]): The enabled news sources.
+        known_links (AbstractSet[str]): Links of the articles already retrieved, which are not downloaded again.
 
-    news = yfinance_news + tv_news
+    Returns:
+        List[Document]: A list of Document objects containing the retrieved news articles, without duplicates.
+    """
+    # Get the time of the run in Asia/Bangkok timezone, which is the recorded run's time when replaying
+    current_time = run_time()
+    # Start the retrieval time budget of the symbol
+    deadline = scheduler.deadline()
 
-    if asset_information.asset_type == "stocks":
-        finviz_news = retrieve_finviz_news(executed_time=current_time, trading_symbol=asset_information.trading_symbol)
-        news += finviz_news
+    # Retrieve news articles from the sources supporting the asset concurrently
+    news = asyncio.run(gather_news(sources, asset_information, current_time, extractor, scheduler, deadline, known_links))
 
     # Filter out duplicate news articles based on their links
     filtered_news = filter_trading_news(news)
-    # Format the filtered news articles for further processing
-    formatted_news = "\n\n".join([
-        f"""========== News Article {i} ==========
-        News Title: {doc.metadata['title']}
-        News Content: {doc.page_content.strip()}""" 
-        for i,doc in enumerate(filtered_news)
-    ])
-    
-    return {'retrieved_news' : filtered_news, "formatted_news" : formatted_news}
-
-    
+    record_articles(asset_information.trading_symbol, fetched = len(news), deduplicated = len(news) - len(filtered_news))
+    return filtered_news
+
 
 @traceable
 def filter_trading_news(docs : List) -> List:
@@ -69,8 +124,54 @@ def filter_trading_news(docs : List) -> List:
 
     return filtered_docs
 
+def download_article(link : str, extractor : Extractor, scheduler : RetrievalScheduler, deadline : float) -> str:
+    """
+    Downloads a news article and extracts its main text content.
+
+    Args:
+        link (str): URL of the news article.
+        extractor (Extractor): Extractor used to retrieve the main text content of the news article.
+        scheduler (RetrievalScheduler): The run's scheduler bounding the time spent on retrieval.
+        deadline (float): The monotonic time by which the retrieval of the symbol must finish.
+
+    Returns:
+        str: The text content of the news article.
+    """
+    html = scheduler.fetch(link, deadline)
+    body = extractor.extract(html, link)
+
+    if len(body) == 0:
+        raise RetrievalError("empty_body", link)
+
+    return body
+
+def record_failure(scheduler : RetrievalScheduler, error : Exception) -> bool:
+    """
+    Counts a failed retrieval and decides whether the source should keep going.
+
+    Args:
+        scheduler (RetrievalScheduler): The run's scheduler bounding the time spent on retrieval.
+        error (Exception): The raised exception.
+
+    Returns:
+        bool: False if the symbol's time budget is exhausted and the source should stop, True otherwise.
+    """
+    category = categorize_failure(error)
+    scheduler.record_failure(category)
+    return category != "budget_exceeded"
+
+@profiled
 @traceable
-def retrieve_yfinance_news(executed_time : datetime, trading_symbol : str, asset_type : str) -> List:
+def retrieve_yfinance_news(
+        executed_time : datetime,
+        trading_symbol : str,
+        asset_type : str,
+        extractor : Extractor,
+        scheduler : RetrievalScheduler,
+        deadline : float,
+        known_links : AbstractSet[str] = frozenset(),
+        freshness_days : float = 7
+) -> List:
     """
     Retrieves news articles for the specified trading symbol using yfinance.
 
@@ -78,12 +179,17 @@ def retrieve_yfinance_news(executed_time : datetime, trading_symbol : str, asset
         executed_time (datetime): The time when the news retrieval is executed.
         trading_symbol (str): The trading symbol for which news articles are to be retrieved.
         asset_type (str): The type of asset (e.g., 'stocks', 'cryptocurrency').
+        extractor (Extractor): Extractor used to retrieve the main text content of the news articles.
+        scheduler (RetrievalScheduler): The run's scheduler bounding the time spent on retrieval.
+        deadline (float): The monotonic time by which the retrieval of the symbol must finish.
+        known_links (AbstractSet[str]): Links of the articles already retrieved, which are skipped.
+        freshness_days (float): Number of days of news articles retrieved.
 
     Returns:
         List: A list of Document objects containing the retrieved news articles.
     """
-    # Calculate the start date (7 days ago from execution time)
-    start_date = executed_time - timedelta(days = 7)
+    # Calculate the start date of the freshness window
+    start_date = executed_time - timedelta(days = freshness_days)
     # Format ticker for cryptocurrencies, otherwise use trading symbol
     if asset_type == "cryptocurrency":
         ticker = f"{trading_symbol[:-4]}-USD"
@@ -92,7 +198,11 @@ def retrieve_yfinance_news(executed_time : datetime, trading_symbol : str, asset
 
     # Retrieve news articles using yfinance
     data = yf.Ticker(ticker)
-    results = data.get_news(count = 30)
+    try:
+        results = scheduler.run(data.get_news, count = 30, deadline = deadline)
+    except RetrievalError as e:
+        record_failure(scheduler, e)
+        return []
     docs = []
 
     # Iterate over each news result
@@ -106,47 +216,72 @@ def retrieve_yfinance_news(executed_time : datetime, trading_symbol : str, asset
             title = news['content']['title']
             link = news['content']['canonicalUrl']['url']
 
-            # Only include news of type STORY and published within last 7 days
-            if content_type == "STORY" and pub_date >= start_date: 
-                # Download and parse article content
-                article = Article(link)
-                article.download()
-                article.parse()
-                
-                body = article.text 
-                # Skip articles with empty body
-                if len(body) == 0 : continue
+            # Only include news of type STORY, published within the freshness window and not retrieved yet
+            if content_type == "STORY" and pub_date >= start_date and link not in known_links:
+                # Download and extract article content, skipping articles with empty body
+                body = download_article(link, extractor, scheduler, deadline)
 
                 # Create Document object with article content and metadata
                 doc = Document(page_content = body,  metadata = {"published_date" : pub_date, "link" : link, "source" : source, "title" : title})
                 docs.append(doc)
-        except: 
-            # Ignore errors and continue with next news result
-            continue
+        except Exception as e:
+            # Count the failure and continue with next news result, unless the time budget is exhausted
+            if not record_failure(scheduler, e): break
 
     # Return list of Document objects
     return docs
 
+def fetch_finviz_headlines(trading_symbol : str) -> pd.DataFrame:
+    """
+    Fetches the news headlines of the specified trading symbol from Finviz.
+
+    Args:
+        trading_symbol (str): The trading symbol for which news headlines are to be fetched.
+
+    Returns:
+        pd.DataFrame: The news headlines, with their date, title, link and source.
+    """
+    return finvizfinance(trading_symbol).ticker_news()
+
+@profiled
 @traceable
-def retrieve_finviz_news(executed_time : datetime, trading_symbol : str) -> List:
+def retrieve_finviz_news(
+        executed_time : datetime,
+        trading_symbol : str,
+        extractor : Extractor,
+        scheduler : RetrievalScheduler,
+        deadline : float,
+        known_links : AbstractSet[str] = frozenset(),
+        freshness_days : float = 7
+) -> List:
     """
     Retrieves news articles for the specified trading symbol using Finviz.
 
     Args:
         executed_time (datetime): The time when the news retrieval is executed.
         trading_symbol (str): The trading symbol for which news articles are to be retrieved.
+        extractor (Extractor): Extractor used to retrieve the main text content of the news articles.
+        scheduler (RetrievalScheduler): The run's scheduler bounding the time spent on retrieval.
+        deadline (float): The monotonic time by which the retrieval of the symbol must finish.
+        known_links (AbstractSet[str]): Links of the articles already retrieved, which are skipped.
+        freshness_days (float): Number of days of news articles retrieved.
 
     Returns:
         List: A list of Document objects containing the retrieved news articles.
     """
-    # Calculate the start date (7 days ago from execution time)
-    start_date =  executed_time - timedelta(days = 7)
+    # Calculate the start date of the freshness window
+    start_date = executed_time - timedelta(days = freshness_days)
+    # Route Finviz requests through the shared pooled session
+    finviz_util.session = get_http_client().session
     # Retrieve news for the given trading symbol using Finviz
-    stock = finvizfinance(trading_symbol)
-    news = stock.ticker_news()
+    try:
+        news = scheduler.run(fetch_finviz_headlines, trading_symbol, deadline = deadline)
+    except RetrievalError as e:
+        record_failure(scheduler, e)
+        return []
     # Localize news dates to US/Eastern and convert to Asia/Bangkok timezone
     news['Date'] = news['Date'].dt.tz_localize('US/Eastern').dt.tz_convert("Asia/Bangkok")
-    # Filter news published within the last 7 days
+    # Filter news published within the freshness window
     news = news[news['Date'] >= start_date]
     docs = []
 
@@ -162,28 +297,55 @@ def retrieve_finviz_news(executed_time : datetime, trading_symbol : str) -> List
             if link.startswith("/news"):
                 link = f"https://finviz.com{link}"
 
-            # Download and parse article content
-            article = Article(link)
-            article.download()
-            article.parse()
-
-            body = article.text
+            # Skip articles that were already retrieved
+            if link in known_links: continue
 
-            # Skip articles with empty body
-            if len(body) == 0 : continue
+            # Download and extract article content, skipping articles with empty body
+            body = download_article(link, extractor, scheduler, deadline)
 
             # Create Document object with article content and metadata
             doc = Document(page_content = body,  metadata = {"published_date" : pub_date, "link" : link, "source" : source, "title" : title})
             docs.append(doc)
-        except : 
-            # Ignore errors and continue with next news row
-            continue
+        except Exception as e:
+            # Count the failure and continue with next news row, unless the time budget is exhausted
+            if not record_failure(scheduler, e): break
 
     # Return list of Document objects
     return docs
 
+def scrape_tv_story(story_path : str, scheduler : RetrievalScheduler, deadline : float) -> Dict:
+    """
+    Scrapes the content of a TradingView news story through the shared HTTP client.
+
+    Args:
+        story_path (str): The path of the story on TradingView.
+        scheduler (RetrievalScheduler): The run's scheduler bounding the time spent on retrieval.
+        deadline (float): The monotonic time by which the retrieval of the symbol must finish.
+
+    Returns:
+        Dict: A dictionary containing the publication date and time of the story and its body paragraphs.
+    """
+    html = scheduler.fetch(f"https://tradingview.com{story_path}", deadline)
+    article = lxml_html.fromstring(html).xpath("//article")[0]
+    published_datetime = article.xpath(".//time/@datetime")
+    paragraphs = article.xpath(".//div[contains(@class, 'body-KX2tCBZq')]//p")
+
+    return {
+        "published_datetime" : published_datetime[0] if published_datetime else None,
+        "body" : [{"type" : "text", "content" : p.text_content().strip()} for p in paragraphs]
+    }
+
+@profiled
 @traceable
-def retrieve_tv_news(executed_time : datetime,trading_symbol : str, trading_exchange : str) -> List:
+def retrieve_tv_news(
+        executed_time : datetime,
+        trading_symbol : str,
+        trading_exchange : str,
+        scheduler : RetrievalScheduler,
+        deadline : float,
+        known_links : AbstractSet[str] = frozenset(),
+        freshness_days : float = 7
+) -> List:
     """
     Retrieves news articles for the specified trading symbol from TradingView.
 
@@ -191,30 +353,44 @@ def retrieve_tv_news(executed_time : datetime,trading_symbol : str, trading_exch
         executed_time (datetime): The time when the news retrieval is executed.
         trading_symbol (str): The trading symbol for which news articles are to be retrieved.
         trading_exchange (str): The exchange where the asset is traded (e.g., 'NASDAQ').
+        scheduler (RetrievalScheduler): The run's scheduler bounding the time spent on retrieval.
+        deadline (float): The monotonic time by which the retrieval of the symbol must finish.
+        known_links (AbstractSet[str]): Links of the articles already retrieved, which are skipped.
+        freshness_days (float): Number of days of news articles retrieved.
 
     Returns:
         List: A list of Document objects containing the retrieved news articles.
     """
-    start_date = executed_time - timedelta(days = 7)
+    start_date = executed_time - timedelta(days = freshness_days)
     docs = []
     news_scraper = NewsScraper()
     # Scrape latest news headlines for the given symbol and exchange
-    news_headlines = news_scraper.scrape_headlines(
-        symbol=trading_symbol,     
-        exchange=trading_exchange, 
-        sort='latest'
-    )
+    try:
+        news_headlines = scheduler.run(
+            news_scraper.scrape_headlines,
+            symbol=trading_symbol,
+            exchange=trading_exchange,
+            sort='latest',
+            deadline=deadline
+        )
+    except RetrievalError as e:
+        record_failure(scheduler, e)
+        return []
 
     for headline in news_headlines:
+        # Skip articles that were already retrieved
+        if headline.get('link', "") in known_links: continue
+
         try:
             # Get full news content for each headline
-            content = news_scraper.scrape_news_content(headline.get('storyPath', ""))
+            content = scrape_tv_story(headline.get('storyPath', ""), scheduler, deadline)
             # Parse and convert publication date to Asia/Bangkok timezone
             pub_date = datetime.strptime(content['published_datetime'], '%Y-%m-%dT%H:%M:%S.%fZ').replace(tzinfo=ZoneInfo('UTC')).astimezone(ZoneInfo('Asia/Bangkok'))
 
             if pub_date >= start_date:
                 # Skip articles with empty body
-                if len(content['body']) == 0: continue
+                if len(content['body']) == 0:
+                    raise RetrievalError("empty_body", headline.get('storyPath', ""))
                 # Concatenate all text paragraphs in the body
                 body = "\n".join([p['content'] for p in content['body'] if p['type'] == "text"])
                 # Create Document object with article content and metadata
@@ -231,8 +407,36 @@ def retrieve_tv_news(executed_time : datetime,trading_symbol : str, trading_exch
             else:
                 # Stop processing if article is older than start_date
                 break
-        except:
-            # Ignore errors and continue with next headline
-            continue
+        except Exception as e:
+            # Count the failure and continue with next headline, unless the time budget is exhausted
+            if not record_failure(scheduler, e): break
 
     return docs
+
+
+class YFinanceSource(NewsSource):
+    """News of stocks and cryptocurrencies from Yahoo Finance."""
+
+    def retrieve(self, asset_information, executed_time, extractor, scheduler, deadline, known_links):
+        return retrieve_yfinance_news(
+            executed_time, asset_information.trading_symbol, asset_information.asset_type, extractor, scheduler, deadline,
+            known_links, self.freshness_days
+        )
+
+class TradingViewSource(NewsSource):
+    """News of any symbol listed on TradingView, looked up by exchange."""
+
+    def retrieve(self, asset_information, executed_time, extractor, scheduler, deadline, known_links):
+        return retrieve_tv_news(
+            executed_time = executed_time, trading_symbol = asset_information.trading_symbol, trading_exchange = asset_information.trading_exchange,
+            scheduler = scheduler, deadline = deadline, known_links = known_links, freshness_days = self.freshness_days
+        )
+
+class FinvizSource(NewsSource):
+    """News of US-listed stocks from Finviz."""
+
+    def retrieve(self, asset_information, executed_time, extractor, scheduler, deadline, known_links):
+        return retrieve_finviz_news(
+            executed_time = executed_time, trading_symbol = asset_information.trading_symbol, extractor = extractor,
+            scheduler = scheduler, deadline = deadline, known_links = known_links, freshness_days = self.freshness_days
+        )
@@ -0,0 +1,173 @@
+import numpy as np
+from typing_extensions import Dict, List, Optional, Tuple
+from src.components.schemas import Report, RollupConfig
+
+# Numeric score of each sentiment label
+SENTIMENT_SCORES = {
+    'Strongly Negative' : -2.0,
+    'Negative' : -1.0,
+    'Neutral' : 0.0,
+    'Positive' : 1.0,
+    'Strongly Positive' : 2.0,
+}
+SENTIMENT_LABELS = list(SENTIMENT_SCORES)
+
+
+class SentimentIndices:
+    """
+    The weighted sentiment indices of groups of symbols, such as sectors or exchanges. An index is the
+    weighted mean of the scores of the group's symbols that have a report, so that a failed or skipped
+    report lowers the group's coverage rather than its sentiment.
+    """
+    __slots__ = ("names", "symbols", "weights", "current", "outlook", "dispersion", "coverage")
+
+    def __init__(
+            self,
+            names: List[str],
+            symbols: List[str],
+            weights: np.ndarray,
+            current: np.ndarray,
+            outlook: np.ndarray,
+            dispersion: np.ndarray,
+            coverage: np.ndarray
+    ):
+        """
+        Args:
+            names (List[str]): Names of the groups.
+            symbols (List[str]): Trading symbols of all groups.
+            weights (np.ndarray): Weight of each symbol in each group, of shape (groups, symbols).
+            current (np.ndarray): Index of the current sentiment of each group, NaN if no symbol of the group has a report.
+            outlook (np.ndarray): Index of the future sentiment of each group, NaN if no report of the group has an outlook.
+            dispersion (np.ndarray): Weighted standard deviation of the current sentiment scores of each group.
+            coverage (np.ndarray): Share of the weight of each group carried by symbols with a report.
+        """
+        self.names = names
+        self.symbols = symbols
+        self.weights = weights
+        self.current = current
+        self.outlook = outlook
+        self.dispersion = dispersion
+        self.coverage = coverage
+
+    def covering(self, trading_symbols: List[str]) -> List[int]:
+        """
+        Lists the groups holding any of the given symbols.
+
+        Args:
+            trading_symbols (List[str]): The trading symbols.
+        Returns:
+            List[int]: Positions of the groups, in configuration order.
+        """
+        wanted = set(trading_symbols)
+        columns = [i for i, symbol in enumerate(self.symbols) if symbol in wanted]
+        if not columns:
+            return []
+        return np.flatnonzero(self.weights[:, columns].sum(axis = 1) > 0).tolist()
+
+
+def build_groups(exchange_symbols: Dict[str, List[str]], rollup_config: RollupConfig) -> Dict[str, Dict[str, float]]:
+    """
+    Lists the groups of the indices: an equally weighted group per exchange, if enabled, then the configured groups.
+
+    Args:
+        exchange_symbols (Dict[str, List[str]]): The configured trading symbols of each exchange, keyed by exchange.
+        rollup_config (RollupConfig): Configuration of the indices.
+    Returns:
+        Dict[str, Dict[str, float]]: The weight of each symbol of each group, keyed by group name.
+    """
+    groups = {}
+    if rollup_config.exchange_indices:
+        groups.update({exchange : {symbol : 1.0 for symbol in symbols} for exchange, symbols in exchange_symbols.items() if symbols})
+    groups.update(rollup_config.groups)
+    return groups
+
+
+def weighted_mean(weights: np.ndarray, scores: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Computes the weighted mean score of each group, ignoring NaN scores.
+
+    Args:
+        weights (np.ndarray): Weight of each symbol in each group, of shape (groups, symbols).
+        scores (np.ndarray): Score of each symbol, NaN if missing.
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: The weighted mean of each group, NaN if no symbol of the group has a score, and the weight carried by scored symbols.
+    """
+    scored = ~np.isnan(scores)
+    scored_weight = weights @ scored
+    total = weights @ np.nan_to_num(scores)
+    mean = np.divide(total, scored_weight, out = np.full(weights.shape[0], np.nan), where = scored_weight > 0)
+    return mean, scored_weight
+
+
+def compute_indices(groups: Dict[str, Dict[str, float]], reports: Dict[str, Report]) -> SentimentIndices:
+    """
+    Computes the sentiment indices of groups of symbols from the reports of the run, without any LLM call.
+
+    Args:
+        groups (Dict[str, Dict[str, float]]): The weight of each symbol of each group, keyed by group name.
+        reports (Dict[str, Report]): The structured report of each symbol, keyed by trading symbol.
+    Returns:
+        SentimentIndices: The indices of the groups.
+    """
+    names = list(groups)
+    symbols = list(dict.fromkeys(symbol for weights in groups.values() for symbol in weights))
+    columns = {symbol : i for i, symbol in enumerate(symbols)}
+
+    weights = np.zeros((len(names), len(symbols)))
+    for row, name in enumerate(names):
+        for symbol, weight in groups[name].items():
+            weights[row, columns[symbol]] = weight
+
+    # Symbols without a report, or without an outlook, score NaN and are left out of the indices
+    current = np.array([SENTIMENT_SCORES.get(getattr(reports.get(symbol), "current_sentiment", None), np.nan) for symbol in symbols])
+    future = np.array([SENTIMENT_SCORES.get(getattr(reports.get(symbol), "future_sentiment", None), np.nan) for symbol in symbols])
+
+    current_index, current_weight = weighted_mean(weights, current)
+    outlook_index, _ = weighted_mean(weights, future)
+
+    # Weighted standard deviation of the current scores around each group's index
+    reported = ~np.isnan(current)
+    deviations = np.where(reported, np.nan_to_num(current)[None, :] - np.nan_to_num(current_index)[:, None], 0.0) ** 2
+    variance = np.divide((weights * deviations).sum(axis = 1), current_weight, out = np.full(len(names), np.nan), where = current_weight > 0)
+
+    total_weight = weights.sum(axis = 1)
+    coverage = np.divide(current_weight, total_weight, out = np.zeros(len(names)), where = total_weight > 0)
+    return SentimentIndices(names, symbols, weights, current_index, outlook_index, np.sqrt(variance), coverage)
+
+
+def score_label(score: float) -> str:
+    """Returns the sentiment label nearest to a score, or N/A for a missing score."""
+    if np.isnan(score):
+        return "N/A"
+    return SENTIMENT_LABELS[int(np.clip(np.rint(score), -2, 2)) + 2]
+
+
+def format_summary(indices: Optional[SentimentIndices], trading_symbols: List[str]) -> str:
+    """
+    Formats the indices of the groups holding any of the given symbols into an HTML summary section. Groups
+    without any report are shown with N/A indices.
+
+    Args:
+        indices (Optional[SentimentIndices]): The indices of the run, if computed.
+        trading_symbols (List[str]): The trading symbols of the email.
+    Returns:
+        str: The HTML summary section, or an empty string if no group holds any of the symbols.
+    """
+    rows = indices.covering(trading_symbols) if indices is not None else []
+    if not rows:
+        return ""
+
+    cells = "".join(
+        f"<tr><td>{indices.names[i]}</td>"
+        f"<td>{score_label(indices.current[i])}{'' if np.isnan(indices.current[i]) else f' ({indices.current[i]:+.2f})'}</td>"
+        f"<td>{score_label(indices.outlook[i])}</td>"
+        f"<td>{'N/A' if np.isnan(indices.dispersion[i]) else f'{indices.dispersion[i]:.2f}'}</td>"
+        f"<td>{indices.coverage[i]:.0%}</td></tr>"
+        for i in rows
+    )
+    return (
+        "<h2>Weekly Sentiment Summary</h2>"
+        "<p>Weighted sentiment indices, from -2 (strongly negative) to +2 (strongly positive), of the groups covered by this email.</p>"
+        "<table><tr><th>Group</th><th>Current</th><th>Outlook</th><th>Dispersion</th><th>Coverage</th></tr>"
+        f"{cells}</table>"
+    )
@@ -0,0 +1,284 @@
+import os
+import time
+import sqlite3
+import logging
+import threading
+from datetime import datetime
+from zoneinfo import ZoneInfo
+from typing_extensions import Dict, List, Literal, Optional
+from src.components.schemas import AssetInformation, PlanningConfig
+from src.components.token_usage import TokenUsage
+
+# Weight of the latest run in the moving averages of the cost history
+HISTORY_WEIGHT = 0.3
+
+
+class CostEstimate:
+    """The expected time and tokens of generating a report."""
+    __slots__ = ("seconds", "tokens")
+
+    def __init__(self, seconds: float, tokens: float):
+        self.seconds = seconds
+        self.tokens = tokens
+
+
+class SymbolCost:
+    """The moving averages of the reflection rounds and per-round cost of a symbol's past reports."""
+    __slots__ = ("rounds", "round_seconds", "round_overhead_tokens")
+
+    def __init__(self, rounds: float, round_seconds: float, round_overhead_tokens: float):
+        self.rounds = rounds
+        self.round_seconds = round_seconds
+        self.round_overhead_tokens = round_overhead_tokens
+
+
+class CostHistory:
+    """
+    A local SQLite store of the cost of each symbol's past reports: the number of reflection rounds, and the
+    time and the tokens beyond the news articles spent per round, as moving averages over the runs.
+    """
+
+    def __init__(self, path: str):
+        """
+        Args:
+            path (str): Path of the SQLite database file.
+        """
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok = True)
+
+        self._connection = sqlite3.connect(path, check_same_thread = False)
+        self._lock = threading.Lock()
+
+        with self._lock, self._connection:
+            self._connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS costs (
+                    trading_symbol TEXT PRIMARY KEY,
+                    rounds REAL NOT NULL,
+                    round_seconds REAL NOT NULL,
+                    round_overhead_tokens REAL NOT NULL,
+                    updated_at TEXT NOT NULL
+                )
+                """
+            )
+
+    def get(self, trading_symbol: str) -> Optional[SymbolCost]:
+        """
+        Returns the cost of a symbol's past reports.
+
+        Args:
+            trading_symbol (str): The trading symbol.
+        Returns:
+            Optional[SymbolCost]: The cost of the past reports, or None if no report was recorded for the symbol.
+        """
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT rounds, round_seconds, round_overhead_tokens FROM costs WHERE trading_symbol = ?",
+                (trading_symbol,)
+            ).fetchone()
+
+        return SymbolCost(*row) if row is not None else None
+
+    def record(self, trading_symbol: str, rounds: int, seconds: float, tokens: int, news_tokens: int) -> None:
+        """
+        Records the cost of a report into the moving averages of its symbol.
+
+        Args:
+            trading_symbol (str): The trading symbol.
+            rounds (int): The number of reflection rounds of the report.
+            seconds (float): The time spent generating the report.
+            tokens (int): The tokens used generating the report.
+            news_tokens (int): The estimated number of tokens of the news articles the report was generated from.
+        Returns:
+            None
+        """
+        rounds = max(rounds, 1)
+        latest = SymbolCost(rounds, seconds / rounds, max(tokens / rounds - news_tokens, 0))
+        previous = self.get(trading_symbol)
+
+        if previous is not None:
+            latest = SymbolCost(*(
+                HISTORY_WEIGHT * new + (1 - HISTORY_WEIGHT) * old
+                for new, old in zip(
+                    (latest.rounds, latest.round_seconds, latest.round_overhead_tokens),
+                    (previous.rounds, previous.round_seconds, previous.round_overhead_tokens)
+                )
+            ))
+
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO costs VALUES (?, ?, ?, ?, ?)",
+                (
+                    trading_symbol,
+                    latest.rounds,
+                    latest.round_seconds,
+                    latest.round_overhead_tokens,
+                    datetime.now(ZoneInfo('Asia/Bangkok')).isoformat()
+                )
+            )
+
+    def close(self) -> None:
+        """Closes the database connection."""
+        self._connection.close()
+
+
+class PlanUnit:
+    """
+    The assets whose reports are generated together, either a single asset or a batch of low-news assets,
+    along with their priority, their expected cost in each mode and the mode they are planned in.
+    """
+    __slots__ = ("assets", "priority", "full", "degraded", "mode")
+
+    def __init__(self, assets: List[AssetInformation], priority: int, full: CostEstimate, degraded: CostEstimate):
+        self.assets = assets
+        self.priority = priority
+        self.full = full
+        self.degraded = degraded
+        self.mode: Literal["full", "degraded", "skip"] = "full"
+
+    @property
+    def symbols(self) -> List[str]:
+        return [asset.trading_symbol for asset in self.assets]
+
+
+class RunPlanner:
+    """
+    Plans the reports of a run within a deadline and a token budget. Reports are generated in order of
+    priority, then of expected cost. Before each report, the remaining reports are planned again with the
+    time and tokens left: the highest-priority reports are admitted in a cheaper degraded mode first, then
+    upgraded to the full mode in order of priority while the budget allows. The reports that do not fit
+    are skipped, so that the emails are still sent on time with the reports that are complete.
+    """
+
+    def __init__(
+            self,
+            planning_config: PlanningConfig,
+            cost_history: CostHistory,
+            token_usage: TokenUsage,
+            max_reflection_round: int,
+            rate_limit_delay: float
+    ):
+        """
+        Args:
+            planning_config (PlanningConfig): Configuration of the planning.
+            cost_history (CostHistory): Store of the cost of each symbol's past reports.
+            token_usage (TokenUsage): Token usage of the run.
+            max_reflection_round (int): Maximum number of reflection rounds of a report in the full mode.
+            rate_limit_delay (float): Seconds waited after each report to avoid API rate limits.
+        """
+        self.config = planning_config
+        self.cost_history = cost_history
+        self.token_usage = token_usage
+        self.max_reflection_round = max_reflection_round
+        self.rate_limit_delay = rate_limit_delay
+        self.deadline = time.monotonic() + planning_config.deadline_minutes * 60
+
+    def priority(self, trading_symbol: str) -> int:
+        """Returns the configured priority of a symbol. Higher priorities are generated first."""
+        return self.config.priorities.get(trading_symbol, self.config.default_priority)
+
+    def estimate(self, trading_symbols: List[str], news_tokens: Dict[str, int], max_rounds: int) -> CostEstimate:
+        """
+        Estimates the cost of generating the reports of symbols together, from their news volume and the
+        reflection rounds and per-round cost of their past reports.
+
+        Args:
+            trading_symbols (List[str]): The symbols whose reports are generated together.
+            news_tokens (Dict[str, int]): Estimated number of tokens of each symbol's news articles, keyed by trading symbol.
+            max_rounds (int): Maximum number of reflection rounds.
+        Returns:
+            CostEstimate: The expected time and tokens.
+        """
+        histories = [self.cost_history.get(symbol) for symbol in trading_symbols]
+        # Symbols without history are expected to use half of the extra reflection rounds
+        rounds = max(history.rounds if history is not None else (1 + max_rounds) / 2 for history in histories)
+        rounds = min(rounds, max_rounds)
+
+        round_seconds = max(history.round_seconds if history is not None else self.config.round_seconds for history in histories)
+        round_tokens = sum(
+            news_tokens.get(symbol, 0) + (history.round_overhead_tokens if history is not None else self.config.round_overhead_tokens)
+            for symbol, history in zip(trading_symbols, histories)
+        )
+        return CostEstimate(rounds * round_seconds + self.rate_limit_delay, rounds * round_tokens)
+
+    def make_unit(self, assets: List[AssetInformation], news_tokens: Dict[str, int], degraded_news_tokens: Dict[str, int]) -> PlanUnit:
+        """
+        Creates the unit of assets whose reports are generated together.
+
+        Args:
+            assets (List[AssetInformation]): The assets.
+            news_tokens (Dict[str, int]): Estimated number of tokens of each asset's news articles, keyed by trading symbol.
+            degraded_news_tokens (Dict[str, int]): Estimated number of tokens of the news articles kept in the degraded mode, keyed by trading symbol.
+        Returns:
+            PlanUnit: The unit, planned in the full mode.
+        """
+        symbols = [asset.trading_symbol for asset in assets]
+        return PlanUnit(
+            assets = assets,
+            priority = max(self.priority(symbol) for symbol in symbols),
+            full = self.estimate(symbols, news_tokens, self.max_reflection_round),
+            degraded = self.estimate(symbols, degraded_news_tokens, 1)
+        )
+
+    def order(self, units: List[PlanUnit]) -> List[PlanUnit]:
+        """Orders units by decreasing priority, then by increasing expected cost."""
+        return sorted(units, key = lambda unit: (-unit.priority, unit.full.seconds, unit.full.tokens))
+
+    def remaining(self) -> CostEstimate:
+        """Returns the time and tokens left before the deadline and the token budget are reached."""
+        return CostEstimate(self.deadline - time.monotonic(), self.config.token_budget - self.token_usage.total_tokens)
+
+    def plan(self, units: List[PlanUnit]) -> None:
+        """
+        Plans the mode of the remaining units, in order, with the time and tokens left.
+
+        Args:
+            units (List[PlanUnit]): The remaining units, ordered by `order`.
+        Returns:
+            None
+        """
+        remaining = self.remaining()
+
+        # Admit the units in the degraded mode, in order of priority
+        for unit in units:
+            if unit.degraded.seconds <= remaining.seconds and unit.degraded.tokens <= remaining.tokens:
+                unit.mode = "degraded"
+                remaining.seconds -= unit.degraded.seconds
+                remaining.tokens -= unit.degraded.tokens
+            else:
+                unit.mode = "skip"
+
+        # Upgrade the admitted units to the full mode, in order of priority
+        for unit in units:
+            if unit.mode != "degraded":
+                continue
+
+            extra_seconds = unit.full.seconds - unit.degraded.seconds
+            extra_tokens = unit.full.tokens - unit.degraded.tokens
+            if extra_seconds <= remaining.seconds and extra_tokens <= remaining.tokens:
+                unit.mode = "full"
+                remaining.seconds -= extra_seconds
+                remaining.tokens -= extra_tokens
+
+    def record(self, unit: PlanUnit, seconds: float, tokens: int, rounds: Optional[int], news_tokens: Dict[str, int]) -> None:
+        """
+        Records the cost of a unit's reports into the cost history of its symbols. Reports generated together
+        share their cost equally.
+
+        Args:
+            unit (PlanUnit): The unit.
+            seconds (float): The time spent generating the reports, including the rate limit delay.
+            tokens (int): The tokens used generating the reports.
+            rounds (Optional[int]): The number of reflection rounds, or None if unknown. Units without any round are not recorded.
+            news_tokens (Dict[str, int]): Estimated number of tokens of each asset's news articles, keyed by trading symbol.
+        Returns:
+            None
+        """
+        if not rounds:
+            return
+
+        seconds = max(seconds - self.rate_limit_delay, 0)
+        for symbol in unit.symbols:
+            self.cost_history.record(symbol, rounds, seconds, tokens // len(unit.symbols), news_tokens.get(symbol, 0))
+
+        logging.info(f"{'+'.join(unit.symbols)} took {seconds:.0f}s, {tokens} tokens and {rounds} rounds")
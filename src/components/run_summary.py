@@ -0,0 +1,320 @@
+import os
+import json
+import time
+import logging
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from typing_extensions import Any, Dict, Iterator, List, Optional
+from src.components.token_usage import TokenUsage
+
+# Metrics of a run compared with the previous run, where an increase is a regression
+COMPARED_METRICS = ("wall_time", "llm_calls", "total_tokens", "reflection_rounds", "failures")
+# Report statuses counted as failures
+FAILED_STATUSES = ("failed", "skipped")
+
+
+class SymbolSummary:
+    """The wall time per stage, the article counts and the outcome of a symbol's report."""
+    __slots__ = ("stages", "stage_calls", "articles", "status")
+
+    def __init__(self):
+        self.stages: Dict[str, float] = {}
+        self.stage_calls: Dict[str, int] = {}
+        self.articles: Dict[str, int] = {"fetched" : 0, "deduplicated" : 0, "prefetched" : 0}
+        self.status: Optional[str] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        # Reflection rounds are only counted for the reports generated by the graph
+        rounds = self.stage_calls.get("analyse_market_sentiment")
+        return {
+            "status" : self.status,
+            "wall_time" : round(sum(self.stages.values()), 3),
+            "stages" : {stage : round(seconds, 3) for stage, seconds in self.stages.items()},
+            "reflection_rounds" : rounds,
+            "articles" : dict(self.articles),
+        }
+
+
+class RunSummary:
+    """
+    Collects the performance of a run: the wall time of each symbol split by stage, the articles fetched,
+    deduplicated and loaded from the news store, and the outcome of each report. The LLM usage and the
+    retrieval failures are added when the summary is built, and the summary is compared with the previous
+    run's, so that regressions of the weekly job are visible without any external tracing service.
+    """
+
+    def __init__(self, run_id: str):
+        """
+        Args:
+            run_id (str): Identifier of the run.
+        """
+        self.run_id = run_id
+        self.started_at = datetime.now().astimezone().isoformat(timespec = "seconds")
+        self.symbols: Dict[str, SymbolSummary] = {}
+        self._start = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _symbol(self, trading_symbol: str) -> SymbolSummary:
+        return self.symbols.setdefault(trading_symbol, SymbolSummary())
+
+    def record_stage(self, trading_symbols: List[str], stage: str, seconds: float) -> None:
+        """Records the wall time of a stage. Stages run for several symbols together share their time equally."""
+        with self._lock:
+            for trading_symbol in trading_symbols:
+                symbol = self._symbol(trading_symbol)
+                symbol.stages[stage] = symbol.stages.get(stage, 0.0) + seconds / len(trading_symbols)
+                symbol.stage_calls[stage] = symbol.stage_calls.get(stage, 0) + 1
+
+    def record_articles(self, trading_symbol: str, **counts: int) -> None:
+        """Adds to the article counts of a symbol, such as `fetched`, `deduplicated` or `prefetched`."""
+        with self._lock:
+            articles = self._symbol(trading_symbol).articles
+            for name, count in counts.items():
+                articles[name] = articles.get(name, 0) + count
+
+    def record_status(self, trading_symbol: str, status: str) -> None:
+        """Records the outcome of a symbol's report: `generated`, `degraded`, `reused`, `failed` or `skipped`."""
+        with self._lock:
+            self._symbol(trading_symbol).status = status
+
+    def build(self, token_usage: Optional[TokenUsage], retrieval_failures: Dict[str, int]) -> Dict[str, Any]:
+        """
+        Builds the summary of the run.
+
+        Args:
+            token_usage (Optional[TokenUsage]): Token usage of the run, if tracked.
+            retrieval_failures (Dict[str, int]): Number of retrieval failures of the run by category.
+        Returns:
+            Dict[str, Any]: The summary, serializable to JSON.
+        """
+        with self._lock:
+            symbols = {trading_symbol : symbol.to_dict() for trading_symbol, symbol in sorted(self.symbols.items())}
+
+        articles = {name : sum(symbol["articles"].get(name, 0) for symbol in symbols.values()) for name in ("fetched", "deduplicated", "prefetched")}
+        statuses = [symbol["status"] for symbol in symbols.values() if symbol["status"] is not None]
+        failures = dict(retrieval_failures)
+        for status in FAILED_STATUSES:
+            if statuses.count(status):
+                failures[f"report_{status}"] = statuses.count(status)
+
+        nodes = {}
+        if token_usage is not None:
+            nodes = {
+                node : {"calls" : calls, "tokens" : token_usage.node_tokens.get(node, 0)}
+                for node, calls in sorted(token_usage.node_calls.items())
+            }
+
+        return {
+            "run_id" : self.run_id,
+            "started_at" : self.started_at,
+            "wall_time" : round(time.monotonic() - self._start, 3),
+            "reports" : {status : statuses.count(status) for status in sorted(set(statuses))},
+            "articles" : articles,
+            "llm_calls" : token_usage.calls if token_usage is not None else 0,
+            "input_tokens" : token_usage.input_tokens if token_usage is not None else 0,
+            "output_tokens" : token_usage.output_tokens if token_usage is not None else 0,
+            "total_tokens" : token_usage.total_tokens if token_usage is not None else 0,
+            "tokens_by_model" : dict(token_usage.by_model) if token_usage is not None else {},
+            "nodes" : nodes,
+            "reflection_rounds" : sum(symbol["reflection_rounds"] or 0 for symbol in symbols.values()),
+            "failures" : failures,
+            "symbols" : symbols,
+        }
+
+
+def compare_metric(previous: float, current: float, threshold: float) -> Dict[str, Any]:
+    """
+    Compares a metric with its value in the previous run.
+
+    Args:
+        previous (float): The metric in the previous run.
+        current (float): The metric in this run.
+        threshold (float): Relative increase above which the metric regressed.
+    Returns:
+        Dict[str, Any]: The previous and current values, the relative change, if defined, and whether the metric regressed.
+    """
+    return {
+        "previous" : previous,
+        "current" : current,
+        "change" : round((current - previous) / previous, 3) if previous else None,
+        "regression" : current > previous * (1 + threshold) if previous else current > 0,
+    }
+
+
+def compare_summaries(previous: Dict[str, Any], current: Dict[str, Any], threshold: float) -> Dict[str, Any]:
+    """
+    Compares the summary of a run with the previous run's, in total and for each symbol reported in both.
+
+    Args:
+        previous (Dict[str, Any]): Summary of the previous run.
+        current (Dict[str, Any]): Summary of this run.
+        threshold (float): Relative increase above which a metric regressed.
+    Returns:
+        Dict[str, Any]: The comparison, with the regressed metrics listed under `regressions`.
+    """
+    def total(summary: Dict[str, Any], metric: str) -> float:
+        value = summary.get(metric, 0)
+        return sum(value.values()) if isinstance(value, dict) else value
+
+    metrics = {metric : compare_metric(total(previous, metric), total(current, metric), threshold) for metric in COMPARED_METRICS}
+    symbols = {
+        trading_symbol : compare_metric(previous["symbols"][trading_symbol]["wall_time"], symbol["wall_time"], threshold)
+        for trading_symbol, symbol in current.get("symbols", {}).items()
+        if trading_symbol in previous.get("symbols", {})
+    }
+
+    regressions = [metric for metric, comparison in metrics.items() if comparison["regression"]]
+    regressions += [f"{trading_symbol} wall_time" for trading_symbol, comparison in symbols.items() if comparison["regression"]]
+    return {"previous_run_id" : previous.get("run_id"), "metrics" : metrics, "symbols" : symbols, "regressions" : regressions}
+
+
+def load_previous_summary(directory: str) -> Optional[Dict[str, Any]]:
+    """
+    Loads the summary of the latest run written to a directory. Summaries of failed runs are skipped, since
+    their partial metrics would make the next run look like a regression.
+
+    Args:
+        directory (str): Directory holding the run summaries.
+    Returns:
+        Optional[Dict[str, Any]]: The latest summary, or None if no run was summarised yet.
+    """
+    if not os.path.isdir(directory):
+        return None
+
+    # Summaries are named after their run ID, which sorts chronologically
+    names = sorted(name for name in os.listdir(directory) if name.endswith(".json"))
+    for name in reversed(names):
+        try:
+            with open(os.path.join(directory, name), encoding = "utf-8") as f:
+                summary = json.load(f)
+        except (OSError, ValueError) as e:
+            logging.warning(f"Ignoring unreadable run summary {name}: {e}")
+            continue
+        if "error" not in summary:
+            return summary
+    return None
+
+
+def write_summary(directory: str, summary: Dict[str, Any]) -> str:
+    """
+    Writes the summary of a run to a directory.
+
+    Args:
+        directory (str): Directory holding the run summaries.
+        summary (Dict[str, Any]): The summary.
+    Returns:
+        str: Path of the summary file.
+    """
+    os.makedirs(directory, exist_ok = True)
+    path = os.path.join(directory, f"{summary['run_id'].replace(':', '')}.json")
+    with open(path, "w", encoding = "utf-8") as f:
+        json.dump(summary, f, indent = 2)
+    return path
+
+
+def format_change(comparison: Optional[Dict[str, Any]], unit: str = "") -> str:
+    """Formats a metric with its change since the previous run, highlighting regressions."""
+    if comparison is None:
+        return ""
+    change = f" ({comparison['change']:+.0%})" if comparison["change"] is not None else ""
+    text = f"{comparison['current']:,.1f}{unit}" if isinstance(comparison["current"], float) else f"{comparison['current']:,}{unit}"
+    return f"<b style='color:#c0392b'>{text}{change}</b>" if comparison["regression"] else f"{text}{change}"
+
+
+def format_footer(summary: Dict[str, Any]) -> str:
+    """
+    Formats a summary into an HTML footer of the emails.
+
+    Args:
+        summary (Dict[str, Any]): The summary, compared with the previous run's if one exists.
+    Returns:
+        str: The HTML footer.
+    """
+    comparison = summary.get("comparison") or {}
+    metrics = comparison.get("metrics", {})
+    symbol_changes = comparison.get("symbols", {})
+
+    def metric(name: str, unit: str = "") -> str:
+        if name in metrics:
+            return format_change(metrics[name], unit)
+        value = summary[name]
+        return f"{sum(value.values()) if isinstance(value, dict) else value:,}{unit}"
+
+    articles = summary["articles"]
+    rows = "".join(
+        f"<tr><td>{label}</td><td>{value}</td></tr>"
+        for label, value in (
+            ("Wall time", metric("wall_time", "s")),
+            ("Reports", ", ".join(f"{count} {status}" for status, count in summary["reports"].items()) or "none"),
+            ("Articles", f"{articles['fetched']} fetched, {articles['deduplicated']} duplicates, {articles['prefetched']} prefetched"),
+            ("LLM calls", metric("llm_calls")),
+            ("Tokens", metric("total_tokens")),
+            ("Reflection rounds", metric("reflection_rounds")),
+            ("Failures", metric("failures") + (f" {summary['failures']}" if summary["failures"] else "")),
+        )
+    )
+    symbol_rows = "".join(
+        f"<tr><td>{trading_symbol}</td><td>{symbol['status'] or ''}</td>"
+        f"<td>{format_change(symbol_changes.get(trading_symbol)) or format(symbol['wall_time'], ',.1f')}</td>"
+        f"<td>{symbol['reflection_rounds'] if symbol['reflection_rounds'] is not None else ''}</td></tr>"
+        for trading_symbol, symbol in summary["symbols"].items()
+    )
+    previous = f", compared with run {comparison['previous_run_id']}" if comparison else ""
+
+    return (
+        f"<hr><p><small>Run {summary['run_id']}{previous}</small></p>"
+        f"<table><tr><th>Run</th><th></th></tr>{rows}</table>"
+        f"<table><tr><th>Symbol</th><th>Report</th><th>Wall time (s)</th><th>Rounds</th></tr>{symbol_rows}</table>"
+    )
+
+
+# The summary of the current run, if the run is summarised
+_summary: Optional[RunSummary] = None
+
+
+def start_run_summary(run_id: str) -> RunSummary:
+    """
+    Summarises the rest of the run.
+
+    Args:
+        run_id (str): Identifier of the run.
+    Returns:
+        RunSummary: The run's summary.
+    """
+    global _summary
+
+    _summary = RunSummary(run_id)
+    return _summary
+
+
+def stop_run_summary() -> None:
+    """Stops summarising the run."""
+    global _summary
+    _summary = None
+
+
+@contextmanager
+def timed_stage(trading_symbols: List[str], stage: str) -> Iterator[None]:
+    """Records the wall time spent within the context as a stage of the given symbols, if the run is summarised."""
+    if _summary is None:
+        yield
+        return
+
+    start = time.monotonic()
+    try:
+        yield
+    finally:
+        _summary.record_stage(trading_symbols, stage, time.monotonic() - start)
+
+
+def record_articles(trading_symbol: str, **counts: int) -> None:
+    """Adds to the article counts of a symbol, if the run is summarised."""
+    if _summary is not None:
+        _summary.record_articles(trading_symbol, **counts)
+
+
+def record_status(trading_symbol: str, status: str) -> None:
+    """Records the outcome of a symbol's report, if the run is summarised."""
+    if _summary is not None:
+        _summary.record_status(trading_symbol, status)
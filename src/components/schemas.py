@@ -1,6 +1,5 @@
 from pydantic import BaseModel , Field
 from typing_extensions import List, Literal, Annotated, Dict
-from langchain.docstore.document import Document
 from langchain_core.messages import BaseMessage
 from typing_extensions import Optional
 from langgraph.graph.message import add_messages
@@ -10,13 +9,128 @@ class AssetInformation(BaseModel):
     """Asset Information"""
     asset_type : Literal["cryptocurrency", "stocks"]
     trading_symbol : str
-    trading_exchange: Literal["BINANCE", "NASDAQ"]
+    trading_exchange: str
     symbol_alias : str
 
+class HedgeConfig(BaseModel):
+    """Configuration of the secondary model a slow or failing call is hedged to"""
+    model_class : str
+    model_params: Dict
+    percentile : float = 95
+    min_samples : int = 10
+    initial_delay : float = 30
+
 class ModelConfig(BaseModel):
     """Model configuration"""
     model_class : str
     model_params: Dict
+    hedge : Optional[HedgeConfig] = None
+
+class ExtractionConfig(BaseModel):
+    """Article extraction configuration"""
+    extractor_class : str
+    extractor_params : Dict = {}
+    fallback_class : Optional[str] = None
+    min_text_length : int = 400
+
+class RetrievalConfig(BaseModel):
+    """News retrieval scheduling configuration"""
+    symbol_budget : float = 180
+    request_timeout : float = 10
+    hedge_after : float = 4
+    max_workers : int = 8
+    failure_threshold : int = 3
+
+class NewsSourceConfig(BaseModel):
+    """Configuration of a news source and of its throughput limits"""
+    source_class : str
+    enabled : bool = True
+    asset_types : List[str] = []
+    exchanges : List[str] = []
+    max_concurrency : int = 4
+    rate_limit : float = 60
+    freshness_days : float = 7
+
+class BatchingConfig(BaseModel):
+    """Configuration for batching the analysis of low-news assets"""
+    enabled : bool = False
+    max_articles : int = 5
+    max_group_tokens : int = 60000
+    max_group_size : int = 4
+
+class NewsStoreConfig(BaseModel):
+    """Configuration of the local store of prefetched news articles"""
+    path : str = "data/news.sqlite"
+    lookback_days : int = 7
+    retention_days : int = 14
+
+class GradingConfig(BaseModel):
+    """Configuration of the critic's grading of the reports"""
+    compact : bool = False
+
+class ReportCacheConfig(BaseModel):
+    """Configuration of the cache of the last report generated for each symbol"""
+    enabled : bool = False
+    path : str = "data/reports.sqlite"
+    update_pass : bool = True
+    min_overlap : float = 0.5
+
+class ScheduleConfig(BaseModel):
+    """Configuration of the in-process scheduler running the news prefetch and the weekly reports"""
+    timezone : str = "Asia/Bangkok"
+    report_day : Literal["MON", "TUE", "WED", "THU", "FRI", "SAT", "SUN"] = "FRI"
+    report_time : str = "17:30"
+    prefetch_interval_hours : float = 6
+    min_prefetch_gap_seconds : float = 60
+
+class PlanningConfig(BaseModel):
+    """Configuration of the planning of a run's reports within a deadline and a token budget"""
+    enabled : bool = False
+    deadline_minutes : float = 120
+    token_budget : int = 2000000
+    default_priority : int = 1
+    priorities : Dict[str, int] = {}
+    degraded_max_articles : int = 5
+    round_seconds : float = 60
+    round_overhead_tokens : int = 6000
+    history_path : str = "data/costs.sqlite"
+
+class Subscriber(BaseModel):
+    """A recipient of a digest of the sentiment reports of the symbols on their watchlist"""
+    email : str
+    watchlist : List[str]
+
+class DeliveryConfig(BaseModel):
+    """Configuration of the delivery of the digests"""
+    smtp_host : str = "smtp.gmail.com"
+    smtp_port : int = 465
+    security : Literal["ssl", "starttls", "none"] = "ssl"
+    batch_size : int = 50
+    subscribers : List[Subscriber] = []
+
+class RollupConfig(BaseModel):
+    """Configuration of the sector and exchange sentiment indices summarising the reports"""
+    enabled : bool = False
+    exchange_indices : bool = True
+    groups : Dict[str, Dict[str, float]] = {}
+
+class ArchiveConfig(BaseModel):
+    """Configuration of the weekly archives of the articles of the runs"""
+    enabled : bool = False
+    path : str = "data/archive"
+
+class StreamingConfig(BaseModel):
+    """Configuration of the streamed generation of the reports and the speculative formatting of the emails"""
+    enabled : bool = False
+    max_attempts : int = 2
+    speculative_formatting : bool = True
+
+class RunSummaryConfig(BaseModel):
+    """Configuration of the performance summary of each run"""
+    enabled : bool = False
+    path : str = "data/run_summaries"
+    html_footer : bool = False
+    regression_threshold : float = 0.25
 
 class Step(BaseModel):
     """
@@ -73,8 +187,8 @@ class Report(BaseModel):
 
 class State(BaseModel):
     """
-    A Pydantic model representing the workflow state, including retrieved news articles,
-    formatted content, and the generated sentiment report.
+    A Pydantic model representing the workflow state, including the IDs of the retrieved news articles
+    and the generated sentiment report.
     """
 
     messages: Annotated[List[BaseMessage], add_messages] = Field(
@@ -82,14 +196,12 @@ class State(BaseModel):
         description="A list of conversation messages exchanged between the generator and critic models.",
     )
 
-    retrieved_news: List[Document] = Field(
+    article_ids: List[str] = Field(
         [],
-        description="A list of filtered news articles relevant to the current trading symbol.",
-    )
-
-    formatted_news: str = Field(
-        '',
-        description="The filtered news articles formatted into a single text block.",
+        description=(
+            "IDs of the filtered news articles relevant to the current trading symbol. "
+            "The article content is held in the run's article store."
+        ),
     )
 
     self_reflection_passed: bool = Field(
@@ -110,6 +222,16 @@ class State(BaseModel):
         description="The sentiment report formatted as an HTML weekly newsletter.",
     )
 
+    max_reflection_round: Optional[int] = Field(
+        None,
+        description="Maximum number of reflection rounds of this report, overriding the configured maximum when set.",
+    )
+
+    reflection_rounds: int = Field(
+        0,
+        description="Number of reports generated so far, whether they were graded or rejected while streamed.",
+    )
+
 
 class GroundednessOutput(BaseModel):
     """
@@ -176,3 +298,131 @@ class UsefulnessOutput(BaseModel):
     )
 
 
+# Bounds of the criticisms returned by the compact grading schemas
+MAX_CRITICISMS = 3
+MAX_CRITICISM_LENGTH = 300
+
+# The bounds are part of the JSON schema given to the critic, so that they limit the criticisms as they are generated
+CompactCriticisms = Annotated[
+    List[Annotated[str, Field(json_schema_extra = {"maxLength" : MAX_CRITICISM_LENGTH})]],
+    Field(json_schema_extra = {"maxItems" : MAX_CRITICISMS})
+]
+
+
+class CompactGroundednessOutput(BaseModel):
+    """
+    A compact, verdict-first assessment of whether a market sentiment report is factually grounded
+    in the news articles it references, without a chain of thought.
+    """
+    is_grounded: bool = Field(
+        ...,
+        description="Indicates whether the report is factually grounded in the referenced articles. Give this verdict first.",
+    )
+    confidence: Literal["high", "low"] = Field(
+        ...,
+        description="'low' if the verdict is borderline and a closer review of the report is warranted, otherwise 'high'.",
+    )
+    criticisms: Optional[CompactCriticisms] = Field(
+        None,
+        description=(
+            f"If the report is not grounded, at most {MAX_CRITICISMS} specific and actionable criticisms, each a single sentence "
+            f"of at most {MAX_CRITICISM_LENGTH} characters, explaining how to make it more factually accurate. Otherwise null."
+        ),
+    )
+
+
+class CompactUsefulnessOutput(BaseModel):
+    """
+    A compact, verdict-first evaluation of whether a market sentiment report effectively addresses the
+    current and, where relevant, the anticipated future market sentiment, without a chain of thought.
+    """
+    is_useful: bool = Field(
+        ...,
+        description="Indicates whether the report effectively covers the current and, if applicable, future market sentiment. Give this verdict first.",
+    )
+    confidence: Literal["high", "low"] = Field(
+        ...,
+        description="'low' if the verdict is borderline and a closer review of the report is warranted, otherwise 'high'.",
+    )
+    criticisms: Optional[CompactCriticisms] = Field(
+        None,
+        description=(
+            f"If the report is not useful, at most {MAX_CRITICISMS} specific and actionable criticisms, each a single sentence "
+            f"of at most {MAX_CRITICISM_LENGTH} characters, explaining how to make it more relevant. Otherwise null."
+        ),
+    )
+
+
+class AssetReport(BaseModel):
+    """
+    A Pydantic model representing the market sentiment report of a single asset within a batch of assets.
+    Citations refer to the IDs of the news articles listed under that asset only.
+    """
+    trading_symbol: str = Field(..., description="The trading symbol of the asset the report is about.")
+    report: Report = Field(..., description="The market sentiment report of the asset.")
+
+
+class BatchReport(BaseModel):
+    """
+    A Pydantic model representing the market sentiment reports of a batch of assets, one report per asset.
+    """
+    reports: List[AssetReport] = Field(
+        ...,
+        description="One market sentiment report per asset, in the order the assets are given.",
+    )
+
+
+class AssetUsefulness(BaseModel):
+    """A Pydantic model for evaluating the usefulness of the report of a single asset within a batch of assets."""
+    trading_symbol: str = Field(..., description="The trading symbol of the asset whose report is evaluated.")
+    evaluation: UsefulnessOutput = Field(..., description="The usefulness evaluation of the asset's report.")
+
+
+class BatchUsefulnessOutput(BaseModel):
+    """A Pydantic model for evaluating the usefulness of the reports of a batch of assets."""
+    evaluations: List[AssetUsefulness] = Field(
+        ...,
+        description="One usefulness evaluation per report, in the order the reports are given.",
+    )
+
+
+class AssetGroundedness(BaseModel):
+    """A Pydantic model for assessing the groundedness of the report of a single asset within a batch of assets."""
+    trading_symbol: str = Field(..., description="The trading symbol of the asset whose report is assessed.")
+    evaluation: GroundednessOutput = Field(..., description="The groundedness assessment of the asset's report.")
+
+
+class BatchGroundednessOutput(BaseModel):
+    """A Pydantic model for assessing the groundedness of the reports of a batch of assets."""
+    evaluations: List[AssetGroundedness] = Field(
+        ...,
+        description="One groundedness assessment per report, in the order the reports are given.",
+    )
+
+
+class AssetCompactUsefulness(BaseModel):
+    """A Pydantic model for compactly evaluating the usefulness of the report of a single asset within a batch of assets."""
+    trading_symbol: str = Field(..., description="The trading symbol of the asset whose report is evaluated.")
+    evaluation: CompactUsefulnessOutput = Field(..., description="The compact usefulness evaluation of the asset's report.")
+
+
+class BatchCompactUsefulnessOutput(BaseModel):
+    """A Pydantic model for compactly evaluating the usefulness of the reports of a batch of assets."""
+    evaluations: List[AssetCompactUsefulness] = Field(
+        ...,
+        description="One compact usefulness evaluation per report, in the order the reports are given.",
+    )
+
+
+class AssetCompactGroundedness(BaseModel):
+    """A Pydantic model for compactly assessing the groundedness of the report of a single asset within a batch of assets."""
+    trading_symbol: str = Field(..., description="The trading symbol of the asset whose report is assessed.")
+    evaluation: CompactGroundednessOutput = Field(..., description="The compact groundedness assessment of the asset's report.")
+
+
+class BatchCompactGroundednessOutput(BaseModel):
+    """A Pydantic model for compactly assessing the groundedness of the reports of a batch of assets."""
+    evaluations: List[AssetCompactGroundedness] = Field(
+        ...,
+        description="One compact groundedness assessment per report, in the order the reports are given.",
+    )
@@ -0,0 +1,99 @@
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import LLMResult
+from langchain_core.tracers.context import register_configure_hook
+from uuid import UUID
+from typing_extensions import Any, Dict, Iterator, List, Optional
+
+
+class TokenUsage(BaseCallbackHandler):
+    """
+    Counts the LLM calls of a run and the tokens they used, in total, per model and per graph node.
+    Calls made outside of the graph are counted under the node `other`. The runs of each graph node are
+    counted separately from its LLM calls, since a single run may retry or hedge its calls.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.input_tokens = 0
+        self.output_tokens = 0
+        self.by_model: Dict[str, int] = {}
+        self.node_calls: Dict[str, int] = {}
+        self.node_tokens: Dict[str, int] = {}
+        self.node_runs: Dict[str, int] = {}
+        self._run_nodes: Dict[UUID, str] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def total_tokens(self) -> int:
+        """The number of input and output tokens used so far."""
+        return self.input_tokens + self.output_tokens
+
+    @property
+    def calls(self) -> int:
+        """The number of LLM calls made so far."""
+        return sum(self.node_calls.values())
+
+    def _start(self, run_id: UUID, metadata: Optional[Dict[str, Any]]) -> None:
+        node = (metadata or {}).get("langgraph_node", "other")
+        with self._lock:
+            self._run_nodes[run_id] = node
+            self.node_calls[node] = self.node_calls.get(node, 0) + 1
+
+    def on_chain_start(self, serialized: Dict[str, Any], inputs: Dict[str, Any], *, run_id: UUID, tags: Optional[List[str]] = None, metadata: Optional[Dict[str, Any]] = None, **kwargs: Any) -> None:
+        # A node's own run is named after the node and tagged with its graph step, unlike the chains it calls
+        node = (metadata or {}).get("langgraph_node")
+        if node is not None and kwargs.get("name") == node and any(tag.startswith("graph:step:") for tag in tags or []):
+            with self._lock:
+                self.node_runs[node] = self.node_runs.get(node, 0) + 1
+
+    def on_chat_model_start(self, serialized: Dict[str, Any], messages: List[List[Any]], *, run_id: UUID, metadata: Optional[Dict[str, Any]] = None, **kwargs: Any) -> None:
+        self._start(run_id, metadata)
+
+    def on_llm_start(self, serialized: Dict[str, Any], prompts: List[str], *, run_id: UUID, metadata: Optional[Dict[str, Any]] = None, **kwargs: Any) -> None:
+        self._start(run_id, metadata)
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        with self._lock:
+            self._run_nodes.pop(run_id, None)
+
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs: Any) -> None:
+        with self._lock:
+            node = self._run_nodes.pop(run_id, "other")
+
+        for generations in response.generations:
+            for generation in generations:
+                message = getattr(generation, "message", None)
+                usage = getattr(message, "usage_metadata", None)
+                if not usage:
+                    continue
+
+                model_name = message.response_metadata.get("model_name", "unknown")
+                with self._lock:
+                    self.input_tokens += usage.get("input_tokens", 0)
+                    self.output_tokens += usage.get("output_tokens", 0)
+                    self.by_model[model_name] = self.by_model.get(model_name, 0) + usage.get("total_tokens", 0)
+                    self.node_tokens[node] = self.node_tokens.get(node, 0) + usage.get("total_tokens", 0)
+
+
+# The token usage of the current run, attached to every LLM call made within `track_token_usage`
+_token_usage: ContextVar[Optional[TokenUsage]] = ContextVar("token_usage", default = None)
+register_configure_hook(_token_usage, inheritable = True)
+
+
+@contextmanager
+def track_token_usage() -> Iterator[TokenUsage]:
+    """Counts the tokens used by the LLM calls made within the context. Nested contexts share the outermost usage."""
+    token_usage = _token_usage.get()
+    if token_usage is not None:
+        yield token_usage
+        return
+
+    token_usage = TokenUsage()
+    reset_token = _token_usage.set(token_usage)
+    try:
+        yield token_usage
+    finally:
+        _token_usage.reset(reset_token)
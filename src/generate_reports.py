@@ -1,68 +1,84 @@
 import os
 import time
 import logging
-import smtplib
-from email.mime.text import MIMEText
-from datetime import datetime
+import argparse
+from datetime import datetime, timedelta
 from zoneinfo import ZoneInfo
-from typing import List, Dict
+from typing import List, Dict, Optional
 from dotenv import load_dotenv
+from langchain_core.language_models.chat_models import BaseChatModel
 from src.graph_constructor import GraphConstructor
+from src.components.retrieval_scheduler import RetrievalScheduler
+from src.components.schemas import (
+    RetrievalConfig, BatchingConfig, ModelConfig, NewsStoreConfig, ReportCacheConfig, PlanningConfig, DeliveryConfig, RollupConfig, ArchiveConfig,
+    RunSummaryConfig, AssetInformation, Report, State
+)
+from src.components.hedged_model import latency_summary, build_model
+from src.components.article_store import ArticleStore
+from src.components.news_store import NewsStore
+from src.components.report_cache import ReportCache, content_hashes, article_fingerprint, prepare_update
+from src.components.batch_analysis import estimate_tokens, group_assets, generate_batch_reports
+from src.components.profiler import profile_call, profiling_symbol, start_profiler, stop_profiler
+from src.components.fixtures import FixtureStore, FixtureScheduler, set_fixture_store, run_time
+from src.components.run_planner import CostHistory, PlanUnit, RunPlanner
+from src.components.token_usage import track_token_usage
+from src.components.delivery import build_digests, assemble_digests, send_emails
+from src.components.rollups import build_groups, compute_indices
+from src.components.article_archive import archive_articles, open_run_archive, close_run_archive, weekly_directory
+from src.components.run_summary import (
+    start_run_summary, stop_run_summary, timed_stage, record_articles, record_status,
+    compare_summaries, load_previous_summary, write_summary, format_footer
+)
 from config import settings
 from typing_extensions import Literal
 
 logging.basicConfig(level=logging.INFO)
 load_dotenv()
 
-def send_email(subject: str, body: str, sender: str, recipient: str, password: str) -> None:
-    """Send an email with the given subject and body.
+# Map exchanges to their asset types
+EXCHANGES = {
+    "BINANCE": "cryptocurrency",
+    "NASDAQ": "stocks"
+}
+
+def configured_assets(exchanges: Dict[str, str]) -> List[AssetInformation]:
+    """
+    Lists the trading assets configured for the given exchanges.
 
     Args:
-        subject (str): Email subject
-        body (str): Body of the email
-        sender (str): Email address of sender
-        recipient (str): Email address of recipient
-        password (str): Sender's email password
+        exchanges (Dict[str, str]): A dictionary of exchanges and asset types.
     Returns:
-        None
+        List[AssetInformation]: Information about the trading assets.
     """
-    msg = MIMEText(body, 'html')
-    msg['Subject'] = subject
-    msg['From'] = sender
-    msg['To'] = recipient
+    return [
+        AssetInformation(asset_type = asset_type, trading_symbol = symbol, trading_exchange = exchange, symbol_alias = alias)
+        for exchange, asset_type in exchanges.items()
+        for alias, symbol in settings.assets.get(exchange.lower(), {}).items()
+    ]
 
-    try:
-        with smtplib.SMTP_SSL('smtp.gmail.com', 465) as smtp_server:
-            smtp_server.login(sender, password)
-            smtp_server.sendmail(sender, recipient, msg.as_string())
-        logging.info(f"Email sent: {subject}")
-    except Exception as e:
-        logging.error(f"Failed to send email: {e}")
-
-def format_sections(sections: List[str]) -> str:
+def clean_email(email: str) -> str:
     """
-    Formats a list of section strings into an HTML document.
+    Removes the Markdown code fence the model may wrap around the HTML newsletter.
 
     Args:
-        sections (List): A list of strings, each representing a section to be included in the HTML body.
+        email (str): The HTML newsletter generated by the model.
 
     Returns:
-        str: A string containing the formatted HTML document with the sections joined by double newlines.
-    """
-    return f"""
-    <!DOCTYPE html>
-    <html lang="en">
-    <body>
-        {'<br><br>'.join(sections)}
-    </body>
-    </html>
+        str: The raw HTML newsletter.
     """
+    return email.strip("`").removeprefix("html\n")
 
 def generate_report_for_symbol(
         asset_type: Literal["cryptocurrency", "stocks"], 
         symbol: str, 
-        exchange: Literal["BINANCE", "NASDAQ"], 
-        alias: str
+        exchange: str, 
+        alias: str,
+        retrieval_scheduler: RetrievalScheduler = None,
+        article_store: ArticleStore = None,
+        article_ids: Optional[List[str]] = None,
+        report_cache: Optional[ReportCache] = None,
+        max_reflection_round: Optional[int] = None,
+        reports: Optional[Dict[str, Report]] = None
 ) -> str:
     """
     Generate the sentiment report for a given trading asset
@@ -70,12 +86,43 @@ def generate_report_for_symbol(
     Args:
         asset_type (Literal[cryptocurrency, stocks]): Asset type
         symbol (str): Trading symbol of asset
-        exchange (Literal[BINANCE, NASDAQ]): Exchange where asset is traded
+        exchange (str): Exchange where asset is traded
         alias (str): Alias for the trading asset
+        retrieval_scheduler (RetrievalScheduler): Scheduler shared by all symbols of the run
+        article_store (ArticleStore): Store holding the news articles of the run
+        article_ids (Optional[List[str]]): IDs of the news articles already retrieved for the asset, if any
+        report_cache (Optional[ReportCache]): Cache of the last report of each symbol, used when the news articles were already retrieved
+        max_reflection_round (Optional[int]): Maximum number of reflection rounds of the report, if lower than the configured maximum
+        reports (Optional[Dict[str, Report]]): Collects the structured report, keyed by trading symbol, if provided
 
     Returns:
         str: Email of the sentiment report
     """
+    # Skip retrieval if the news articles were already retrieved
+    graph_input = {"article_ids" : article_ids} if article_ids else {}
+    hashes = content_hashes(article_ids, article_store) if report_cache is not None and article_ids else None
+    cached = report_cache.get(symbol) if hashes is not None else None
+
+    if cached is not None:
+        report_cache_config = ReportCacheConfig.model_validate(settings.get("report_cache", {}))
+
+        # Reuse the last report if the article set is unchanged
+        if cached.fingerprint == article_fingerprint(hashes):
+            logging.info(f"Articles of {symbol} are unchanged, reusing its last report")
+            record_status(symbol, "reused")
+            if reports is not None:
+                reports[symbol] = cached.report
+            return cached.section
+
+        # Update the last report with the new articles if most articles are unchanged
+        if report_cache_config.update_pass and cached.overlap(hashes) >= report_cache_config.min_overlap:
+            update_ids, messages = prepare_update(cached, hashes)
+            graph_input = {"article_ids" : update_ids, "messages" : messages}
+            logging.info(f"Updating the last report of {symbol} with {len(update_ids)} articles")
+
+    if max_reflection_round is not None:
+        graph_input["max_reflection_round"] = max_reflection_round
+
     try:
         graph = GraphConstructor(
             generator_config = settings.generator,
@@ -85,57 +132,597 @@ def generate_report_for_symbol(
                 "trading_symbol": symbol,
                 "trading_exchange": exchange,
                 "symbol_alias" : alias
-            }
+            },
+            article_store = article_store,
+            retrieval_scheduler = retrieval_scheduler
         ).compile()
 
-        response = graph.invoke(input={}, config={"recursion_limit": 100})
+        # The graph stage holds the time spent between nodes, such as validating the state
+        response = profile_call("graph", graph.invoke, input=graph_input, config={"recursion_limit": 100})
         email = response.get("email")
 
         if email is None:
             logging.error(f"Report generation failed for {symbol}")
+            record_status(symbol, "failed")
             return ""
         
         logging.info(f"Report generated for {symbol}")
-        return email.strip("`").removeprefix("html\n")
+        record_status(symbol, "generated")
+        section = clean_email(email)
+        if reports is not None:
+            reports[symbol] = response["report"]
+
+        if hashes is not None:
+            report_cache.put(symbol, response["article_ids"], hashes, response["report"], section)
+        return section
     except Exception as e:
         logging.error(f"Error generating report for {symbol}: {e}")
+        record_status(symbol, "failed")
         return ""
     finally:
-        time.sleep(30)  # Avoid API rate limits
+        with timed_stage([symbol], "rate_limit_delay"):
+            time.sleep(settings.get("rate_limit_delay", 30))  # Avoid API rate limits
+
+def retrieve_articles(
+        asset_information: AssetInformation,
+        retrieval_scheduler: RetrievalScheduler,
+        article_store: ArticleStore,
+        news_store: Optional[NewsStore] = None
+) -> List[str]:
+    """
+    Retrieve the news articles of a trading asset ahead of generating its report
+
+    Args:
+        asset_information (AssetInformation): Information about the trading asset
+        retrieval_scheduler (RetrievalScheduler): Scheduler shared by all symbols of the run
+        article_store (ArticleStore): Store holding the news articles of the run
+        news_store (Optional[NewsStore]): Store of the news articles prefetched during the week, if any
+
+    Returns:
+        List[str]: IDs of the retrieved news articles
+    """
+    # Use the news articles prefetched during the week, retrieving them now only if none were stored
+    if news_store is not None:
+        lookback_days = NewsStoreConfig.model_validate(settings.get("news_store", {})).lookback_days
+        since = run_time() - timedelta(days = lookback_days)
+        with timed_stage([asset_information.trading_symbol], "load_articles"):
+            article_ids = news_store.load_articles(asset_information.trading_symbol, since, article_store)
+
+        if article_ids:
+            logging.info(f"Loaded {len(article_ids)} prefetched articles for {asset_information.trading_symbol}")
+            record_articles(asset_information.trading_symbol, prefetched = len(article_ids))
+            archive_articles(asset_information.trading_symbol, article_ids, article_store)
+            return article_ids
+        logging.warning(f"No prefetched articles for {asset_information.trading_symbol}, retrieving them now")
+
+    try:
+        constructor = GraphConstructor(
+            generator_config = settings.generator,
+            critic_config = settings.critic,
+            asset_information = asset_information,
+            article_store = article_store,
+            retrieval_scheduler = retrieval_scheduler
+        )
+        return constructor.retrieve_news(State()).get("article_ids", [])
+    except Exception as e:
+        logging.error(f"Error retrieving news for {asset_information.trading_symbol}: {e}")
+        return []
+
+def retrieve_all_articles(
+        assets: List[AssetInformation],
+        retrieval_scheduler: RetrievalScheduler,
+        article_store: ArticleStore,
+        news_store: Optional[NewsStore] = None
+) -> Dict[str, List[str]]:
+    """
+    Retrieve the news articles of every trading asset ahead of generating their reports
+
+    Args:
+        assets (List[AssetInformation]): Information about the trading assets
+        retrieval_scheduler (RetrievalScheduler): Scheduler shared by all symbols of the run
+        article_store (ArticleStore): Store holding the news articles of the run
+        news_store (Optional[NewsStore]): Store of the news articles prefetched during the week, if any
+
+    Returns:
+        Dict[str, List[str]]: IDs of the retrieved news articles of each asset, keyed by trading symbol
+    """
+    article_ids = {}
+    for asset in assets:
+        with profiling_symbol(asset.trading_symbol):
+            article_ids[asset.trading_symbol] = retrieve_articles(asset, retrieval_scheduler, article_store, news_store)
+    return article_ids
+
+def reuse_cached_reports(
+        assets: List[AssetInformation],
+        article_ids: Dict[str, List[str]],
+        hashes: Dict[str, Dict[str, str]],
+        report_cache: Optional[ReportCache] = None,
+        reports: Optional[Dict[str, Report]] = None
+) -> Dict[str, str]:
+    """
+    Reuse the last report of the trading assets whose article set is unchanged
+
+    Args:
+        assets (List[AssetInformation]): Information about the trading assets
+        article_ids (Dict[str, List[str]]): IDs of each asset's news articles, keyed by trading symbol
+        hashes (Dict[str, Dict[str, str]]): Content hashes of each asset's news articles, keyed by trading symbol
+        report_cache (Optional[ReportCache]): Cache of the last report of each symbol, if any
+        reports (Optional[Dict[str, Report]]): Collects the structured report of each reused sentiment report, keyed by trading symbol, if provided
+
+    Returns:
+        Dict[str, str]: Email of the reused sentiment report of each asset, keyed by trading symbol
+    """
+    sections = {}
+    if report_cache is None:
+        return sections
+
+    for asset in assets:
+        cached = report_cache.get(asset.trading_symbol)
+        if article_ids[asset.trading_symbol] and cached is not None and cached.fingerprint == article_fingerprint(hashes[asset.trading_symbol]):
+            logging.info(f"Articles of {asset.trading_symbol} are unchanged, reusing its last report")
+            record_status(asset.trading_symbol, "reused")
+            sections[asset.trading_symbol] = cached.section
+            if reports is not None:
+                reports[asset.trading_symbol] = cached.report
+    return sections
+
+def group_low_news_assets(
+        assets: List[AssetInformation],
+        article_ids: Dict[str, List[str]],
+        article_store: ArticleStore,
+        batching_config: BatchingConfig
+) -> List[List[AssetInformation]]:
+    """
+    Group the low-news trading assets into batches analysed together
+
+    Args:
+        assets (List[AssetInformation]): Information about the trading assets
+        article_ids (Dict[str, List[str]]): IDs of each asset's news articles, keyed by trading symbol
+        article_store (ArticleStore): Store holding the news articles of the run
+        batching_config (BatchingConfig): Configuration of the batching
+
+    Returns:
+        List[List[AssetInformation]]: The batches of at least two assets
+    """
+    low_news_assets = [asset for asset in assets if len(article_ids[asset.trading_symbol]) <= batching_config.max_articles]
+
+    groups = group_assets(
+        low_news_assets,
+        {asset.trading_symbol : estimate_tokens(article_ids[asset.trading_symbol], article_store) for asset in low_news_assets},
+        batching_config.max_group_tokens,
+        batching_config.max_group_size
+    )
+    # Assets left alone in their group go through the regular pipeline
+    return [group for group in groups if len(group) > 1]
+
+def generate_batch_sections(
+        batch: List[AssetInformation],
+        article_ids: Dict[str, List[str]],
+        hashes: Dict[str, Dict[str, str]],
+        generator_model: BaseChatModel,
+        critic_model: BaseChatModel,
+        article_store: ArticleStore,
+        report_cache: Optional[ReportCache] = None,
+        max_reflection_round: Optional[int] = None,
+        reports: Optional[Dict[str, Report]] = None
+) -> Dict[str, str]:
+    """
+    Generate the sentiment reports of a batch of low-news trading assets analysed together. The assets the
+    model leaves out of the batch are generated on their own through the graph
+
+    Args:
+        batch (List[AssetInformation]): Information about the trading assets of the batch
+        article_ids (Dict[str, List[str]]): IDs of each asset's news articles, keyed by trading symbol
+        hashes (Dict[str, Dict[str, str]]): Content hashes of each asset's news articles, keyed by trading symbol
+        generator_model (BaseChatModel): The language model used for generating and formatting the reports
+        critic_model (BaseChatModel): The language model used for grading the reports
+        article_store (ArticleStore): Store holding the news articles of the run
+        report_cache (Optional[ReportCache]): Cache of the last report of each symbol, if any
+        max_reflection_round (Optional[int]): Maximum number of reflection rounds, if lower than the configured maximum
+        reports (Optional[Dict[str, Report]]): Collects the structured report of each generated sentiment report, keyed by trading symbol, if provided
+
+    Returns:
+        Dict[str, str]: Email of the sentiment report of each asset, keyed by trading symbol
+    """
+    symbols = [asset.trading_symbol for asset in batch]
+    sections = {}
+
+    try:
+        with profiling_symbol("+".join(symbols)), timed_stage(symbols, "generate_batch_reports"):
+            emails, omitted = profile_call(
+                "generate_batch_reports", generate_batch_reports,
+                batch, article_ids, generator_model, critic_model, article_store,
+                max_reflection_round or settings.max_reflection_round
+            )
+    except Exception as e:
+        logging.error(f"Error generating batched reports for {symbols}: {e}")
+        emails, omitted = {}, []
+    finally:
+        with timed_stage(symbols, "rate_limit_delay"):
+            time.sleep(settings.get("rate_limit_delay", 30))  # Avoid API rate limits
+
+    for asset in omitted:
+        logging.warning(f"{asset.trading_symbol} was left out of batch {symbols}, generating its report on its own")
+        with profiling_symbol(asset.trading_symbol):
+            sections[asset.trading_symbol] = generate_report_for_symbol(
+                asset.asset_type, asset.trading_symbol, asset.trading_exchange, asset.symbol_alias,
+                article_store = article_store, article_ids = article_ids[asset.trading_symbol], report_cache = report_cache,
+                max_reflection_round = max_reflection_round, reports = reports
+            )
 
-def generate_and_send_reports(exchanges: Dict[str, str]) -> None:
+    for symbol in symbols:
+        if symbol in sections:
+            continue
+        if symbol in emails:
+            logging.info(f"Report generated for {symbol} in batch {symbols}")
+            record_status(symbol, "generated")
+            email, report = emails[symbol]
+            sections[symbol] = clean_email(email)
+            if reports is not None:
+                reports[symbol] = report
+
+            if report_cache is not None:
+                report_cache.put(symbol, article_ids[symbol], hashes[symbol], report, sections[symbol])
+        else:
+            logging.error(f"Report generation failed for {symbol} in batch {symbols}")
+            record_status(symbol, "failed")
+            sections[symbol] = ""
+
+    return sections
+
+def generate_batched_reports(
+        assets: List[AssetInformation],
+        retrieval_scheduler: RetrievalScheduler,
+        news_store: Optional[NewsStore] = None,
+        report_cache: Optional[ReportCache] = None,
+        reports: Optional[Dict[str, Report]] = None
+) -> Dict[str, str]:
+    """
+    Generate the sentiment reports for a list of trading assets, analysing low-news assets together in batches
+
+    Args:
+        assets (List[AssetInformation]): Information about the trading assets
+        retrieval_scheduler (RetrievalScheduler): Scheduler shared by all symbols of the run
+        news_store (Optional[NewsStore]): Store of the news articles prefetched during the week, if any
+        report_cache (Optional[ReportCache]): Cache of the last report of each symbol, if any
+        reports (Optional[Dict[str, Report]]): Collects the structured report of each generated or reused sentiment report, keyed by trading symbol, if provided
+
+    Returns:
+        Dict[str, str]: Email of the sentiment report of each asset, keyed by trading symbol
+    """
+    batching_config = BatchingConfig.model_validate(settings.batching)
+    article_store = ArticleStore()
+    article_ids = retrieve_all_articles(assets, retrieval_scheduler, article_store, news_store)
+    hashes = {symbol : content_hashes(ids, article_store) for symbol, ids in article_ids.items()}
+
+    # Reuse the last report of the assets whose article set is unchanged
+    sections = reuse_cached_reports(assets, article_ids, hashes, report_cache, reports)
+    assets = [asset for asset in assets if asset.trading_symbol not in sections]
+
+    batches = group_low_news_assets(assets, article_ids, article_store, batching_config)
+    batched_symbols = {asset.trading_symbol for group in batches for asset in group}
+
+    for asset in assets:
+        if asset.trading_symbol in batched_symbols: continue
+        with profiling_symbol(asset.trading_symbol):
+            sections[asset.trading_symbol] = generate_report_for_symbol(
+                asset.asset_type, asset.trading_symbol, asset.trading_exchange, asset.symbol_alias,
+                retrieval_scheduler, article_store, article_ids[asset.trading_symbol], report_cache, reports = reports
+            )
+
+    generator_model = build_model(ModelConfig.model_validate(settings.generator))
+    critic_model = build_model(ModelConfig.model_validate(settings.critic))
+
+    for batch in batches:
+        sections.update(generate_batch_sections(
+            batch, article_ids, hashes, generator_model, critic_model, article_store, report_cache, reports = reports
+        ))
+
+    return sections
+
+def generate_planned_reports(
+        assets: List[AssetInformation],
+        retrieval_scheduler: RetrievalScheduler,
+        news_store: Optional[NewsStore] = None,
+        report_cache: Optional[ReportCache] = None,
+        reports: Optional[Dict[str, Report]] = None,
+        record_costs: bool = True
+) -> Dict[str, str]:
+    """
+    Generate the sentiment reports for a list of trading assets within the run's deadline and token budget.
+    Reports are generated in order of priority, degrading low-priority assets to fewer news articles and a
+    single reflection round, and skipping them when even that does not fit
+
+    Args:
+        assets (List[AssetInformation]): Information about the trading assets, across all exchanges
+        retrieval_scheduler (RetrievalScheduler): Scheduler shared by all symbols of the run
+        news_store (Optional[NewsStore]): Store of the news articles prefetched during the week, if any
+        report_cache (Optional[ReportCache]): Cache of the last report of each symbol, if any
+        reports (Optional[Dict[str, Report]]): Collects the structured report of each generated or reused sentiment report, keyed by trading symbol, if provided
+        record_costs (bool): Whether the cost of the reports is recorded into the cost history planning the next runs
+
+    Returns:
+        Dict[str, str]: Email of the sentiment report of each asset, keyed by trading symbol. Skipped assets have an empty email
+    """
+    planning_config = PlanningConfig.model_validate(settings.get("planning", {}))
+    batching_config = BatchingConfig.model_validate(settings.get("batching", {}))
+    cost_history = CostHistory(planning_config.history_path)
+
+    with track_token_usage() as token_usage:
+        # The deadline starts with the run, so that retrieval counts against it
+        planner = RunPlanner(
+            planning_config, cost_history, token_usage, settings.max_reflection_round, settings.get("rate_limit_delay", 30)
+        )
+        article_store = ArticleStore()
+        article_ids = retrieve_all_articles(assets, retrieval_scheduler, article_store, news_store)
+        hashes = {symbol : content_hashes(ids, article_store) for symbol, ids in article_ids.items()}
+
+        # Reuse the last report of the assets whose article set is unchanged
+        sections = reuse_cached_reports(assets, article_ids, hashes, report_cache, reports)
+        assets = [asset for asset in assets if asset.trading_symbol not in sections]
+
+        # Degraded reports are generated from the most recent news articles only, since the sources list them in their own order
+        degraded_ids = {symbol : article_store.most_recent(ids, planning_config.degraded_max_articles) for symbol, ids in article_ids.items()}
+        news_tokens = {symbol : estimate_tokens(ids, article_store) for symbol, ids in article_ids.items()}
+        degraded_news_tokens = {symbol : estimate_tokens(ids, article_store) for symbol, ids in degraded_ids.items()}
+
+        batches = group_low_news_assets(assets, article_ids, article_store, batching_config) if batching_config.enabled else []
+        batched_symbols = {asset.trading_symbol for group in batches for asset in group}
+        units = planner.order([
+            planner.make_unit(group, news_tokens, degraded_news_tokens)
+            for group in batches + [[asset] for asset in assets if asset.trading_symbol not in batched_symbols]
+        ])
+
+        generator_model = build_model(ModelConfig.model_validate(settings.generator))
+        critic_model = build_model(ModelConfig.model_validate(settings.critic))
+
+        for i, unit in enumerate(units):
+            # Plan the remaining units again with the time and tokens left
+            planner.plan(units[i:])
+
+            if unit.mode == "skip":
+                logging.warning(f"Skipping {unit.symbols}, which does not fit in the remaining time and tokens")
+                sections.update({symbol : "" for symbol in unit.symbols})
+                for symbol in unit.symbols:
+                    record_status(symbol, "skipped")
+                continue
+
+            degraded = unit.mode == "degraded"
+            if degraded:
+                logging.info(f"Degrading {unit.symbols} to fit in the remaining time and tokens")
+
+            # Rounds are counted as runs of the analysis node, since streamed retries and hedged calls add LLM calls within a round
+            start, tokens, rounds = time.monotonic(), token_usage.total_tokens, token_usage.node_runs.get("analyse_sentiment", 0)
+
+            # Degraded reports are not cached, so that the next run generates the full report
+            if len(unit.assets) > 1:
+                sections.update(generate_batch_sections(
+                    unit.assets, degraded_ids if degraded else article_ids, hashes, generator_model, critic_model, article_store,
+                    None if degraded else report_cache, 1 if degraded else None, reports
+                ))
+                # Batched rounds run outside of the graph and are not counted
+                rounds = None
+            else:
+                asset = unit.assets[0]
+                with profiling_symbol(asset.trading_symbol):
+                    sections[asset.trading_symbol] = generate_report_for_symbol(
+                        asset.asset_type, asset.trading_symbol, asset.trading_exchange, asset.symbol_alias,
+                        retrieval_scheduler, article_store,
+                        degraded_ids[asset.trading_symbol] if degraded else article_ids[asset.trading_symbol],
+                        None if degraded else report_cache,
+                        1 if degraded else None,
+                        reports
+                    )
+                rounds = token_usage.node_runs.get("analyse_sentiment", 0) - rounds
+
+            if degraded:
+                for symbol in unit.symbols:
+                    if sections.get(symbol):
+                        record_status(symbol, "degraded")
+
+            if record_costs:
+                planner.record(
+                    unit, time.monotonic() - start, token_usage.total_tokens - tokens, rounds,
+                    degraded_news_tokens if degraded else news_tokens
+                )
+
+    logging.info(f"Used {token_usage.total_tokens} of {planning_config.token_budget} tokens: {token_usage.by_model}")
+    cost_history.close()
+    return sections
+
+def generate_sections(
+        assets: List[AssetInformation],
+        retrieval_scheduler: RetrievalScheduler,
+        news_store: Optional[NewsStore] = None,
+        report_cache: Optional[ReportCache] = None,
+        reports: Optional[Dict[str, Report]] = None
+) -> Dict[str, str]:
+    """
+    Generate the sentiment reports for a list of trading assets, one asset after the other
+
+    Args:
+        assets (List[AssetInformation]): Information about the trading assets
+        retrieval_scheduler (RetrievalScheduler): Scheduler shared by all symbols of the run
+        news_store (Optional[NewsStore]): Store of the news articles prefetched during the week, if any
+        report_cache (Optional[ReportCache]): Cache of the last report of each symbol, if any
+        reports (Optional[Dict[str, Report]]): Collects the structured report of each generated or reused sentiment report, keyed by trading symbol, if provided
+
+    Returns:
+        Dict[str, str]: Email of the sentiment report of each asset, keyed by trading symbol
+    """
+    article_store = ArticleStore()
+    sections = {}
+
+    for asset in assets:
+        with profiling_symbol(asset.trading_symbol):
+            article_ids = None
+            # The article set must be known before the graph runs for the last report to be reused
+            if news_store is not None or report_cache is not None:
+                article_ids = retrieve_articles(asset, retrieval_scheduler, article_store, news_store)
+
+            sections[asset.trading_symbol] = generate_report_for_symbol(
+                asset.asset_type, asset.trading_symbol, asset.trading_exchange, asset.symbol_alias,
+                retrieval_scheduler, article_store, article_ids, report_cache, reports = reports
+            )
+
+    return sections
+
+def generate_and_send_reports(
+        exchanges: Dict[str, str],
+        news_store: Optional[NewsStore] = None,
+        retrieval_scheduler: Optional[RetrievalScheduler] = None,
+        use_report_cache: bool = True,
+        send: bool = True,
+        record_run: bool = True
+) -> None:
     """
 
     Generate and email reports for all exchanges.
 
     Args:
         exchanges (Dict[str, str]): A dictionary of exchanges and asset types.
+        news_store (Optional[NewsStore]): Store of the news articles prefetched during the week. The news articles are retrieved during the run if not provided.
+        retrieval_scheduler (Optional[RetrievalScheduler]): Scheduler shared by all symbols of the run. A new scheduler is created if not provided.
+        use_report_cache (bool): Whether the last reports are reused when the report cache is enabled in the settings.
+        send (bool): Whether the reports are emailed. Otherwise they are only generated.
+        record_run (bool): Whether the run is recorded into the cost history, the weekly archive and the run summaries, when they are enabled in the settings.
+            Replayed and profiled runs are not, so that they do not skew the planning of, and the comparison with, the next runs.
     Returns:
         None
     """
     sender = os.getenv("GMAIL_ADDRESS")
-    recipient = os.getenv("GMAIL_ADDRESS")
     password = os.getenv("GMAIL_PASSWORD")
-    current_day = datetime.now(ZoneInfo('Asia/Bangkok')).strftime('%Y-%m-%d')
+    now = run_time()
+    current_day = now.strftime('%Y-%m-%d')
+    run_id = now.isoformat(timespec = "seconds")
+    run_summary_config = RunSummaryConfig.model_validate(settings.get("run_summary", {}))
+    delivery_config = DeliveryConfig.model_validate(settings.get("delivery", {}))
+    report_cache_config = ReportCacheConfig.model_validate(settings.get("report_cache", {}))
+    archive_config = ArchiveConfig.model_validate(settings.get("archive", {}))
+
+    run_summary = start_run_summary(run_id) if run_summary_config.enabled and record_run else None
+    # A single retrieval scheduler is shared by all symbols, so that failing hosts are skipped for the rest of the run
+    if retrieval_scheduler is None:
+        retrieval_scheduler = RetrievalScheduler(**RetrievalConfig.model_validate(settings.retrieval).model_dump())
+    report_cache = ReportCache(report_cache_config.path) if use_report_cache and report_cache_config.enabled else None
+    token_usage, summary = None, None
+
+    # The run's state is released, and its summary written, even if the run fails
+    try:
+        # The articles retrieved during the run are archived into the archive of the current week
+        if archive_config.enabled and record_run:
+            open_run_archive(weekly_directory(archive_config.path, now), run_id)
+
+        assets = configured_assets(exchanges)
+        exchange_symbols = {exchange : [asset.trading_symbol for asset in assets if asset.trading_exchange == exchange] for exchange in exchanges}
+        digests = build_digests(exchange_symbols, exchanges, current_day, sender, delivery_config)
+
+        # Each section is generated once, however many digests it appears in
+        subscribed = {symbol for digest in digests for symbol in digest.symbols}
+        assets = [asset for asset in assets if asset.trading_symbol in subscribed]
+
+        reports: Dict[str, Report] = {}
+        with track_token_usage() as token_usage:
+            if PlanningConfig.model_validate(settings.get("planning", {})).enabled:
+                # Planned runs generate the reports of all exchanges in order of priority
+                sections = generate_planned_reports(assets, retrieval_scheduler, news_store, report_cache, reports, record_run)
+            elif BatchingConfig.model_validate(settings.get("batching", {})).enabled:
+                sections = generate_batched_reports(assets, retrieval_scheduler, news_store, report_cache, reports)
+            else:
+                sections = generate_sections(assets, retrieval_scheduler, news_store, report_cache, reports)
+
+        # The sector and exchange indices are computed from the structured reports, without any LLM call
+        rollup_config = RollupConfig.model_validate(settings.get("rollups", {}))
+        indices = compute_indices(build_groups(exchange_symbols, rollup_config), reports) if rollup_config.enabled else None
 
-    for exchange, asset_type in exchanges.items():
-        subject = f"{current_day} {asset_type.capitalize()} Sentiment Report"
-        trading_symbols = settings.assets.get(exchange.lower(), {})
-        sections = []
+        # Summarise the run and compare it with the previous run
+        footer = ""
+        if run_summary is not None:
+            summary = run_summary.build(token_usage, retrieval_scheduler.failure_counts())
+            previous = load_previous_summary(run_summary_config.path)
+            if previous is not None:
+                summary["comparison"] = compare_summaries(previous, summary, run_summary_config.regression_threshold)
+                if summary["comparison"]["regressions"]:
+                    logging.warning(f"Regressions since run {previous.get('run_id')}: {summary['comparison']['regressions']}")
+            if run_summary_config.html_footer:
+                footer = format_footer(summary)
 
-        for alias, symbol in trading_symbols.items():
-            section = generate_report_for_symbol(asset_type, symbol, exchange, alias)
-            if section:
-                sections.append(section)
+        emails = assemble_digests(digests, sections, sender, indices, footer)
+        if emails and send:
+            sent = send_emails(emails, sender, password, delivery_config)
+            if summary is not None:
+                summary["emails_sent"] = sent
+        elif emails:
+            logging.info(f"Assembled {len(emails)} digests from {sum(1 for section in sections.values() if section)} sections, not sending")
+    except Exception as e:
+        if run_summary is not None:
+            summary = run_summary.build(token_usage, retrieval_scheduler.failure_counts())
+            summary["error"] = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        logging.info(
+            f"Retrieval failures: {retrieval_scheduler.failure_counts()}, "
+            f"skipped hosts: {sorted(retrieval_scheduler.circuit_breaker.open_hosts)}"
+        )
+        retrieval_scheduler.shutdown()
+
+        if report_cache is not None:
+            report_cache.close()
+        close_run_archive()
+
+        if run_summary is not None:
+            try:
+                if summary is not None:
+                    logging.info(f"Run summary written to {write_summary(run_summary_config.path, summary)}")
+            finally:
+                stop_run_summary()
+
+    if latency_summary():
+        logging.info(f"LLM latencies by provider: {latency_summary()}")
+
+def main() -> None:
+    """
+    Generate and email the reports. Optionally, the graph nodes and retrieval sources are profiled, and the
+    network and LLM responses of the run are recorded, or replayed fully offline from a previous recording.
+
+    Returns:
+        None
+    """
+    parser = argparse.ArgumentParser(description = "Generate and email the weekly sentiment reports")
+    parser.add_argument("--profile", metavar = "DIR", nargs = "?", const = "profiles",
+                        help = "Profile the CPU time and allocations of each graph node and retrieval source, writing the reports to DIR")
+    fixtures = parser.add_mutually_exclusive_group()
+    fixtures.add_argument("--record", metavar = "DIR", help = "Record the network and LLM responses of the run to DIR")
+    fixtures.add_argument("--replay", metavar = "DIR", help = "Replay the responses recorded in DIR fully offline, without sending emails")
+    args = parser.parse_args()
+
+    retrieval_scheduler = None
+    if args.record or args.replay:
+        fixture_store = FixtureStore(args.record or args.replay, "record" if args.record else "replay")
+        set_fixture_store(fixture_store)
+        retrieval_scheduler = FixtureScheduler(fixture_store, **RetrievalConfig.model_validate(settings.retrieval).model_dump())
 
-        if sections:
-            html_content = format_sections(sections)
-            send_email(subject, html_content, sender, recipient, password)
+        # Replayed calls do not hit any rate limit
+        if args.replay:
+            settings.set("rate_limit_delay", 0)
+
+    if args.profile:
+        start_profiler(os.path.join(args.profile, datetime.now(ZoneInfo('Asia/Bangkok')).strftime('%Y%m%d-%H%M%S')))
+
+    try:
+        # Reused reports would hide the work being profiled or recorded
+        generate_and_send_reports(
+            EXCHANGES,
+            retrieval_scheduler = retrieval_scheduler,
+            use_report_cache = not (args.profile or args.record or args.replay),
+            send = not args.replay,
+            # Replayed and profiled runs would skew the cost history and the comparison with the previous run
+            record_run = not (args.profile or args.replay)
+        )
+    finally:
+        summary_path = stop_profiler()
+        if summary_path is not None:
+            logging.info(f"Profile summary written to {summary_path}")
 
 if __name__ == "__main__":
-    # Map exchanges to their asset types
-    EXCHANGES = {
-        "BINANCE": "cryptocurrency",
-        "NASDAQ": "stocks"
-    }
-    generate_and_send_reports(EXCHANGES)
+    main()
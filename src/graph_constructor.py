@@ -1,20 +1,67 @@
 from langgraph.graph import StateGraph, START, END
-from src.components.schemas import State, ModelConfig, AssetInformation
+from src.components.schemas import State, ModelConfig, AssetInformation, ExtractionConfig, RetrievalConfig, NewsSourceConfig
 from src.components.retrieve_news import retrieve_news
 from src.components.analyse_sentiment import analyse_market_sentiment
 from src.components.grade_generation import grade_generation, route_flow
 from src.components.email_formatter import email_formatter
+from src.components.article_store import ArticleStore
+from src.components.article_extractor import Extractor, FallbackExtractor
+from src.components.retrieval_scheduler import RetrievalScheduler
+from src.components.news_sources import NewsSource
+from src.components.hedged_model import build_model
+from src.components.profiler import profile_call
+from src.components.run_summary import timed_stage
 from src.mapper import get_class
 from config import settings
 from dotenv import load_dotenv
+from typing_extensions import Dict, List
 load_dotenv()
 
+def build_extractor(extraction_config: ExtractionConfig) -> Extractor:
+    """
+    Instantiates the article extractor described by a configuration, falling back to a slower
+    extractor when the fast path yields too little text.
+
+    Args:
+        extraction_config (ExtractionConfig): Configuration of the extractor.
+    Returns:
+        Extractor: The article extractor.
+    """
+    extractor = get_class("extractor", extraction_config.extractor_class)(**extraction_config.extractor_params)
+
+    if extraction_config.fallback_class is not None:
+        extractor = FallbackExtractor(
+            primary = extractor,
+            fallback = get_class("extractor", extraction_config.fallback_class)(),
+            min_text_length = extraction_config.min_text_length
+        )
+
+    return extractor
+
+def build_sources(source_configs: Dict[str, Dict]) -> List[NewsSource]:
+    """
+    Instantiates the enabled news sources described by the configurations.
+
+    Args:
+        source_configs (Dict[str, Dict]): Configuration of each news source, keyed by source name.
+    Returns:
+        List[NewsSource]: The enabled news sources, in configuration order.
+    """
+    sources = []
+    for name, source_config in source_configs.items():
+        source_config = NewsSourceConfig.model_validate(source_config)
+        if source_config.enabled:
+            sources.append(get_class("source", source_config.source_class)(name, source_config))
+    return sources
+
 class GraphConstructor:
     def __init__(
         self, 
         generator_config: ModelConfig,
         critic_config : ModelConfig,
-        asset_information: AssetInformation
+        asset_information: AssetInformation,
+        article_store: ArticleStore = None,
+        retrieval_scheduler: RetrievalScheduler = None
     ):
         """
         Initializes the graph constructor with the necessary parameters for constructing the workflow graph.
@@ -23,20 +70,32 @@ class GraphConstructor:
             generator_config (ModelConfig): Configuration for the generator model.
             critic_config (ModelConfig): Configuration for the critic model.
             asset_information (AssetInformation): Information about the trading asset.
+            article_store (ArticleStore): Store holding the news articles of the run. A new store is created if not provided.
+            retrieval_scheduler (RetrievalScheduler): Scheduler shared by all symbols of the run. A new scheduler is created if not provided.
         """
         generator_config = ModelConfig.model_validate(generator_config)
         critic_config = ModelConfig.model_validate(critic_config)
         asset_information = AssetInformation.model_validate(asset_information)
+        self.trading_symbol = asset_information.trading_symbol
 
         # Initialize the language models for the workflow
-        generator_model = get_class("llm", generator_config.model_class)(**generator_config.model_params)
-        critic_model = get_class("llm", critic_config.model_class)(**critic_config.model_params)
+        generator_model = build_model(generator_config)
+        critic_model = build_model(critic_config)
+
+        # Initialize the article extractor and the news sources
+        extractor = build_extractor(ExtractionConfig.model_validate(settings.extraction))
+        sources = build_sources(settings.news_sources)
+
+        # The article content is kept in the store, while the graph state only carries article IDs
+        self.article_store = article_store if article_store is not None else ArticleStore()
+        if retrieval_scheduler is None:
+            retrieval_scheduler = RetrievalScheduler(**RetrievalConfig.model_validate(settings.retrieval).model_dump())
 
         # Initialize the nodes of the workflow with the provided parameters
-        self.retrieve_news = self.init_node(retrieve_news, asset_information=asset_information)
-        self.analyse_sentiment = self.init_node(analyse_market_sentiment, model = generator_model, asset_information=asset_information)
-        self.grade_generation = self.init_node(grade_generation, model = critic_model, asset_information=asset_information)
-        self.email_formatter = self.init_node(email_formatter, model = generator_model,  asset_information=asset_information)
+        self.retrieve_news = self.init_node(retrieve_news, asset_information=asset_information, article_store=self.article_store, extractor=extractor, scheduler=retrieval_scheduler, sources=sources)
+        self.analyse_sentiment = self.init_node(analyse_market_sentiment, model = generator_model, asset_information=asset_information, article_store=self.article_store)
+        self.grade_generation = self.init_node(grade_generation, model = critic_model, asset_information=asset_information, article_store=self.article_store, formatter_model = generator_model)
+        self.email_formatter = self.init_node(email_formatter, model = generator_model,  asset_information=asset_information, article_store=self.article_store)
 
 
         
@@ -75,7 +134,8 @@ class GraphConstructor:
         """
 
         def wrapped_node_function(state : State):
-            return node_function(state, **kwargs)
+            with timed_stage([self.trading_symbol], node_function.__name__):
+                return profile_call(node_function.__name__, node_function, state, **kwargs)
         
         return wrapped_node_function
     
@@ -1,5 +1,7 @@
 from langchain_openai import ChatOpenAI
 from langchain_google_genai import ChatGoogleGenerativeAI
+from src.components.article_extractor import LxmlExtractor, NewspaperExtractor
+from src.components.retrieve_news import YFinanceSource, TradingViewSource, FinvizSource
 from typing_extensions import Any
 
 llm_map = {
@@ -7,6 +9,17 @@ llm_map = {
     "ChatGoogleGenerativeAI" : ChatGoogleGenerativeAI
 }
 
+extractor_map = {
+    "LxmlExtractor" : LxmlExtractor,
+    "NewspaperExtractor" : NewspaperExtractor
+}
+
+source_map = {
+    "YFinanceSource" : YFinanceSource,
+    "TradingViewSource" : TradingViewSource,
+    "FinvizSource" : FinvizSource
+}
+
 
 
 def get_class(map_type : str, name : str) -> Any:
@@ -27,6 +40,8 @@ def get_class(map_type : str, name : str) -> Any:
 
     map_dict = {
         "llm" : llm_map,
+        "extractor" : extractor_map,
+        "source" : source_map,
     }
 
     if map_type not in map_dict:
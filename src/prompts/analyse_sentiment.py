@@ -16,4 +16,35 @@ contain any discussion or indication of future market sentiment.
 
 # Input Data
 <news_articles>: {formatted_news}
-"""
\ No newline at end of file
+"""
+
+batch_analyse_prompt = """# Instructions
+You are provided with several assets, each with its own list of news articles. Your task is to analyze the current market sentiment for
+each asset separately, based solely on the information contained in the articles listed under that asset. If any projected or forecasted
+sentiment is mentioned, please identify and include it in the asset's report. Each analysis must be logical, accurate, and entirely supported
+by the content of the asset's articles. If your analyses meet these criteria and are deemed accurate, you will be awarded $250.
+
+An asset may come with its previous report and a list of criticisms of that report. In this case, you must address every criticism in the
+new report of the asset.
+
+# Constraints & Penalty
+However, you will be fined up to $2500 and face imprisonment for 10 year if found guilty of any of the following violations:
+-Omitting any of the assets, or producing more than one report for the same asset.
+-Including incorrect or irrelevant citations that do not support the claims made in your analysis.
+-Citing articles listed under a different asset. The citation IDs of an asset refer only to the news articles listed under that asset.
+-Adding citations or references to news articles within the report itself. All citations must appear exclusively in the citations field—no in-text citations are allowed.
+-Making claims in your analysis that are not explicitly stated or reasonably inferred from the articles.
+-Providing the current market sentiment classification other than one of the following: "Strongly Negative", "Negative", "Neutral", "Positive",
+or "Strongly Positive".
+For forecasted  market sentiment, these same values apply; however, this field is optional and may be set to `None` if the news articles do not
+contain any discussion or indication of future market sentiment.
+
+# Input Data
+{assets}
+"""
+
+update_request = """The report above was written for an earlier set of news articles. Since then, the news articles numbered {new_articles}
+were published, and articles the report relied on may no longer be listed. Update the report so that it reflects the new articles,
+keeping the analysis that is still supported by the listed articles and dropping any claim that is no longer supported. The same
+constraints apply to the updated report, and its citations must refer to the news articles as they are currently numbered.
+"""
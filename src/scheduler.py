@@ -0,0 +1,202 @@
+import time
+import logging
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+from typing_extensions import Dict, List
+from src.generate_reports import EXCHANGES, configured_assets, generate_and_send_reports
+from src.graph_constructor import build_extractor, build_sources
+from src.components.article_extractor import Extractor
+from src.components.news_store import NewsStore
+from src.components.news_sources import NewsSource
+from src.components.retrieve_news import collect_news
+from src.components.retrieval_scheduler import RetrievalScheduler
+from src.components.schemas import AssetInformation, ExtractionConfig, NewsStoreConfig, RetrievalConfig, ScheduleConfig
+from config import settings
+
+WEEKDAYS = ["MON", "TUE", "WED", "THU", "FRI", "SAT", "SUN"]
+
+
+def next_report_time(now: datetime, schedule_config: ScheduleConfig) -> datetime:
+    """
+    Computes the next time the weekly reports are due.
+
+    Args:
+        now (datetime): The current time, in the scheduler's timezone.
+        schedule_config (ScheduleConfig): Configuration of the scheduler.
+    Returns:
+        datetime: The next report time, strictly after the current time.
+    """
+    hour, minute = map(int, schedule_config.report_time.split(":"))
+    days_ahead = (WEEKDAYS.index(schedule_config.report_day) - now.weekday()) % 7
+    report_time = (now + timedelta(days = days_ahead)).replace(hour = hour, minute = minute, second = 0, microsecond = 0)
+
+    if report_time <= now:
+        report_time += timedelta(days = 7)
+    return report_time
+
+
+def prefetch_news(
+        asset_information: AssetInformation,
+        news_store: NewsStore,
+        extractor: Extractor,
+        retrieval_scheduler: RetrievalScheduler,
+        sources: List[NewsSource],
+        lookback_days: int
+) -> int:
+    """
+    Retrieves the news articles of an asset published since its last prefetch and stores them.
+
+    Args:
+        asset_information (AssetInformation): Information about the trading asset.
+        news_store (NewsStore): Store of the prefetched news articles.
+        extractor (Extractor): Extractor used to retrieve the main text content of the news articles.
+        retrieval_scheduler (RetrievalScheduler): The scheduler bounding the time spent on retrieval.
+        sources (List[NewsSource]): The enabled news sources.
+        lookback_days (int): Number of days of news articles the reports are generated from.
+    Returns:
+        int: The number of newly stored articles.
+    """
+    since = datetime.now(ZoneInfo('Asia/Bangkok')) - timedelta(days = lookback_days)
+    # Articles already stored are not downloaded again
+    known_links = news_store.known_links(asset_information.trading_symbol, since)
+    news = collect_news(asset_information, extractor, retrieval_scheduler, sources, known_links)
+    return news_store.add_documents(asset_information.trading_symbol, news)
+
+
+def run_prefetch_job(
+        asset_information: AssetInformation,
+        news_store: NewsStore,
+        extractor: Extractor,
+        retrieval_scheduler: RetrievalScheduler,
+        sources: List[NewsSource],
+        lookback_days: int
+) -> int:
+    """
+    Prefetches the news articles of an asset, logging a failure instead of raising it, so that the scheduler
+    carries on with its next job. See `prefetch_news` for the arguments.
+
+    Returns:
+        int: The number of newly stored articles, 0 if the prefetch failed.
+    """
+    try:
+        added = prefetch_news(asset_information, news_store, extractor, retrieval_scheduler, sources, lookback_days)
+        logging.info(f"Prefetched {added} new articles for {asset_information.trading_symbol}")
+        return added
+    except Exception as e:
+        logging.error(f"Error prefetching news for {asset_information.trading_symbol}: {e}")
+        return 0
+
+
+def run_report_job(
+        exchanges: Dict[str, str],
+        assets: List[AssetInformation],
+        news_store: NewsStore,
+        extractor: Extractor,
+        retrieval_scheduler: RetrievalScheduler,
+        sources: List[NewsSource],
+        news_store_config: NewsStoreConfig
+) -> None:
+    """
+    Prefetches the news articles of every asset published since its last prefetch, then generates and emails the
+    weekly reports from the stored articles and prunes the articles past their retention. Failures are logged
+    instead of raised, so that the scheduler carries on with its next job.
+
+    Args:
+        exchanges (Dict[str, str]): A dictionary of exchanges and asset types.
+        assets (List[AssetInformation]): The configured assets.
+        news_store (NewsStore): Store of the prefetched news articles.
+        extractor (Extractor): Extractor used to retrieve the main text content of the news articles.
+        retrieval_scheduler (RetrievalScheduler): The scheduler bounding the time spent on retrieval.
+        sources (List[NewsSource]): The enabled news sources.
+        news_store_config (NewsStoreConfig): Configuration of the news store.
+    Returns:
+        None
+    """
+    # Catch up on the articles published since the last prefetch of each asset
+    for asset in assets:
+        run_prefetch_job(asset, news_store, extractor, retrieval_scheduler, sources, news_store_config.lookback_days)
+
+    try:
+        logging.info("Generating the weekly reports from the prefetched news articles")
+        generate_and_send_reports(exchanges, news_store)
+    except Exception as e:
+        logging.error(f"Error generating the weekly reports: {e}")
+
+    try:
+        pruned = news_store.prune(datetime.now(ZoneInfo('Asia/Bangkok')) - timedelta(days = news_store_config.retention_days))
+        logging.info(f"Pruned {pruned} articles older than {news_store_config.retention_days} days")
+    except Exception as e:
+        logging.error(f"Error pruning the news store: {e}")
+
+
+def sleep_until(target: datetime) -> None:
+    """Sleeps until the given time."""
+    delay = (target - datetime.now(target.tzinfo)).total_seconds()
+    if delay > 0:
+        time.sleep(delay)
+
+
+def run_scheduler(exchanges: Dict[str, str]) -> None:
+    """
+    Prefetches the news articles of every configured asset throughout the week, and generates and emails
+    the weekly reports from the stored articles at the report time, right after a last prefetch. A failed job
+    is logged and the scheduler carries on with the next one. Prefetch jobs are spread evenly over
+    the prefetch interval, at least a minimum gap apart, so that the scraped sources see a steady trickle
+    of requests rather than a single burst.
+
+    Args:
+        exchanges (Dict[str, str]): A dictionary of exchanges and asset types.
+    Returns:
+        None
+    """
+    schedule_config = ScheduleConfig.model_validate(settings.get("scheduler", {}))
+    news_store_config = NewsStoreConfig.model_validate(settings.get("news_store", {}))
+    retrieval_config = RetrievalConfig.model_validate(settings.retrieval)
+    timezone = ZoneInfo(schedule_config.timezone)
+
+    news_store = NewsStore(news_store_config.path)
+    extractor = build_extractor(ExtractionConfig.model_validate(settings.extraction))
+    sources = build_sources(settings.news_sources)
+    assets = configured_assets(exchanges)
+
+    interval = timedelta(hours = schedule_config.prefetch_interval_hours)
+    gap = max(interval / max(len(assets), 1), timedelta(seconds = schedule_config.min_prefetch_gap_seconds))
+
+    # Stagger the first prefetch of each asset across the interval
+    now = datetime.now(timezone)
+    next_prefetch = {asset.trading_symbol : now + i * gap for i, asset in enumerate(assets)}
+    report_time = next_report_time(now, schedule_config)
+    logging.info(f"Scheduler started with {len(assets)} assets, next report at {report_time.isoformat()}")
+
+    # The retrieval scheduler is renewed every day, so that hosts skipped by its circuit breaker are retried
+    retrieval_scheduler = RetrievalScheduler(**retrieval_config.model_dump())
+    retrieval_day = now.date()
+    last_prefetch = now - timedelta(seconds = schedule_config.min_prefetch_gap_seconds)
+
+    while True:
+        asset = min(assets, key = lambda a: next_prefetch[a.trading_symbol]) if assets else None
+        report_due = asset is None or report_time <= next_prefetch[asset.trading_symbol]
+
+        if report_due:
+            sleep_until(report_time)
+        else:
+            # Keep consecutive prefetch jobs at least the minimum gap apart, even after a slow job
+            sleep_until(max(next_prefetch[asset.trading_symbol], last_prefetch + timedelta(seconds = schedule_config.min_prefetch_gap_seconds)))
+
+        if datetime.now(timezone).date() != retrieval_day:
+            retrieval_scheduler.shutdown()
+            retrieval_scheduler = RetrievalScheduler(**retrieval_config.model_dump())
+            retrieval_day = datetime.now(timezone).date()
+
+        if report_due:
+            run_report_job(exchanges, assets, news_store, extractor, retrieval_scheduler, sources, news_store_config)
+            report_time = next_report_time(datetime.now(timezone), schedule_config)
+            logging.info(f"Next report at {report_time.isoformat()}")
+        else:
+            run_prefetch_job(asset, news_store, extractor, retrieval_scheduler, sources, news_store_config.lookback_days)
+            next_prefetch[asset.trading_symbol] += interval
+
+        last_prefetch = datetime.now(timezone)
+
+if __name__ == "__main__":
+    run_scheduler(EXCHANGES)
@@ -0,0 +1,104 @@
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage
+from langchain_core.runnables import Runnable
+from src.components.analyse_sentiment import analyse_market_sentiment
+from src.components.article_store import ArticleStore
+from src.components.grade_generation import grade_generation
+from src.components.schemas import AssetInformation, State
+from config import settings
+
+ASSET = AssetInformation(asset_type = "stocks", trading_symbol = "AMD", trading_exchange = "NASDAQ", symbol_alias = "AMD")
+
+
+def partial_reports(current_sentiment = "Positive", citations = (0, 1)):
+    """The partial dictionaries of a report streamed one field, then one citation, at a time."""
+    report = {"chain_of_thought" : [{"description" : "Read the news", "output" : "Demand grows"}]}
+    yield dict(report)
+    report["report"] = "Demand for chips keeps growing."
+    yield dict(report)
+    report["current_sentiment"] = current_sentiment
+    yield dict(report)
+    for i in range(len(citations)):
+        yield {**report, "citations" : list(citations[:i + 1])}
+
+
+class StreamedReports(Runnable):
+    """The structured output of a model streaming a scripted report on each attempt, recording its prompts."""
+
+    def __init__(self, *attempts):
+        self.attempts = [list(attempt) for attempt in attempts]
+        self.prompts = []
+        self.streamed = []
+
+    def invoke(self, input, config = None, **kwargs):
+        raise AssertionError("Streamed reports are not invoked")
+
+    def stream(self, input, config = None, **kwargs):
+        self.prompts.append(input.to_string())
+        self.streamed.append(0)
+        for report in self.attempts.pop(0):
+            self.streamed[-1] += 1
+            yield report
+
+
+class StreamingModel:
+    def __init__(self, reports : StreamedReports):
+        self.reports = reports
+
+    def with_structured_output(self, schema, **kwargs):
+        return self.reports
+
+
+@pytest.fixture
+def streaming():
+    previous = settings.get("streaming")
+    settings.set("streaming", {"enabled" : True, "max_attempts" : 2, "speculative_formatting" : False})
+
+    article_store = ArticleStore()
+    state = State(article_ids = [
+        article_store.add("Chip demand", "https://a.example.com/chips", "A", None, "Demand for chips keeps growing."),
+        article_store.add("Earnings beat", "https://c.example.com/earnings", "C", None, "Earnings beat estimates."),
+    ])
+    yield article_store, state
+    settings.set("streaming", previous)
+
+
+def test_valid_report_is_streamed(streaming):
+    article_store, state = streaming
+    reports = StreamedReports(partial_reports())
+
+    update = analyse_market_sentiment(state, StreamingModel(reports), ASSET, article_store)
+
+    assert update["report"].current_sentiment == "Positive"
+    assert update["report"].citations == [0, 1]
+    assert update["messages"][0].additional_kwargs["cited_article_ids"] == state.article_ids
+    assert reports.streamed == [5]
+
+
+def test_violating_report_is_aborted_and_written_again(streaming):
+    article_store, state = streaming
+    reports = StreamedReports(partial_reports(citations = (0, 5, 1)), partial_reports())
+
+    update = analyse_market_sentiment(state, StreamingModel(reports), ASSET, article_store)
+
+    assert update["report"].citations == [0, 1]
+    # The citation of an article that was not retrieved aborts the stream once the next citation starts
+    assert reports.streamed == [6, 5]
+    assert "citation 5 does not refer to one of the news articles 0 to 1" in reports.prompts[1]
+
+
+def test_violation_of_the_last_attempt_is_criticised(streaming):
+    article_store, state = streaming
+    settings.set("streaming", {"enabled" : True, "max_attempts" : 1, "speculative_formatting" : False})
+    reports = StreamedReports(partial_reports(current_sentiment = "Euphoric"))
+
+    update = analyse_market_sentiment(state, StreamingModel(reports), ASSET, article_store)
+
+    assert "report" not in update
+    rejected, criticisms = update["messages"]
+    assert isinstance(rejected, AIMessage) and isinstance(criticisms, HumanMessage)
+    assert "current_sentiment 'Euphoric' is not one of" in criticisms.content
+
+    # The rejected report is not graded, and the next reflection round writes it again
+    state = State(article_ids = state.article_ids, messages = update["messages"])
+    assert grade_generation(state, None, ASSET, article_store) == {"self_reflection_passed" : False}
@@ -0,0 +1,99 @@
+import os
+import pytest
+from datetime import datetime
+from zoneinfo import ZoneInfo
+from src.components import article_archive
+from src.components.article_archive import ArticleArchive, weekly_directory
+from src.components.article_store import ArticleStore
+
+NOW = datetime(2025, 8, 8, 17, 30, tzinfo = ZoneInfo("Asia/Bangkok"))
+
+
+@pytest.fixture
+def archive(tmp_path):
+    archive = ArticleArchive(str(tmp_path / "archive"))
+    yield archive
+    archive.close()
+
+
+def store_with_articles():
+    article_store = ArticleStore()
+    ids = [
+        article_store.add("Chip demand", "https://a.example.com/chips", "A", NOW, "Demand for chips keeps growing. 需求"),
+        article_store.add("Undated", "https://b.example.com/undated", "B", None, "An undated article."),
+        article_store.add("Earnings beat", "https://c.example.com/earnings", "C", NOW, "Earnings beat estimates."),
+    ]
+    return article_store, ids
+
+
+def test_write_and_load_round_trip(archive):
+    article_store, ids = store_with_articles()
+    assert archive.write("2025-08-08T17:30:00", "NVDA", ids, article_store) == 3
+
+    loaded_store = ArticleStore()
+    loaded = archive.load("NVDA", loaded_store)
+
+    assert loaded == ids
+    for article_id in ids:
+        original, record = article_store.get(article_id), loaded_store.get(article_id)
+        assert (record.title, record.link, record.source, record.published_date, record.body) == \
+            (original.title, original.link, original.source, original.published_date, original.body)
+
+
+def test_bodies_are_appended_once(archive):
+    article_store, ids = store_with_articles()
+    archive.write("2025-08-01T17:30:00", "NVDA", ids, article_store)
+    size = os.path.getsize(os.path.join(archive.directory, "articles.bin"))
+    # Map the archive before it grows
+    first_store = ArticleStore()
+    archive.load("NVDA", first_store)
+    assert first_store.get(ids[0]).body == article_store.get(ids[0]).body
+
+    # The next run shares two of the articles, in a different order
+    new_id = article_store.add("Rate cut", "https://d.example.com/rates", "D", NOW, "The central bank cut rates.")
+    assert archive.write("2025-08-08T17:30:00", "NVDA", [ids[2], new_id, ids[0]], article_store) == 1
+    assert os.path.getsize(os.path.join(archive.directory, "articles.bin")) == size + 4 + len("The central bank cut rates.")
+
+    assert archive.load("NVDA", ArticleStore(), run_id = "2025-08-01T17:30:00") == ids
+    loaded_store = ArticleStore()
+    assert archive.load("NVDA", loaded_store) == [ids[2], new_id, ids[0]]
+    assert loaded_store.get(new_id).body == "The central bank cut rates."
+
+
+def test_runs_and_symbols_are_listed(archive):
+    article_store, ids = store_with_articles()
+    archive.write("2025-08-08T17:30:00", "NVDA", ids[:2], article_store)
+    archive.write("2025-08-01T17:30:00", "AMD", ids[2:], article_store)
+
+    assert archive.runs() == ["2025-08-01T17:30:00", "2025-08-08T17:30:00"]
+    assert archive.symbols() == ["AMD", "NVDA"]
+    assert archive.symbols("2025-08-08T17:30:00") == ["NVDA"]
+    assert archive.load("TSLA", ArticleStore()) == []
+
+
+def test_corrupted_index_fails_loudly(archive):
+    article_store, ids = store_with_articles()
+    archive.write("2025-08-08T17:30:00", "NVDA", ids, article_store)
+    with archive._connection:
+        archive._connection.execute("UPDATE articles SET length = length + 1 WHERE article_id = ?", (ids[0],))
+
+    loaded_store = ArticleStore()
+    archive.load("NVDA", loaded_store)
+    with pytest.raises(ValueError, match = "Corrupted archive entry"):
+        loaded_store.get(ids[0]).body
+
+
+def test_run_archive_is_weekly(tmp_path):
+    article_store, ids = store_with_articles()
+    directory = weekly_directory(str(tmp_path), NOW)
+
+    article_archive.open_run_archive(directory, "2025-08-08T17:30:00")
+    article_archive.archive_articles("NVDA", ids, article_store)
+    article_archive.close_run_archive()
+    # Nothing is archived once the run's archive is closed
+    article_archive.archive_articles("AMD", ids, article_store)
+
+    assert directory == str(tmp_path / "2025-W32")
+    reopened = ArticleArchive(directory)
+    assert reopened.symbols() == ["NVDA"]
+    reopened.close()
@@ -0,0 +1,86 @@
+from src.components.article_extractor import FallbackExtractor, LxmlExtractor, NewspaperExtractor
+
+PARAGRAPH = "Demand for chips keeps growing as data centres expand across the region."
+
+RULED_PAGE = f"""
+<html><body>
+  <nav><p>{PARAGRAPH} Subscribe to our newsletter for more stories.</p></nav>
+  <div class="sidebar"><p>{PARAGRAPH} Related stories.</p><p>{PARAGRAPH} More related stories.</p></div>
+  <div class="caas-body"><p>Shares rose.</p><p>{PARAGRAPH}</p></div>
+</body></html>
+"""
+
+DENSE_PAGE = f"""
+<html><body>
+  <header><p>{PARAGRAPH} Breaking news banner.</p></header>
+  <div class="teaser"><p>{PARAGRAPH} Teaser of another story.</p></div>
+  <article>
+    <div class="wrapper"><p>{PARAGRAPH} First.</p><p>Photo: Reuters</p></div>
+    <div class="wrapper"><p>{PARAGRAPH} Second.</p></div>
+    <div class="wrapper"><p>{PARAGRAPH} Third.</p></div>
+  </article>
+  <footer><p>{PARAGRAPH} Copyright notice.</p></footer>
+</body></html>
+"""
+
+# A page without paragraphs, whose text is only found by newspaper
+UNSTRUCTURED_PAGE = f"""
+<html><head><title>Chip demand</title></head><body>
+  <div class="story">{"".join(f"<span>{PARAGRAPH}</span><br>" for _ in range(8))}</div>
+</body></html>
+"""
+
+
+class RecordingExtractor:
+    def __init__(self, text: str):
+        self.text = text
+        self.calls = 0
+
+    def extract(self, html: str, url: str) -> str:
+        self.calls += 1
+        return self.text
+
+
+def test_domain_rule_selects_the_article_body():
+    text = LxmlExtractor().extract(RULED_PAGE, "https://finance.yahoo.com/news/chips")
+
+    # Every paragraph of a ruled container is kept, however short
+    assert text == f"Shares rose.\n\n{PARAGRAPH}"
+
+
+def test_domain_rules_only_apply_to_their_host():
+    text = LxmlExtractor().extract(RULED_PAGE, "https://news.example.com/chips")
+
+    assert text == f"{PARAGRAPH} Related stories.\n\n{PARAGRAPH} More related stories."
+
+
+def test_densest_element_is_the_article_body():
+    text = LxmlExtractor().extract(DENSE_PAGE, "https://news.example.com/chips")
+
+    # The article holding the wrappers outscores each of them, and short captions and boilerplate are dropped
+    assert text == f"{PARAGRAPH} First.\n\n{PARAGRAPH} Second.\n\n{PARAGRAPH} Third."
+
+
+def test_lower_min_paragraph_length_keeps_short_paragraphs():
+    text = LxmlExtractor(min_paragraph_length = 10).extract(DENSE_PAGE, "https://news.example.com/chips")
+
+    assert "Photo: Reuters" in text
+
+
+def test_empty_result_falls_back_to_newspaper():
+    assert LxmlExtractor().extract(UNSTRUCTURED_PAGE, "https://news.example.com/chips") == ""
+
+    text = FallbackExtractor(LxmlExtractor(), NewspaperExtractor()).extract(UNSTRUCTURED_PAGE, "https://news.example.com/chips")
+
+    assert text.count(PARAGRAPH) == 8
+
+
+def test_long_enough_result_skips_the_fallback():
+    fallback = RecordingExtractor("newspaper text")
+    extractor = FallbackExtractor(LxmlExtractor(), fallback, min_text_length = 100)
+
+    assert extractor.extract(DENSE_PAGE, "https://news.example.com/chips").startswith(PARAGRAPH)
+    assert fallback.calls == 0
+    # A short result is only replaced by a longer one from the fallback
+    assert FallbackExtractor(LxmlExtractor(), fallback, min_text_length = 1000).extract(DENSE_PAGE, "https://news.example.com/chips").startswith(PARAGRAPH)
+    assert fallback.calls == 1
@@ -0,0 +1,70 @@
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+from langchain_core.messages import HumanMessage
+from src.components.analyse_sentiment import format_report
+from src.components.article_store import ArticleStore
+from src.components.schemas import Report
+
+NOW = datetime(2025, 8, 8, 17, 30, tzinfo = ZoneInfo("Asia/Bangkok"))
+
+
+def test_most_recent_ignores_retrieval_order():
+    article_store = ArticleStore()
+    # Sources are retrieved one after the other, so an older article of the first source comes first
+    old = article_store.add("Old", "https://a.example.com/old", "A", NOW - timedelta(days = 5), "old body")
+    undated = article_store.add("Undated", "https://b.example.com/undated", "B", None, "undated body")
+    new = article_store.add("New", "https://b.example.com/new", "B", NOW - timedelta(hours = 1), "new body")
+    newer = article_store.add("Newer", "https://c.example.com/newer", "C", NOW, "newer body")
+
+    assert article_store.most_recent([old, undated, new, newer], 2) == [newer, new]
+    assert article_store.most_recent([old, undated, new, newer], 10) == [newer, new, old, undated]
+
+
+def store_with_articles():
+    article_store = ArticleStore()
+    ids = [
+        article_store.add("Chip demand", "https://a.example.com/chips", "A", NOW, "  Demand for chips keeps growing.  "),
+        article_store.add("Rate cut", "", "B", NOW, "The central bank cut rates."),
+        article_store.add("Earnings beat", "https://c.example.com/earnings", "C", NOW, "Earnings beat estimates."),
+    ]
+    return article_store, ids
+
+
+def test_articles_are_identified_by_link_or_title():
+    article_store, ids = store_with_articles()
+
+    # The same article retrieved twice is stored once
+    assert article_store.add("Chip demand (updated)", "https://a.example.com/chips", "A", NOW, "other body") == ids[0]
+    assert article_store.add("Rate cut", "", "D", NOW, "same title") == ids[1]
+    assert len(article_store) == 3
+    assert article_store.get(ids[0]).body == "Demand for chips keeps growing."
+
+
+def test_articles_are_numbered_by_position():
+    article_store, ids = store_with_articles()
+
+    news = article_store.format_news(ids)
+
+    assert news.index("News Article 0") < news.index("News Title: Chip demand") < news.index("News Article 1")
+    assert "News Article 2 ==========\n        News Title: Earnings beat" in news
+
+
+def test_citations_keep_the_numbering_of_all_articles():
+    article_store, ids = store_with_articles()
+    report = Report(report = "Sentiment is positive.", current_sentiment = "Positive", citations = [1, 2])
+
+    message = article_store.render_message(format_report(report, ids), ids)
+
+    assert message.additional_kwargs == {}
+    assert "News Title: Chip demand" not in message.content
+    assert "News Article 1 ==========" in message.content
+    assert "News URL: [Link Unavailable]" in message.content
+    assert "News Article 2 ==========" in message.content
+    assert "News URL: https://c.example.com/earnings" in message.content
+
+
+def test_messages_without_citations_are_not_rendered():
+    article_store, ids = store_with_articles()
+    message = HumanMessage(content = "Grade the report")
+
+    assert article_store.render_messages([message], ids) == [message]
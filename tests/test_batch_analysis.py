@@ -0,0 +1,128 @@
+import pytest
+from langchain_core.runnables import RunnableLambda
+from src import generate_reports
+from src.components import batch_analysis
+from src.components.article_store import ArticleStore
+from src.components.batch_analysis import generate_batch_reports, group_assets
+from src.components.schemas import (
+    AssetGroundedness, AssetInformation, AssetReport, AssetUsefulness, BatchGroundednessOutput, BatchReport,
+    BatchUsefulnessOutput, GroundednessOutput, Report, Step, UsefulnessOutput
+)
+from config import settings
+
+STEP = [Step(description = "Read the report", output = "Checked")]
+
+
+def asset(symbol):
+    return AssetInformation(asset_type = "stocks", trading_symbol = symbol, trading_exchange = "NASDAQ", symbol_alias = symbol)
+
+
+class ScriptedModel:
+    """A model returning the scripted responses of each structured output schema in turn, recording its prompts."""
+
+    def __init__(self, responses):
+        self.responses = {schema : list(outputs) for schema, outputs in responses.items()}
+        self.prompts = []
+
+    def with_structured_output(self, schema, **kwargs):
+        def respond(prompt):
+            self.prompts.append((schema, prompt.to_string()))
+            return self.responses[schema].pop(0)
+        return RunnableLambda(respond)
+
+
+def reports(*symbols):
+    return BatchReport(reports = [
+        AssetReport(trading_symbol = symbol, report = Report(report = f"{symbol} report", current_sentiment = "Neutral"))
+        for symbol in symbols
+    ])
+
+
+def usefulness(**verdicts):
+    return BatchUsefulnessOutput(evaluations = [
+        AssetUsefulness(trading_symbol = symbol, evaluation = UsefulnessOutput(
+            chain_of_thought = STEP, is_useful = useful, criticisms = None if useful else [f"Cover the outlook of {symbol}"]
+        ))
+        for symbol, useful in verdicts.items()
+    ])
+
+
+def groundedness(*symbols):
+    return BatchGroundednessOutput(evaluations = [
+        AssetGroundedness(trading_symbol = symbol, evaluation = GroundednessOutput(chain_of_thought = STEP, is_grounded = True, criticisms = None))
+        for symbol in symbols
+    ])
+
+
+@pytest.fixture
+def batch(monkeypatch):
+    previous = settings.get("grading")
+    settings.set("grading", {"compact" : False})
+    monkeypatch.setattr(batch_analysis, "email_formatter", lambda state, model, asset, article_store: {"email" : f"<p>{asset.trading_symbol}</p>"})
+
+    article_store = ArticleStore()
+    article_ids = {
+        symbol : [article_store.add(f"{symbol} news", f"https://news.example.com/{symbol}", "Example", None, f"{symbol} body")]
+        for symbol in ("AMD", "INTC")
+    }
+    yield article_store, article_ids
+    settings.set("grading", previous)
+
+
+def test_groups_respect_the_token_and_size_limits():
+    assets = [asset(symbol) for symbol in ("A", "B", "C", "D", "E")]
+    tokens = {"A" : 50, "B" : 40, "C" : 30, "D" : 20, "E" : 10}
+
+    groups = group_assets(assets, tokens, max_group_tokens = 60, max_group_size = 2)
+    assert [[a.trading_symbol for a in group] for group in groups] == [["A", "E"], ["B", "D"], ["C"]]
+
+    groups = group_assets(assets, dict.fromkeys(tokens, 1), max_group_tokens = 60, max_group_size = 2)
+    assert [len(group) for group in groups] == [2, 2, 1]
+
+
+def test_partial_and_failing_reports_are_analysed_again(batch):
+    article_store, article_ids = batch
+    generator = ScriptedModel({BatchReport : [reports("AMD"), reports("INTC"), reports("INTC")]})
+    critic = ScriptedModel({
+        BatchUsefulnessOutput : [usefulness(AMD = True), usefulness(INTC = False), usefulness(INTC = True)],
+        BatchGroundednessOutput : [groundedness("AMD"), groundedness("INTC")],
+    })
+
+    emails, omitted = generate_batch_reports([asset("AMD"), asset("INTC")], article_ids, generator, critic, article_store, 3)
+
+    assert {symbol : email for symbol, (email, _) in emails.items()} == {"AMD" : "<p>AMD</p>", "INTC" : "<p>INTC</p>"}
+    assert omitted == []
+    # The asset omitted from the first round is analysed alone, then again with its criticisms
+    assert 'trading_symbol="AMD"' not in generator.prompts[1][1]
+    assert "Cover the outlook of INTC" in generator.prompts[2][1]
+
+
+def test_assets_left_out_of_the_last_round_are_returned(batch):
+    article_store, article_ids = batch
+    generator = ScriptedModel({BatchReport : [reports("AMD"), reports()]})
+    critic = ScriptedModel({BatchUsefulnessOutput : [usefulness(AMD = True)], BatchGroundednessOutput : [groundedness("AMD")]})
+
+    emails, omitted = generate_batch_reports([asset("AMD"), asset("INTC")], article_ids, generator, critic, article_store, 2)
+
+    assert list(emails) == ["AMD"]
+    assert omitted == [asset("INTC")]
+
+
+def test_left_out_assets_are_generated_on_their_own(batch, monkeypatch):
+    article_store, article_ids = batch
+    calls = []
+
+    def generate_report_for_symbol(asset_type, symbol, exchange, alias, **kwargs):
+        calls.append((symbol, kwargs["article_ids"], kwargs["max_reflection_round"]))
+        return f"<p>{symbol} alone</p>"
+
+    monkeypatch.setattr(generate_reports, "generate_batch_reports", lambda *args: ({"AMD" : ("<p>AMD</p>", Report())}, [asset("INTC")]))
+    monkeypatch.setattr(generate_reports, "generate_report_for_symbol", generate_report_for_symbol)
+    monkeypatch.setattr(generate_reports.time, "sleep", lambda seconds: None)
+
+    sections = generate_reports.generate_batch_sections(
+        [asset("AMD"), asset("INTC")], article_ids, {}, None, None, article_store, max_reflection_round = 1
+    )
+
+    assert sections == {"AMD" : "<p>AMD</p>", "INTC" : "<p>INTC alone</p>"}
+    assert calls == [("INTC", article_ids["INTC"], 1)]
@@ -0,0 +1,107 @@
+import email
+import socket
+import pytest
+from src.components.delivery import Digest, assemble_digests, build_digests, compose_email, send_emails
+from src.components.schemas import DeliveryConfig, Subscriber
+
+aiosmtpd_controller = pytest.importorskip("aiosmtpd.controller")
+
+
+class Mailbox:
+    """An SMTP stand-in refusing `refused@example.com`, rejecting the data of `rejected@example.com` and closing the connection on `dropped@example.com`."""
+
+    def __init__(self):
+        self.messages = []
+        self.connections = set()
+
+    async def handle_RCPT(self, server, session, envelope, address, rcpt_options):
+        if address == "refused@example.com":
+            return "550 No such user"
+        envelope.rcpt_tos.append(address)
+        return "250 OK"
+
+    async def handle_DATA(self, server, session, envelope):
+        if envelope.rcpt_tos == ["rejected@example.com"]:
+            return "554 Message rejected"
+        if envelope.rcpt_tos == ["dropped@example.com"]:
+            return "421 Closing connection"
+
+        self.connections.add(session.peer)
+        self.messages.append((envelope.rcpt_tos[0], email.message_from_bytes(envelope.content)))
+        return "250 Message accepted"
+
+
+@pytest.fixture
+def mailbox():
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+
+    mailbox = Mailbox()
+    controller = aiosmtpd_controller.Controller(mailbox, hostname = "127.0.0.1", port = port)
+    controller.start()
+    yield mailbox, port
+    controller.stop()
+
+
+def delivery_config(port, batch_size = 2):
+    return DeliveryConfig(smtp_host = "127.0.0.1", smtp_port = port, security = "none", batch_size = batch_size)
+
+
+def emails(*recipients):
+    return [compose_email("2025-08-08 Sentiment Report", f"<h2>Report</h2><p>For {recipient}</p>", "sender@example.com", recipient) for recipient in recipients]
+
+
+def test_emails_are_sent_in_batches(mailbox):
+    mailbox, port = mailbox
+    recipients = [f"subscriber{i}@example.com" for i in range(5)]
+
+    assert send_emails(emails(*recipients), "sender@example.com", None, delivery_config(port, batch_size = 2)) == 5
+    assert [recipient for recipient, _ in mailbox.messages] == recipients
+    # One connection per batch of two emails
+    assert len(mailbox.connections) == 3
+
+
+def test_emails_carry_a_plain_text_alternative(mailbox):
+    mailbox, port = mailbox
+    body = "<h2>Weekly Sentiment Summary</h2><table><tr><td>Big tech</td><td>Positive</td></tr></table><p>Nvidia beat estimates.</p>"
+    send_emails([compose_email("Report", body, "sender@example.com", "reader@example.com")], "sender@example.com", None, delivery_config(port))
+
+    (_, message), = mailbox.messages
+    assert message.get_content_type() == "multipart/alternative"
+    plain, html = message.get_payload()
+    assert plain.get_content_type() == "text/plain"
+    assert html.get_content_type() == "text/html"
+    assert plain.get_payload(decode = True).decode().splitlines() == ["Weekly Sentiment Summary", "Big tech Positive", "Nvidia beat estimates."]
+    assert "<table>" in html.get_payload(decode = True).decode()
+
+
+def test_rejected_messages_do_not_stop_the_batch(mailbox):
+    mailbox, port = mailbox
+    recipients = ["refused@example.com", "rejected@example.com", "first@example.com", "dropped@example.com", "second@example.com"]
+
+    sent = send_emails(emails(*recipients), "sender@example.com", None, delivery_config(port, batch_size = 10))
+
+    # The refused and rejected messages are skipped, and the batch reconnects after the dropped connection
+    assert sent == 2
+    assert [recipient for recipient, _ in mailbox.messages] == ["first@example.com", "second@example.com"]
+    assert len(mailbox.connections) == 2
+
+
+def test_an_unreachable_server_fails_without_raising():
+    # Nothing listens on the port
+    assert send_emails(emails("reader@example.com"), "sender@example.com", None, delivery_config(1)) == 0
+
+
+def test_subscribers_share_sections_generated_once():
+    config = DeliveryConfig(subscribers = [
+        Subscriber(email = "a@example.com", watchlist = ["BTCUSDT", "NVDA", "UNKNOWN"]),
+        Subscriber(email = "b@example.com", watchlist = ["NVDA", "BTCUSDT"]),
+        Subscriber(email = "c@example.com", watchlist = ["TSLA"]),
+    ])
+    digests = build_digests({"BINANCE" : ["BTCUSDT"], "NASDAQ" : ["NVDA", "TSLA"]}, {"BINANCE" : "cryptocurrency", "NASDAQ" : "stocks"}, "2025-08-08", None, config)
+    assert [digest.symbols for digest in digests] == [["BTCUSDT", "NVDA"], ["NVDA", "BTCUSDT"], ["TSLA"]]
+
+    # TSLA failed, so its subscriber receives no email
+    messages = assemble_digests(digests, {"BTCUSDT" : "<p>btc</p>", "NVDA" : "<p>nvda</p>", "TSLA" : ""}, "sender@example.com")
+    assert [message["To"] for message in messages] == ["a@example.com", "b@example.com"]
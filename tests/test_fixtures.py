@@ -0,0 +1,93 @@
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+import pytest
+from langchain_core.runnables import RunnableLambda
+import src.components.retrieve_news as retrieve_news
+import src.components.retrieval_scheduler as retrieval_scheduler
+from src.components import fixtures
+from src.components.article_extractor import LxmlExtractor
+from src.components.fixtures import FixtureChatModel, FixtureMissingError, FixtureScheduler, FixtureStore
+from src.components.schemas import AssetInformation, NewsSourceConfig
+
+ASSET = AssetInformation(asset_type = "stocks", trading_symbol = "NVDA", trading_exchange = "NASDAQ", symbol_alias = "Nvidia")
+BODY = "Nvidia shares rose after the company reported record data center revenue for the quarter."
+
+
+class FakeTicker:
+    """Stands in for `yf.Ticker`, listing a single story published the day before the recorded run."""
+    live = True
+    published = None
+
+    def __init__(self, ticker):
+        self.ticker = ticker
+
+    def get_news(self, count):
+        assert FakeTicker.live, "replayed runs must not call the source"
+        return [{
+            "content" : {
+                "contentType" : "STORY",
+                "pubDate" : FakeTicker.published.astimezone(ZoneInfo("UTC")).strftime("%Y-%m-%dT%H:%M:%SZ"),
+                "provider" : {"displayName" : "Example News"},
+                "title" : "Nvidia beats estimates",
+                "canonicalUrl" : {"url" : "https://news.example.com/nvidia"},
+            }
+        }]
+
+
+def fake_download(url, timeout = None):
+    assert FakeTicker.live, "replayed runs must not download articles"
+    return f"<html><body><article><p>{BODY}</p></article></body></html>"
+
+
+@pytest.fixture(autouse = True)
+def offline_sources(monkeypatch):
+    monkeypatch.setattr(retrieve_news.yf, "Ticker", FakeTicker)
+    monkeypatch.setattr(retrieval_scheduler, "download_html", fake_download)
+    monkeypatch.setattr(fixtures, "_fixture_store", None)
+    FakeTicker.live = True
+
+
+def run(fixture_store):
+    """Retrieves the news of the asset and summarises them with a model, through the fixture store."""
+    fixtures.set_fixture_store(fixture_store)
+    scheduler = FixtureScheduler(fixture_store, symbol_budget = 30, request_timeout = 5)
+    source = retrieve_news.YFinanceSource("yfinance", NewsSourceConfig(source_class = "YFinanceSource", freshness_days = 7))
+    try:
+        news = retrieve_news.collect_news(ASSET, LxmlExtractor(min_paragraph_length = 20), scheduler, [source])
+    finally:
+        scheduler.shutdown()
+
+    model = FixtureChatModel(
+        RunnableLambda(lambda prompt: f"{len(prompt)} characters summarised") if fixture_store.mode == "record" else None,
+        "ChatOpenAI:gpt-4.1-mini",
+        fixture_store
+    )
+    return news, model.invoke("\n".join(doc.page_content for doc in news))
+
+
+def test_replay_reproduces_an_old_recording_offline(tmp_path):
+    # The run is recorded 30 days ago, well past the 7-day freshness window of the source
+    recorded_at = datetime.now(ZoneInfo("Asia/Bangkok")) - timedelta(days = 30)
+    FakeTicker.published = recorded_at - timedelta(days = 1)
+    recorded_news, recorded_summary = run(FixtureStore(str(tmp_path), "record", recorded_at))
+    assert [doc.page_content for doc in recorded_news] == [BODY]
+
+    FakeTicker.live = False
+    fixtures.set_fixture_store(None)
+    replay_store = FixtureStore(str(tmp_path), "replay")
+    assert replay_store.executed_time == recorded_at
+    assert fixtures.run_time() != recorded_at
+
+    replayed_news, replayed_summary = run(replay_store)
+    assert fixtures.run_time() == recorded_at
+    assert [doc.page_content for doc in replayed_news] == [BODY]
+    assert [doc.metadata for doc in replayed_news] == [doc.metadata for doc in recorded_news]
+    assert replayed_summary == recorded_summary
+
+
+def test_replay_of_an_unrecorded_call_fails(tmp_path):
+    fixture_store = FixtureStore(str(tmp_path), "replay")
+    model = FixtureChatModel(None, "ChatOpenAI:gpt-4.1-mini", fixture_store)
+
+    with pytest.raises(FixtureMissingError):
+        model.invoke("never recorded")
@@ -0,0 +1,113 @@
+import os
+import json
+import pytest
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+import src.generate_reports as generate_reports
+from src.components import article_archive, run_summary
+from src.components.report_cache import ReportCache
+from src.components.run_planner import RunPlanner
+from src.components.schemas import AssetInformation, Report
+from config import settings
+
+
+@pytest.fixture
+def run_settings(tmp_path, monkeypatch):
+    """Enables the archive and the run summaries under a temporary directory, and generates the reports without any LLM call."""
+    overrides = {
+        "archive" : {"enabled" : True, "path" : str(tmp_path / "archive")},
+        "run_summary" : {"enabled" : True, "path" : str(tmp_path / "run_summaries")},
+        "planning" : {"enabled" : False},
+        "batching" : {"enabled" : True},
+        "assets" : {"nasdaq" : {"Nvidia" : "NVDA"}},
+        "delivery" : {"subscribers" : []},
+    }
+    previous = {key : settings.get(key) for key in overrides}
+    for key, value in overrides.items():
+        settings.set(key, value)
+
+    def generate(assets, retrieval_scheduler, news_store, report_cache, reports):
+        reports.update({asset.trading_symbol : Report(current_sentiment = "Positive") for asset in assets})
+        return {asset.trading_symbol : f"<p>{asset.trading_symbol}</p>" for asset in assets}
+
+    monkeypatch.setattr(generate_reports, "generate_batched_reports", generate)
+    yield tmp_path
+
+    for key, value in previous.items():
+        settings.set(key, value)
+
+
+@pytest.mark.parametrize("record_run", [True, False])
+def test_replayed_and_profiled_runs_are_not_recorded(run_settings, record_run):
+    generate_reports.generate_and_send_reports({"NASDAQ" : "stocks"}, use_report_cache = False, send = False, record_run = record_run)
+
+    assert os.path.isdir(run_settings / "archive") == record_run
+    assert os.path.isdir(run_settings / "run_summaries") == record_run
+
+
+def test_failed_run_is_summarised_and_released(run_settings, monkeypatch):
+    def fail(assets, retrieval_scheduler, news_store, report_cache, reports):
+        raise RuntimeError("model unavailable")
+
+    monkeypatch.setattr(generate_reports, "generate_batched_reports", fail)
+
+    with pytest.raises(RuntimeError):
+        generate_reports.generate_and_send_reports({"NASDAQ" : "stocks"}, use_report_cache = False, send = False)
+
+    [name] = os.listdir(run_settings / "run_summaries")
+    with open(run_settings / "run_summaries" / name) as f:
+        assert json.load(f)["error"] == "RuntimeError: model unavailable"
+
+    assert article_archive._archive is None
+    assert run_summary._summary is None
+    # The partial metrics of the failed run are not compared with the next run
+    assert run_summary.load_previous_summary(str(run_settings / "run_summaries")) is None
+
+
+@pytest.mark.parametrize("mode", ["full", "degraded"])
+def test_degraded_batches_get_the_newest_articles_and_are_not_cached(tmp_path, monkeypatch, mode):
+    previous = {key : settings.get(key) for key in ("planning", "batching")}
+    settings.set("planning", {"enabled" : True, "degraded_max_articles" : 2, "history_path" : str(tmp_path / "costs.sqlite")})
+    settings.set("batching", {"enabled" : True})
+    assets = [AssetInformation(asset_type = "stocks", trading_symbol = symbol, trading_exchange = "NASDAQ", symbol_alias = symbol) for symbol in ("AMD", "INTC")]
+    now = datetime(2025, 8, 8, tzinfo = ZoneInfo("Asia/Bangkok"))
+    calls = []
+
+    def retrieve_all_articles(assets, retrieval_scheduler, article_store, news_store):
+        return {
+            asset.trading_symbol : [
+                article_store.add(f"{asset.trading_symbol} {age}", f"https://news.example.com/{asset.trading_symbol}/{age}", "Example", now - timedelta(days = age), "body")
+                for age in (3, 0, 2, 1)
+            ]
+            for asset in assets
+        }
+
+    def generate_batch_sections(batch, article_ids, hashes, generator_model, critic_model, article_store, report_cache, max_reflection_round, reports):
+        calls.append(({symbol : [article_store.get(i).title for i in ids] for symbol, ids in article_ids.items()}, report_cache, max_reflection_round))
+        return {asset.trading_symbol : "" for asset in batch}
+
+    def plan(self, units):
+        for unit in units:
+            unit.mode = mode
+
+    monkeypatch.setattr(generate_reports, "retrieve_all_articles", retrieve_all_articles)
+    monkeypatch.setattr(generate_reports, "group_low_news_assets", lambda assets, *args: [assets])
+    monkeypatch.setattr(generate_reports, "build_model", lambda model_config: None)
+    monkeypatch.setattr(generate_reports, "generate_batch_sections", generate_batch_sections)
+    monkeypatch.setattr(RunPlanner, "plan", plan)
+    report_cache = ReportCache(str(tmp_path / "reports.sqlite"))
+
+    try:
+        generate_reports.generate_planned_reports(assets, None, report_cache = report_cache, record_costs = False)
+    finally:
+        report_cache.close()
+        for key, value in previous.items():
+            settings.set(key, value)
+
+    [(titles, cache, rounds)] = calls
+    if mode == "degraded":
+        assert titles == {"AMD" : ["AMD 0", "AMD 1"], "INTC" : ["INTC 0", "INTC 1"]}
+        assert (cache, rounds) == (None, 1)
+    else:
+        assert titles["AMD"] == ["AMD 3", "AMD 0", "AMD 2", "AMD 1"]
+        assert (cache, rounds) == (report_cache, None)
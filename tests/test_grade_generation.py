@@ -0,0 +1,110 @@
+import time
+import threading
+import pytest
+from langchain_core.messages import AIMessageChunk
+from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.runnables import Runnable, RunnableLambda
+from src.components.analyse_sentiment import format_report
+from src.components.article_store import ArticleStore
+from src.components.grade_generation import evaluate, format_speculatively, passed
+from src.components.schemas import (
+    AssetInformation, CompactUsefulnessOutput, MAX_CRITICISMS, MAX_CRITICISM_LENGTH, Report, State, Step, UsefulnessOutput
+)
+from config import settings
+
+ASSET = AssetInformation(asset_type = "stocks", trading_symbol = "AMD", trading_exchange = "NASDAQ", symbol_alias = "AMD")
+
+
+class StreamedEmail(Runnable):
+    """A formatting model streaming an email one slow chunk at a time."""
+
+    def __init__(self, chunks : int, delay : float = 0):
+        self.chunks = chunks
+        self.delay = delay
+        self.started = threading.Event()
+        self.streamed = 0
+
+    def invoke(self, input, config = None, **kwargs):
+        raise AssertionError("Speculative emails are streamed")
+
+    def stream(self, input, config = None, **kwargs):
+        for _ in range(self.chunks):
+            self.streamed += 1
+            self.started.set()
+            time.sleep(self.delay)
+            yield AIMessageChunk(content = "<p></p>")
+
+
+@pytest.fixture
+def graded_state():
+    previous = settings.get("streaming")
+    settings.set("streaming", {"enabled" : True, "max_attempts" : 2, "speculative_formatting" : True})
+
+    article_store = ArticleStore()
+    article_ids = [article_store.add("Chip demand", "https://a.example.com/chips", "A", None, "Demand for chips keeps growing.")]
+    report = Report(report = "Demand for chips keeps growing.", current_sentiment = "Positive", citations = [0])
+    yield article_store, State(article_ids = article_ids, messages = [format_report(report, article_ids)], report = report)
+    settings.set("streaming", previous)
+
+
+def test_speculative_email_of_a_passing_report(graded_state):
+    article_store, state = graded_state
+
+    speculative_email = format_speculatively(state, StreamedEmail(3), ASSET, article_store)
+
+    assert passed(speculative_email) == {"self_reflection_passed" : True, "email" : "<p></p>" * 3}
+
+
+def test_cancelled_formatting_stops_streaming(graded_state):
+    article_store, state = graded_state
+    model = StreamedEmail(100, delay = 0.01)
+
+    speculative_email = format_speculatively(state, model, ASSET, article_store)
+    assert model.started.wait(5)
+    speculative_email.cancel()
+
+    # The running formatting stops at the next chunk rather than generating the whole email
+    assert speculative_email.result() == {}
+    assert model.streamed < 100
+
+
+class ScriptedCritic:
+    """A critic answering each structured output schema with its scripted response, recording the prompts."""
+
+    def __init__(self, responses):
+        self.responses = responses
+        self.prompts = []
+
+    def with_structured_output(self, schema, **kwargs):
+        def respond(prompt):
+            self.prompts.append((schema, prompt.to_string()))
+            return self.responses[schema]
+        return RunnableLambda(respond)
+
+
+FULL = UsefulnessOutput(chain_of_thought = [Step(description = "Read the report", output = "Vague")], is_useful = False, criticisms = ["State the outlook"])
+
+
+@pytest.mark.parametrize("is_useful, confidence, escalated", [(True, "high", False), (True, "low", True), (False, "high", True)])
+def test_compact_grades_escalate_unless_confidently_passing(is_useful, confidence, escalated):
+    compact = CompactUsefulnessOutput(is_useful = is_useful, confidence = confidence, criticisms = None if is_useful else ["Vague outlook"])
+    critic = ScriptedCritic({CompactUsefulnessOutput : compact, UsefulnessOutput : FULL})
+    prompt = ChatPromptTemplate([("system", "Grade the report of {symbol_alias}"), ("human", "{report}")])
+
+    verdict = evaluate(
+        prompt, {"report" : "AMD is up", "symbol_alias" : "AMD"}, critic,
+        UsefulnessOutput, CompactUsefulnessOutput, "is_useful", compact = True
+    )
+
+    assert verdict == ((False, ["State the outlook"]) if escalated else (True, None))
+    assert [schema for schema, _ in critic.prompts] == [CompactUsefulnessOutput] + ([UsefulnessOutput] if escalated else [])
+    # Only the compact grade is asked for bounded criticisms
+    assert f"give at most {MAX_CRITICISMS}" in critic.prompts[0][1]
+    assert all("give at most" not in prompt for _, prompt in critic.prompts[1:])
+
+
+def test_compact_schema_bounds_the_criticisms():
+    criticisms = CompactUsefulnessOutput.model_json_schema()["properties"]["criticisms"]["anyOf"][0]
+
+    assert criticisms["maxItems"] == MAX_CRITICISMS
+    assert criticisms["items"]["maxLength"] == MAX_CRITICISM_LENGTH
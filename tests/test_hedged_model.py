@@ -0,0 +1,129 @@
+import json
+import asyncio
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+from langchain_core.runnables import RunnableLambda
+from langchain_openai import ChatOpenAI
+from src.components.hedged_model import HedgedChatModel, get_latency_histogram
+from src.components.token_usage import track_token_usage
+
+
+def delayed(answer: str, delay: float, error: Exception = None) -> RunnableLambda:
+    async def call(_):
+        await asyncio.sleep(delay)
+        if error is not None:
+            raise error
+        return answer
+    return RunnableLambda(call)
+
+
+def hedged(primary: RunnableLambda, secondary: RunnableLambda, name: str, initial_delay: float = 0.1) -> HedgedChatModel:
+    return HedgedChatModel(primary, secondary, f"{name}-primary", f"{name}-secondary", initial_delay = initial_delay)
+
+
+def test_cancelled_primary_is_recorded_at_its_elapsed_time():
+    model = hedged(delayed("primary", 5), delayed("secondary", 0.05), "cancelled")
+
+    assert model.invoke("request") == "secondary"
+
+    histogram = get_latency_histogram("cancelled-primary")
+    assert histogram.count == 1
+    # Censored at the time the secondary returned, after the hedge delay
+    assert 0.25 >= histogram.percentile(50) > 0
+    assert get_latency_histogram("cancelled-secondary").count == 1
+
+
+def test_timed_out_primary_is_recorded():
+    model = hedged(delayed("primary", 0.05, TimeoutError("read timed out")), delayed("secondary", 0.01), "timeout", initial_delay = 1)
+
+    assert model.invoke("request") == "secondary"
+    assert get_latency_histogram("timeout-primary").count == 1
+
+
+def test_failed_primary_is_not_recorded():
+    model = hedged(delayed("primary", 0.01, ValueError("invalid request")), delayed("secondary", 0.01), "failed", initial_delay = 1)
+
+    assert model.invoke("request") == "secondary"
+    assert get_latency_histogram("failed-primary").count == 0
+
+
+def test_invoke_within_a_running_loop():
+    model = hedged(delayed("primary", 0.01), delayed("secondary", 0.01), "nested", initial_delay = 1)
+
+    async def caller():
+        return model.invoke("request")
+
+    assert asyncio.run(caller()) == "primary"
+
+
+def test_both_failures_raise_the_last_error():
+    model = hedged(delayed("primary", 0.01, ValueError("primary")), delayed("secondary", 0.01, ValueError("secondary")), "both", initial_delay = 1)
+
+    with pytest.raises(ValueError, match = "secondary"):
+        model.invoke("request")
+
+
+class CompletionsHandler(BaseHTTPRequestHandler):
+    """A local OpenAI-compatible server answering every chat completion with the server's name."""
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        body = json.dumps({
+            "id" : "chatcmpl-local", "object" : "chat.completion", "created" : 0, "model" : "local",
+            "choices" : [{"index" : 0, "message" : {"role" : "assistant", "content" : self.server.name}, "finish_reason" : "stop"}],
+            "usage" : {"prompt_tokens" : 1, "completion_tokens" : 1, "total_tokens" : 2},
+        }).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+@pytest.fixture
+def completion_servers():
+    servers = []
+    for name in ("primary", "secondary"):
+        server = ThreadingHTTPServer(("127.0.0.1", 0), CompletionsHandler)
+        server.name = name
+        threading.Thread(target = server.serve_forever, daemon = True).start()
+        servers.append(server)
+    yield servers
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def test_repeated_calls_reuse_the_primary_client(completion_servers):
+    primary, secondary = (
+        ChatOpenAI(model = "local", api_key = "local", base_url = f"http://127.0.0.1:{server.server_address[1]}/v1", max_retries = 0)
+        for server in completion_servers
+    )
+    model = HedgedChatModel(primary, secondary, "openai-primary", "openai-secondary", initial_delay = 5)
+
+    async def caller():
+        return model.invoke("request").content
+
+    # The async client of the primary keeps its pooled connections from one call to the next
+    assert [model.invoke("request").content for _ in range(3)] == ["primary"] * 3
+    assert asyncio.run(caller()) == "primary"
+
+
+def test_hedged_calls_keep_the_callers_token_usage(completion_servers):
+    primary, secondary = (
+        ChatOpenAI(model = "local", api_key = "local", base_url = f"http://127.0.0.1:{server.server_address[1]}/v1", max_retries = 0)
+        for server in completion_servers
+    )
+    model = HedgedChatModel(primary, secondary, "usage-primary", "usage-secondary", initial_delay = 5)
+
+    with track_token_usage() as token_usage:
+        model.invoke("request")
+        asyncio.run(model.ainvoke("request"))
+
+    assert token_usage.calls == 2
+    assert token_usage.total_tokens == 4
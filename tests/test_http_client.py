@@ -0,0 +1,171 @@
+import os
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+import requests
+from src.components.http_client import HttpCache, HttpClient
+
+LAST_MODIFIED = "Fri, 08 Aug 2025 10:30:00 GMT"
+
+
+class NewsHandler(BaseHTTPRequestHandler):
+    """A local news site serving pages with validators, a slow page and a page failing twice before succeeding."""
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def respond(self, status, body = b"", headers = None):
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.requests.append((self.path, dict(self.headers)))
+
+        if self.path == "/etag":
+            if self.headers.get("If-None-Match") == '"v1"':
+                return self.respond(304)
+            return self.respond(200, b"etag page", {"ETag" : '"v1"'})
+
+        if self.path == "/modified":
+            if self.headers.get("If-Modified-Since") == LAST_MODIFIED:
+                return self.respond(304)
+            return self.respond(200, b"modified page", {"Last-Modified" : LAST_MODIFIED})
+
+        if self.path == "/slow":
+            with server.lock:
+                server.in_flight += 1
+                server.max_in_flight = max(server.max_in_flight, server.in_flight)
+            time.sleep(0.2)
+            with server.lock:
+                server.in_flight -= 1
+            return self.respond(200, b"slow page")
+
+        if self.path == "/flaky":
+            with server.lock:
+                server.flaky_calls += 1
+                calls = server.flaky_calls
+            if calls <= 2:
+                return self.respond(503, b"unavailable")
+            return self.respond(200, b"recovered")
+
+        return self.respond(404, b"not found")
+
+
+@pytest.fixture
+def news_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), NewsHandler)
+    server.lock = threading.Lock()
+    server.requests = []
+    server.in_flight = server.max_in_flight = server.flaky_calls = 0
+    threading.Thread(target = server.serve_forever, daemon = True).start()
+    yield server, f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+def requests_to(server, path):
+    return [headers for request_path, headers in server.requests if request_path == path]
+
+
+@pytest.mark.parametrize("path,validator", [("/etag", "If-None-Match"), ("/modified", "If-Modified-Since")])
+def test_cached_responses_are_revalidated(news_server, tmp_path, path, validator):
+    server, base_url = news_server
+    client = HttpClient(cache_dir = str(tmp_path))
+    first = client.get_text(base_url + path)
+
+    # A client of a later run revalidates the persisted response instead of downloading it again
+    later_client = HttpClient(cache_dir = str(tmp_path))
+    assert later_client.get_text(base_url + path) == first
+
+    sent = requests_to(server, path)
+    assert len(sent) == 2
+    assert validator not in sent[0]
+    assert validator in sent[1]
+
+
+def test_connections_per_host_are_capped(news_server):
+    server, base_url = news_server
+    client = HttpClient(max_connections_per_host = 2, retries = 0)
+
+    with ThreadPoolExecutor(max_workers = 6) as executor:
+        pages = list(executor.map(lambda _: client.get_text(base_url + "/slow"), range(6)))
+
+    assert pages == ["slow page"] * 6
+    assert server.max_in_flight == 2
+
+
+def test_transient_failures_are_retried_with_backoff(news_server):
+    server, base_url = news_server
+    client = HttpClient(retries = 2, backoff_factor = 0.1)
+
+    start = time.monotonic()
+    assert client.get_text(base_url + "/flaky") == "recovered"
+    assert server.flaky_calls == 3
+    assert time.monotonic() - start >= 0.1
+
+
+def test_retries_are_bounded(news_server):
+    server, base_url = news_server
+    client = HttpClient(retries = 1, backoff_factor = 0)
+
+    with pytest.raises(requests.HTTPError) as error:
+        client.get_text(base_url + "/flaky")
+    assert error.value.response.status_code == 503
+    assert server.flaky_calls == 2
+
+
+def test_client_errors_are_not_retried(news_server):
+    server, base_url = news_server
+    client = HttpClient(retries = 2, backoff_factor = 0)
+
+    with pytest.raises(requests.HTTPError):
+        client.get_text(base_url + "/missing")
+    assert len(requests_to(server, "/missing")) == 1
+
+
+def test_stale_responses_are_pruned_on_startup(news_server, tmp_path):
+    server, base_url = news_server
+    HttpClient(cache_dir = str(tmp_path)).get_text(base_url + "/etag")
+    HttpClient(cache_dir = str(tmp_path)).get_text(base_url + "/modified")
+    stale, fresh = sorted(os.listdir(tmp_path), key = lambda name: "etag page" not in (tmp_path / name).read_text())
+
+    month_ago = time.time() - 30 * 86400
+    os.utime(tmp_path / stale, (month_ago, month_ago))
+
+    assert HttpCache(str(tmp_path), max_age_days = 14).get(base_url + "/etag") is None
+    assert os.listdir(tmp_path) == [fresh]
+
+
+def test_least_recently_used_responses_are_pruned_beyond_the_size_cap(tmp_path):
+    for i in range(4):
+        path = tmp_path / f"{i}.json"
+        path.write_text("x" * 1024)
+        os.utime(path, (time.time() - 100 + i, time.time() - 100 + i))
+
+    HttpCache(str(tmp_path), max_size_mb = 2.5 / 1024)
+    assert sorted(os.listdir(tmp_path)) == ["2.json", "3.json"]
+
+
+def test_memory_keeps_the_most_recently_used_responses(news_server, tmp_path):
+    server, base_url = news_server
+    # Room in memory for a single page
+    client = HttpClient(cache_dir = str(tmp_path), cache_max_memory_mb = 14 / 1024 / 1024)
+    client.get_text(base_url + "/etag")
+    client.get_text(base_url + "/modified")
+
+    assert list(client.cache._entries) == [base_url + "/modified"]
+    assert client.cache._memory_size == len("modified page")
+
+    # The evicted response is read back from disk and still revalidated
+    assert client.get_text(base_url + "/etag") == "etag page"
+    assert requests_to(server, "/etag")[-1]["If-None-Match"] == '"v1"'
+    assert list(client.cache._entries) == [base_url + "/etag"]
@@ -0,0 +1,85 @@
+import time
+import asyncio
+import logging
+import pytest
+from datetime import datetime
+from langchain.docstore.document import Document
+from src.components import news_sources
+from src.components.news_sources import NewsSource, SourceLimiter, gather_news
+from src.components.retrieval_scheduler import RetrievalError, RetrievalScheduler
+from src.components.schemas import AssetInformation, NewsSourceConfig
+
+
+ASSET = AssetInformation(trading_symbol = "AAPL", trading_exchange = "NASDAQ", asset_type = "stocks", symbol_alias = "Apple")
+
+
+class StaticSource(NewsSource):
+    def __init__(self, name: str, articles: int = 1, error: Exception = None, **config):
+        super().__init__(name, NewsSourceConfig(source_class = "StaticSource", **config))
+        self.articles = articles
+        self.error = error
+
+    def retrieve(self, asset_information, executed_time, extractor, scheduler, deadline, known_links):
+        if self.error is not None:
+            raise self.error
+        return [Document(page_content = f"{self.name} {i}") for i in range(self.articles)]
+
+
+def gather(sources, scheduler = None):
+    scheduler = scheduler or RetrievalScheduler()
+    return asyncio.run(gather_news(sources, ASSET, datetime.now(), None, scheduler, time.monotonic() + 5))
+
+
+def test_sources_must_implement_retrieve():
+    class IncompleteSource(NewsSource):
+        pass
+
+    with pytest.raises(TypeError):
+        IncompleteSource("incomplete", NewsSourceConfig(source_class = "IncompleteSource"))
+
+
+def test_failing_source_does_not_fail_the_others():
+    scheduler = RetrievalScheduler()
+    news = gather([StaticSource("first", 2), StaticSource("broken", error = ValueError("bad listing")), StaticSource("last")], scheduler)
+
+    assert [doc.page_content for doc in news] == ["first 0", "first 1", "last 0"]
+    assert scheduler.failure_counts() == {"parse_error" : 1}
+
+
+def test_unsupported_sources_are_skipped():
+    news = gather([StaticSource("crypto", asset_types = ["cryptocurrency"]), StaticSource("nasdaq", exchanges = ["nasdaq"])])
+
+    assert [doc.page_content for doc in news] == ["nasdaq 0"]
+
+
+def test_profiled_retrieval_is_sequential_and_logged(monkeypatch, caplog):
+    monkeypatch.setattr(news_sources, "profiling_enabled", lambda: True)
+
+    with caplog.at_level(logging.INFO):
+        news = gather([StaticSource("first"), StaticSource("second")])
+
+    assert [doc.page_content for doc in news] == ["first 0", "second 0"]
+    assert "retrieving the 2 sources of AAPL sequentially" in caplog.text
+
+
+def test_limiter_spaces_out_retrievals():
+    limiter = SourceLimiter(max_concurrency = 2, rate_limit = 600)
+    starts = []
+
+    for _ in range(3):
+        with limiter.acquire(time.monotonic() + 5):
+            starts.append(time.monotonic())
+
+    assert starts[2] - starts[0] >= 0.19
+
+
+def test_limiter_gives_up_at_the_deadline():
+    limiter = SourceLimiter(max_concurrency = 1, rate_limit = 1)
+
+    with limiter.acquire(time.monotonic() + 5):
+        pass
+
+    with pytest.raises(RetrievalError) as error:
+        with limiter.acquire(time.monotonic() + 1):
+            pass
+    assert error.value.category == "budget_exceeded"
@@ -0,0 +1,101 @@
+from datetime import datetime
+from langchain_core.runnables import RunnableLambda
+from src import graph_constructor
+from src.components.article_store import ArticleStore
+from src.components.report_cache import CachedReport, ReportCache, article_fingerprint, content_hashes, prepare_update
+from src.components.schemas import Report, Step, UsefulnessOutput
+from config import settings
+
+
+def store_with_articles(*bodies: str):
+    article_store = ArticleStore()
+    ids = [article_store.add(f"Article {i}", f"https://news.example.com/{i}", "Example", datetime(2025, 8, 8), body) for i, body in enumerate(bodies)]
+    return article_store, ids
+
+
+def test_fingerprint_ignores_order_but_not_content():
+    article_store, ids = store_with_articles("first", "second")
+    hashes = content_hashes(ids, article_store)
+
+    assert article_fingerprint(hashes) == article_fingerprint(dict(reversed(list(hashes.items()))))
+    assert article_fingerprint(hashes) != article_fingerprint({**hashes, ids[1] : "edited"})
+    assert article_fingerprint(hashes) != article_fingerprint({ids[0] : hashes[ids[0]]})
+
+
+def test_put_and_get_round_trip(tmp_path):
+    article_store, ids = store_with_articles("first", "second")
+    hashes = content_hashes(ids, article_store)
+    report = Report(chain_of_thought = [Step(description = "Weigh the news", output = "Demand is growing.")], report = "Positive outlook.", current_sentiment = "Positive", citations = [1])
+    cache = ReportCache(str(tmp_path / "cache" / "reports.sqlite"))
+
+    assert cache.get("NVDA") is None
+    cache.put("NVDA", ids, hashes, report, "<p>NVDA</p>")
+    cached = cache.get("NVDA")
+    cache.close()
+
+    assert cached.fingerprint == article_fingerprint(hashes)
+    assert cached.article_ids == ids
+    assert cached.report == report
+    assert cached.section == "<p>NVDA</p>"
+
+
+def test_overlap_counts_unchanged_articles():
+    article_store, ids = store_with_articles("first", "second", "third", "fourth")
+    hashes = content_hashes(ids, article_store)
+    cached_hashes = {ids[0] : hashes[ids[0]], ids[1] : hashes[ids[1]], ids[2] : "edited since"}
+    cached = CachedReport(article_fingerprint(cached_hashes), ids[:3], cached_hashes, Report(), "")
+
+    assert cached.overlap(hashes) == 0.5
+    assert cached.overlap({}) == 0.0
+
+
+def test_update_keeps_the_cited_articles_and_appends_the_new_ones():
+    article_store, ids = store_with_articles("first", "second", "third", "fourth")
+    hashes = content_hashes(ids, article_store)
+    # The cached report cited the first and third articles, the third has since been edited and the fourth is new
+    cached_hashes = {ids[0] : hashes[ids[0]], ids[1] : hashes[ids[1]], ids[2] : "edited since"}
+    cached = CachedReport("", ids[:3], cached_hashes, Report(report = "Old report.", current_sentiment = "Neutral", citations = [0, 2]), "")
+
+    article_ids, messages = prepare_update(cached, hashes)
+
+    assert article_ids == [ids[0], ids[2], ids[3]]
+    assert messages[0].additional_kwargs["cited_article_ids"] == [ids[0]]
+    assert "Old report." in messages[0].content
+    assert "1, 2" in messages[1].content
+
+
+class FailingCritic:
+    """A generator writing the same report every round, and a critic finding it useless every time."""
+
+    def __init__(self):
+        self.reports = 0
+
+    def with_structured_output(self, schema, **kwargs):
+        def respond(prompt):
+            if schema is Report:
+                self.reports += 1
+                return Report(chain_of_thought = [Step(description = "Weigh the news", output = "Unclear.")], report = "Unclear outlook.", current_sentiment = "Neutral")
+            return UsefulnessOutput(chain_of_thought = [Step(description = "Read the report", output = "Vague")], is_useful = False, criticisms = ["State the outlook"])
+        return RunnableLambda(respond)
+
+
+def test_update_pass_gets_the_full_reflection_budget(monkeypatch):
+    article_store, ids = store_with_articles("first", "second", "third")
+    hashes = content_hashes(ids, article_store)
+    report = Report(chain_of_thought = [Step(description = "Weigh the news", output = "Demand is growing.")], report = "Positive outlook.", current_sentiment = "Positive", citations = [0])
+    cached = CachedReport(article_fingerprint(hashes), ids[:2], {article_id : hashes[article_id] for article_id in ids[:2]}, report, "<p>NVDA</p>")
+    model = FailingCritic()
+    monkeypatch.setattr(graph_constructor, "build_model", lambda model_config: model)
+
+    update_ids, messages = prepare_update(cached, hashes)
+    graph = graph_constructor.GraphConstructor(
+        settings.generator, settings.critic,
+        {"asset_type" : "stocks", "trading_symbol" : "NVDA", "trading_exchange" : "NASDAQ", "symbol_alias" : "Nvidia"},
+        article_store = article_store
+    ).compile()
+    response = graph.invoke({"article_ids" : update_ids, "messages" : messages, "max_reflection_round" : 3})
+
+    # The messages seeded from the cached report do not use up a reflection round
+    assert model.reports == 3
+    assert response["reflection_rounds"] == 3
+    assert response.get("email") is None
@@ -0,0 +1,74 @@
+import time
+import threading
+import pytest
+import requests
+from src.components import retrieval_scheduler
+from src.components.retrieval_scheduler import RetrievalError, RetrievalScheduler
+
+
+def http_error(status: int) -> requests.HTTPError:
+    response = requests.Response()
+    response.status_code = status
+    return requests.HTTPError(f"{status} error", response = response)
+
+
+@pytest.fixture
+def release():
+    event = threading.Event()
+    yield event
+    event.set()
+
+
+def test_hung_source_call_frees_its_slot(release):
+    scheduler = RetrievalScheduler(max_workers = 1)
+
+    with pytest.raises(RetrievalError) as error:
+        scheduler.run(release.wait, deadline = time.monotonic() + 0.2)
+    assert error.value.category == "timeout"
+
+    # The hung call still runs, but the next symbol gets the slot
+    assert scheduler.run(lambda: "headlines", deadline = time.monotonic() + 1) == "headlines"
+
+
+def test_hung_request_frees_its_slot(monkeypatch, release):
+    def download_html(url, timeout = None):
+        if "hung" in url:
+            release.wait()
+        return url
+
+    monkeypatch.setattr(retrieval_scheduler, "download_html", download_html)
+    scheduler = RetrievalScheduler(request_timeout = 0.2, hedge_after = 5, max_workers = 1)
+
+    with pytest.raises(RetrievalError) as error:
+        scheduler.fetch("https://hung.example/story", time.monotonic() + 5)
+    assert error.value.category == "timeout"
+
+    assert scheduler.fetch("https://other.example/story", time.monotonic() + 1) == "https://other.example/story"
+
+
+@pytest.mark.parametrize("status, trips", [(404, False), (403, False), (429, True), (503, True)])
+def test_only_host_failures_trip_the_breaker(monkeypatch, status, trips):
+    def download_html(url, timeout = None):
+        raise http_error(status)
+
+    monkeypatch.setattr(retrieval_scheduler, "download_html", download_html)
+    scheduler = RetrievalScheduler(failure_threshold = 2)
+
+    for _ in range(3):
+        with pytest.raises(RetrievalError):
+            scheduler.fetch("https://news.example/missing", time.monotonic() + 5)
+
+    assert ("news.example" in scheduler.circuit_breaker.open_hosts) == trips
+
+
+def test_connection_errors_trip_the_breaker(monkeypatch):
+    def download_html(url, timeout = None):
+        raise requests.ConnectionError("connection refused")
+
+    monkeypatch.setattr(retrieval_scheduler, "download_html", download_html)
+    scheduler = RetrievalScheduler(failure_threshold = 2)
+
+    for category in ("connection_error", "connection_error", "circuit_open"):
+        with pytest.raises(RetrievalError) as error:
+            scheduler.fetch("https://down.example/story", time.monotonic() + 5)
+        assert error.value.category == category
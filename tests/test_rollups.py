@@ -0,0 +1,41 @@
+import numpy as np
+from src.components.rollups import compute_indices, format_summary
+from src.components.schemas import Report
+
+
+GROUPS = {
+    "Chips" : {"NVDA" : 2.0, "AMD" : 1.0},
+    "Banks" : {"JPM" : 1.0},
+}
+
+
+def test_indices_are_weighted_means_of_the_reported_symbols():
+    reports = {
+        "NVDA" : Report(current_sentiment = "Strongly Positive", future_sentiment = "Positive"),
+        "AMD" : Report(current_sentiment = "Negative"),
+    }
+
+    indices = compute_indices(GROUPS, reports)
+
+    assert indices.current[0] == (2 * 2.0 - 1.0) / 3
+    assert indices.outlook[0] == 1.0
+    assert np.isclose(indices.dispersion[0], np.sqrt((2 * 1.0 ** 2 + 2.0 ** 2) / 3))
+    assert indices.coverage.tolist() == [1.0, 0.0]
+    assert indices.covering(["JPM"]) == [1]
+
+
+def test_group_without_reports_is_not_available():
+    indices = compute_indices(GROUPS, {"NVDA" : Report(current_sentiment = "Neutral")})
+
+    summary = format_summary(indices, ["NVDA", "JPM"])
+
+    assert "<tr><td>Chips</td><td>Neutral (+0.00)</td><td>N/A</td><td>0.00</td><td>67%</td></tr>" in summary
+    assert "<tr><td>Banks</td><td>N/A</td><td>N/A</td><td>N/A</td><td>0%</td></tr>" in summary
+    assert "nan" not in summary
+
+
+def test_summary_of_uncovered_symbols_is_empty():
+    indices = compute_indices(GROUPS, {})
+
+    assert format_summary(indices, ["TSLA"]) == ""
+    assert format_summary(None, ["NVDA"]) == ""
@@ -0,0 +1,67 @@
+import pytest
+from src.components.run_planner import CostHistory, RunPlanner
+from src.components.schemas import AssetInformation, PlanningConfig
+from src.components.token_usage import TokenUsage
+
+
+def asset(symbol):
+    return AssetInformation(asset_type = "stocks", trading_symbol = symbol, trading_exchange = "NASDAQ", symbol_alias = symbol)
+
+
+@pytest.fixture
+def cost_history(tmp_path):
+    cost_history = CostHistory(str(tmp_path / "costs.sqlite"))
+    yield cost_history
+    cost_history.close()
+
+
+def plan(cost_history, token_budget, deadline_minutes = 60):
+    """Plans three symbols of decreasing priority, each with 4000 tokens of news, or 1000 in the degraded mode."""
+    planning_config = PlanningConfig(
+        enabled = True, deadline_minutes = deadline_minutes, token_budget = token_budget,
+        priorities = {"AAA" : 3, "BBB" : 2, "CCC" : 1}, round_seconds = 60, round_overhead_tokens = 1000
+    )
+    planner = RunPlanner(planning_config, cost_history, TokenUsage(), max_reflection_round = 3, rate_limit_delay = 0)
+    news_tokens = {"AAA" : 4000, "BBB" : 4000, "CCC" : 4000}
+    degraded_news_tokens = {"AAA" : 1000, "BBB" : 1000, "CCC" : 1000}
+
+    units = planner.order([planner.make_unit([asset(symbol)], news_tokens, degraded_news_tokens) for symbol in ("CCC", "AAA", "BBB")])
+    planner.plan(units)
+    return {unit.symbols[0] : unit.mode for unit in units}, units
+
+
+def test_units_are_ordered_by_priority(cost_history):
+    _, units = plan(cost_history, token_budget = 100000)
+    assert [unit.symbols[0] for unit in units] == ["AAA", "BBB", "CCC"]
+
+
+def test_everything_fits_in_full_mode(cost_history):
+    modes, _ = plan(cost_history, token_budget = 100000)
+    assert modes == {"AAA" : "full", "BBB" : "full", "CCC" : "full"}
+
+
+def test_degraded_admission_before_upgrades(cost_history):
+    # Without history, full reports expect 2 rounds of 5000 tokens and degraded reports 1 round of 2000 tokens.
+    # All three are admitted degraded (6000), then only the highest priority is upgraded (+8000).
+    modes, _ = plan(cost_history, token_budget = 15000)
+    assert modes == {"AAA" : "full", "BBB" : "degraded", "CCC" : "degraded"}
+
+
+def test_lowest_priority_is_skipped_when_even_degraded_does_not_fit(cost_history):
+    modes, _ = plan(cost_history, token_budget = 5000)
+    assert modes == {"AAA" : "degraded", "BBB" : "degraded", "CCC" : "skip"}
+
+
+def test_deadline_limits_admission(cost_history):
+    # Two and a half minutes fit two degraded rounds of 60 seconds, and no upgrade
+    modes, _ = plan(cost_history, token_budget = 100000, deadline_minutes = 2.5)
+    assert modes == {"AAA" : "degraded", "BBB" : "degraded", "CCC" : "skip"}
+
+
+def test_history_replaces_the_default_estimates(cost_history):
+    cost_history.record("AAA", rounds = 1, seconds = 30, tokens = 5000, news_tokens = 4000)
+    modes, units = plan(cost_history, token_budget = 100000)
+
+    aaa = next(unit for unit in units if unit.symbols == ["AAA"])
+    assert aaa.full.seconds == 30
+    assert aaa.full.tokens == 5000
@@ -0,0 +1,44 @@
+import pytest
+from src.components.run_summary import RunSummary, compare_summaries, format_footer
+
+
+def summary(wall_time: float, llm_calls: int, failures: dict, symbols: dict) -> dict:
+    return {
+        "run_id" : "run", "wall_time" : wall_time, "llm_calls" : llm_calls, "total_tokens" : llm_calls * 1000,
+        "reflection_rounds" : 2, "failures" : failures,
+        "symbols" : {symbol : {"wall_time" : seconds} for symbol, seconds in symbols.items()},
+    }
+
+
+def test_compare_summaries_flags_regressions():
+    previous = summary(100.0, 10, {"timeout" : 1}, {"NVDA" : 50.0, "AAPL" : 50.0})
+    current = summary(110.0, 20, {"timeout" : 1, "http_error" : 2}, {"NVDA" : 80.0, "MSFT" : 30.0})
+
+    comparison = compare_summaries(previous, current, threshold = 0.25)
+
+    assert comparison["metrics"]["wall_time"] == {"previous" : 100.0, "current" : 110.0, "change" : 0.1, "regression" : False}
+    assert comparison["metrics"]["llm_calls"]["change"] == 1.0
+    # Failures are compared in total across categories
+    assert comparison["metrics"]["failures"]["current"] == 3
+    # Only symbols reported in both runs are compared
+    assert set(comparison["symbols"]) == {"NVDA"}
+    assert comparison["regressions"] == ["llm_calls", "total_tokens", "failures", "NVDA wall_time"]
+
+
+def test_metrics_absent_from_the_previous_run_regress_when_they_appear():
+    comparison = compare_summaries(summary(10.0, 0, {}, {}), summary(10.0, 1, {}, {}), threshold = 0.25)
+
+    assert comparison["metrics"]["llm_calls"] == {"previous" : 0, "current" : 1, "change" : None, "regression" : True}
+
+
+def test_reflection_rounds_are_counted_from_the_analysis_node():
+    run = RunSummary("run")
+    for _ in range(2):
+        run.record_stage(["NVDA"], "analyse_market_sentiment", 1.5)
+    run.record_stage(["NVDA"], "grade_generation", 1.0)
+
+    built = run.build(None, {})
+
+    assert built["symbols"]["NVDA"]["reflection_rounds"] == 2
+    assert built["reflection_rounds"] == 2
+    assert "<td>NVDA</td><td></td><td>4.0</td><td>2</td>" in format_footer(built)
@@ -0,0 +1,44 @@
+import pytest
+from src import scheduler
+from src.components.news_store import NewsStore
+from src.components.schemas import AssetInformation, NewsStoreConfig
+
+
+ASSETS = [
+    AssetInformation(trading_symbol = symbol, trading_exchange = "NASDAQ", asset_type = "stocks", symbol_alias = symbol)
+    for symbol in ("AAPL", "MSFT")
+]
+
+
+@pytest.fixture
+def jobs(monkeypatch):
+    calls = []
+
+    def prefetch_news(asset_information, *args):
+        calls.append(("prefetch", asset_information.trading_symbol))
+        if asset_information.trading_symbol == "AAPL":
+            raise ConnectionError("source unreachable")
+        return 3
+
+    def generate_and_send_reports(exchanges, news_store):
+        calls.append(("report", None))
+        raise RuntimeError("model unavailable")
+
+    monkeypatch.setattr(scheduler, "prefetch_news", prefetch_news)
+    monkeypatch.setattr(scheduler, "generate_and_send_reports", generate_and_send_reports)
+    return calls
+
+
+def test_report_job_prefetches_first_and_survives_failures(jobs, tmp_path):
+    news_store = NewsStore(str(tmp_path / "news.sqlite"))
+
+    scheduler.run_report_job({"NASDAQ" : "stocks"}, ASSETS, news_store, None, None, [], NewsStoreConfig())
+
+    assert jobs == [("prefetch", "AAPL"), ("prefetch", "MSFT"), ("report", None)]
+    news_store.close()
+
+
+def test_failed_prefetch_job_is_logged(jobs, caplog):
+    assert scheduler.run_prefetch_job(ASSETS[0], None, None, None, [], 7) == 0
+    assert scheduler.run_prefetch_job(ASSETS[1], None, None, None, [], 7) == 3
+    assert "Error prefetching news for AAPL: source unreachable" in caplog.text
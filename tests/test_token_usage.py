@@ -0,0 +1,40 @@
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage
+from langgraph.graph import END, START, StateGraph
+from typing_extensions import TypedDict
+from src.components.token_usage import track_token_usage
+
+
+class RoundState(TypedDict):
+    rounds: int
+
+
+def test_node_runs_are_counted_apart_from_llm_calls():
+    model = GenericFakeChatModel(messages = iter([AIMessage(content = "draft")] * 6))
+
+    def analyse_sentiment(state: RoundState):
+        # A retried call within the round, as with a streamed report aborted on an invalid citation
+        model.invoke("first attempt")
+        model.invoke("second attempt")
+        return {"rounds" : state["rounds"] + 1}
+
+    workflow = StateGraph(RoundState)
+    workflow.add_node("analyse_sentiment", analyse_sentiment)
+    workflow.add_edge(START, "analyse_sentiment")
+    workflow.add_conditional_edges("analyse_sentiment", lambda state: END if state["rounds"] >= 3 else "analyse_sentiment")
+
+    with track_token_usage() as token_usage:
+        workflow.compile().invoke({"rounds" : 0})
+
+    assert token_usage.node_runs == {"analyse_sentiment" : 3}
+    assert token_usage.node_calls == {"analyse_sentiment" : 6}
+
+
+
+def test_nested_tracking_shares_the_outer_usage():
+    with track_token_usage() as outer:
+        with track_token_usage() as inner:
+            GenericFakeChatModel(messages = iter([AIMessage(content = "ok")])).invoke("hello")
+
+    assert inner is outer
+    assert outer.node_calls == {"other" : 1}